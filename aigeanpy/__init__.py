@@ -1,8 +1,93 @@
-from aigeanpy.net import *
-from aigeanpy.coor import *
-from aigeanpy.read_files import *
-from aigeanpy.satmap import *
-from aigeanpy.analysis import *
-from aigeanpy.clustering import *
-from aigeanpy.clustering_numpy import *
-from aigeanpy.utils import *
+# The modules of aigeanpy depend on libraries that are slow to import
+# (matplotlib, scikit-image, asdf, h5py, requests), so `import aigeanpy`
+# imports none of them. Each name below is looked up in its module the
+# first time it is used, e.g. aigeanpy.get_satmap imports aigeanpy.satmap.
+
+_exports = {
+    'query_isa': 'net',
+    'download_isa': 'net',
+    'query': 'net',
+    'QueryResult': 'net',
+    'read_asdf': 'read_files',
+    'read_h5py': 'read_files',
+    'read_zip': 'read_files',
+    'read_csv': 'read_files',
+    'read_file': 'read_files',
+    'read_metadata': 'read_files',
+    'mmap_zip': 'read_files',
+    'read_pixels': 'read_files',
+    'open_data': 'read_files',
+    'write_file': 'write_files',
+    'write_asdf': 'write_files',
+    'write_h5py': 'write_files',
+    'write_zip': 'write_files',
+    'cache_info': 'read_files',
+    'cache_clear': 'read_files',
+    'set_cache_size': 'read_files',
+    'EcneStats': 'ecne_stats',
+    'summarise_file': 'ecne_stats',
+    'summarise_files': 'ecne_stats',
+    'merge_stats': 'ecne_stats',
+    'Catalog': 'catalog',
+    'extract_points': 'extract',
+    'to_timestamp': 'catalog',
+    'set_dtype': 'dtypes',
+    'get_dtype': 'dtypes',
+    'use_dtype': 'dtypes',
+    'SatMetadata': 'metadata',
+    'SatMap': 'satmap',
+    'get_satmap': 'satmap',
+    'overlap': 'satmap',
+    'resample_data': 'satmap',
+    'largest_covered_window': 'satmap',
+    'mosaic_satmaps': 'satmap',
+    'SatMapStack': 'stack',
+    'Zones': 'zonal',
+    'zonal_stats': 'zonal',
+    'compact': 'pack',
+    'PackedArchive': 'pack',
+    'SparseSatMap': 'sparse',
+    'composite': 'sparse',
+    'Pipeline': 'pipeline',
+    'Stage': 'pipeline',
+    'quicklook_filename': 'render',
+    'thin_ticks': 'render',
+    'draw': 'render',
+    'render_png': 'render',
+    'render_many': 'render',
+    'render_tiles': 'tiles',
+    'max_zoom_level': 'tiles',
+    'data_range': 'tiles',
+    'span': 'tracing',
+    'traced': 'tracing',
+    'kmeans': 'analysis',
+    'cluster': 'clustering_numpy',
+    'cluster_array': 'clustering_numpy',
+    'cluster_chunked': 'clustering_numpy',
+    'predict': 'clustering_numpy',
+    'save_centroids': 'clustering_numpy',
+    'load_centroids': 'clustering_numpy',
+    'cli': 'clustering_numpy',
+    'create_points': 'utils',
+}
+
+# The class coor has the name of its module. Imported here, as the star import
+# of the module used to, aigeanpy.coor stays the class even once the module is
+# imported; a lazy name would be replaced by the module.
+from aigeanpy.coor import coor
+
+__all__ = ['coor'] + list(_exports)
+
+
+def __getattr__(name):
+    if name in _exports:
+        from importlib import import_module
+        value = getattr(import_module('aigeanpy.' + _exports[name]), name)
+        globals()[name] = value
+        return value
+
+    raise AttributeError(f"module 'aigeanpy' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,196 @@
+from argparse import ArgumentParser
+from time import perf_counter
+import os
+import sys
+import numpy as np
+import aigeanpy.net as net
+from aigeanpy.clustering_numpy import cluster_array, cluster_chunked, predict, save_centroids, load_centroids
+from aigeanpy.profiling import add_profile_arguments, profiled
+
+# Above this number of points the points are clustered chunk by chunk,
+# so the distances to the centres are never held in memory all at once.
+CHUNKED_POINTS = 1_000_000
+
+
+def load_points(filename):
+    '''Read the points to cluster from a file, one point per row.
+
+    .npy files are memory-mapped, so their points are only read when
+    they are clustered. CSV files, such as the files of the Ecne
+    instrument, have one point per line with comma-separated values.
+    Ecne files that are not on disk are downloaded first.
+
+    Parameters
+    ----------
+    filename : str
+        name of a .npy or .csv file
+
+    Returns
+    -------
+    numpy.ndarray
+        array of shape (number of points, number of features)
+    '''
+
+    if type(filename) != str:
+        raise TypeError('filename must be of type string')
+
+    extension = os.path.splitext(filename)[1]
+
+    if extension == '.npy':
+        points = np.load(filename, mmap_mode='r')
+
+    elif extension == '.csv':
+        if os.path.exists(filename) != True and '_ecn_' in os.path.basename(filename):
+            net.download_isa(filename)
+        points = np.loadtxt(filename, delimiter=',', ndmin=2)
+
+    else:
+        raise ValueError('The points must be in a .npy or .csv file')
+
+    if points.ndim != 2:
+        raise ValueError('The points must be a 2-D array of shape (number of points, number of features)')
+
+    return points
+
+
+def choose_engine(points):
+    '''Choose how to cluster the points: 'numpy' clusters them all at once
+    in memory, 'chunked' reads them chunk by chunk.
+    '''
+
+    if isinstance(points, np.memmap) or points.shape[0] > CHUNKED_POINTS:
+        return 'chunked'
+    return 'numpy'
+
+
+def aigean_cluster(filename, clusters=3, iterations=10, seed=None, engine='auto',
+                   centres_file=None, labels_file=None, chunk_size=65536, init=None, predict_only=False):
+    '''Cluster the points of a file with k-means and save the centres of
+    the clusters and the cluster of each point as .npy files.
+
+    Parameters
+    ----------
+    filename : str
+        name of a .npy or .csv file with one point per row
+
+    clusters : int, optional
+        number of clusters, by default 3
+
+    iterations : int, optional
+        maximum number of iterations, by default 10
+
+    seed : int, optional
+        seed of the random choice of the initial centres, by default None
+
+    engine : str, optional
+        'numpy', 'chunked' or 'auto' (the default) to choose from the size of the input
+
+    centres_file, labels_file : str or path object, optional
+        where to save the centres (float64, one row per cluster) and the
+        labels (int32, one per point). By default they are saved next to
+        the input as <name>_centres.npy and <name>_labels.npy
+
+    chunk_size : int, optional
+        number of points read at a time by the chunked engine, by default 65536
+
+    init : str or path object, optional
+        a .npy file of centres, such as the centres of the previous run, to start
+        from instead of random points. clusters is then the number of centres in it.
+
+    predict_only : bool, optional
+        The default value of predict_only is False. When predict_only is True the
+        points are only assigned to the centres of init, which are saved unchanged.
+
+    Returns
+    -------
+    dict
+        the seconds spent reading, clustering and writing, and the engine used
+    '''
+
+    if engine not in ['auto', 'numpy', 'chunked']:
+        raise ValueError("engine must be 'auto', 'numpy' or 'chunked'")
+
+    stem = os.path.splitext(filename)[0]
+    if centres_file == None:
+        centres_file = stem + '_centres.npy'
+    if labels_file == None:
+        labels_file = stem + '_labels.npy'
+
+    if predict_only and init == None:
+        raise ValueError('predict_only needs the centres to assign the points to (init)')
+
+    timings = {}
+
+    start = perf_counter()
+    points = load_points(filename)
+    if init != None:
+        init = load_centroids(init)
+        clusters = init.shape[0]
+    timings['read'] = perf_counter() - start
+
+    if engine == 'auto':
+        engine = choose_engine(points)
+    timings['engine'] = engine
+
+    start = perf_counter()
+    if engine == 'chunked':
+        # The labels go straight into the output file instead of an array in memory
+        labels = np.lib.format.open_memmap(labels_file, mode='w+', dtype=np.int32, shape=(points.shape[0],))
+        if predict_only:
+            centres, labels = init, predict(points, init, chunk_size=chunk_size, labels=labels)
+        else:
+            centres, labels = cluster_chunked(points, clusters, iterations, seed=seed, chunk_size=chunk_size, labels=labels, init=init)
+    else:
+        if predict_only:
+            centres, labels = init, predict(points, init, chunk_size=chunk_size)
+        else:
+            centres, labels = cluster_array(points, clusters, iterations, seed=seed, init=init)
+    timings['cluster'] = perf_counter() - start
+
+    start = perf_counter()
+    save_centroids(centres_file, centres)
+    if engine == 'chunked':
+        labels.flush()
+        del labels
+    else:
+        np.save(labels_file, labels)
+    timings['write'] = perf_counter() - start
+
+    return timings
+
+
+def cli():
+    '''Creates command line interface that calls on the aigean_cluster function.
+    '''
+    parser = ArgumentParser(description="Cluster the points of a .npy or .csv file with k-means")
+    parser.add_argument('filename', type=str, help='Name of the file that contains the points')
+    parser.add_argument('-k', '--clusters', type=int, default=3, help='Number of clusters, by default 3')
+    parser.add_argument('-i', '--iters', type=int, default=10, help='Maximum number of times to iterate, by default 10')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the random choice of the initial centres')
+    parser.add_argument('--engine', choices=['auto', 'numpy', 'chunked'], default='auto', help='How to cluster the points, by default chosen from the size of the input')
+    parser.add_argument('--chunk-size', type=int, default=65536, help='Number of points read at a time by the chunked engine, by default 65536')
+    parser.add_argument('--centres', type=str, default=None, help='Where to save the centres, by default <name>_centres.npy')
+    parser.add_argument('--labels', type=str, default=None, help='Where to save the cluster of each point, by default <name>_labels.npy')
+    parser.add_argument('--init', type=str, default=None, help='A .npy file of centres to start from, such as the centres of the previous run')
+    parser.add_argument('--predict', action='store_true', help='Only assign the points to the centres of --init, without clustering them again')
+    add_profile_arguments(parser)
+
+    arguments = parser.parse_args()
+
+    try:
+        with profiled(arguments, 'aigean_cluster'):
+            timings = aigean_cluster(arguments.filename, clusters=arguments.clusters, iterations=arguments.iters,
+                                     seed=arguments.seed, engine=arguments.engine, centres_file=arguments.centres,
+                                     labels_file=arguments.labels, chunk_size=arguments.chunk_size,
+                                     init=arguments.init, predict_only=arguments.predict)
+    except (TypeError, ValueError, OSError) as error:
+        print(error)
+        sys.exit(1)
+
+    print(f"engine: {timings['engine']}")
+    for step in ['read', 'cluster', 'write']:
+        print(f'{step}: {timings[step]:.3f} s')
+
+
+if __name__ == '__main__':
+    cli()
@@ -1,10 +1,42 @@
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+import json
 import os
+import numpy as np
 import aigeanpy.net as net
-from aigeanpy.satmap import SatMap, get_satmap
+from aigeanpy.read_files import read_metadata
+from aigeanpy.profiling import add_profile_arguments, profiled
 
 
-def aigean_metadata(filename):
+def _load_metadata(file):
+    '''Download a file if necessary and read its metadata.
+    Returns None if the file is not an aigeanpy file or could not be read.
+    '''
+
+    extension = os.path.splitext(file)[1]
+    if extension not in ['.asdf', '.hdf5', '.zip']:
+        return None
+
+    try:
+        if os.path.exists(file) != True:
+            net.download_isa(file)
+
+        return read_metadata(file)
+
+    except:
+        return None
+
+
+def _to_json(value):
+    # HDF5 attributes come back as numpy arrays and scalars
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def aigean_metadata(filename, jobs=1, json_lines=False):
     '''Given a filename or a list of filenames, function first
     downloads the files if necessary. Then displays the metadata
     of each file in the order they were passed in.
@@ -17,11 +49,20 @@ def aigean_metadata(filename):
     filename : str or list[str]
         files whos metadata to display. Must be an aigeanpy file
         and be of type asdf, hdf5 or zip
+
+    jobs : int, optional
+        number of files downloaded and read at the same time, by default 1.
+        The metadata is always displayed in the order the files were passed in.
+
+    json_lines : bool, optional
+        display the metadata of each file as one JSON object per line,
+        by default False. Files that failed are reported in place as
+        an object with an "error" key.
     '''
 
     if type(filename) == str:
         filename = [filename]
-    
+
     elif type(filename) == list:
         for i in filename:
             if type(i) != str:
@@ -29,45 +70,39 @@ def aigean_metadata(filename):
 
     else:
         raise TypeError('filename must be of type string')
-    wrong_file = []
 
-    for file in filename:
+    if type(jobs) != int or jobs <= 0:
+        raise ValueError('jobs must be a positive integer')
 
-        extension = os.path.splitext(file)[1]
-        if extension not in ['.asdf', '.hdf5', '.zip']:
-            wrong_file.append(file)
-            continue
-
-        try:
-            
-            if os.path.exists(file) != True:
-                net.download_isa(file)
+    wrong_file = []
 
-            sat_map_object = get_satmap(file)
+    # pool.map hands the results back in the order the files were passed in,
+    # so the files after the one being printed are already being fetched.
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
 
-        except:
-            wrong_file.append(file)
+        for file, metadata in zip(filename, pool.map(_load_metadata, filename)):
 
-        else:
-            metadata = sat_map_object.meta()
+            if metadata == None:
+                wrong_file.append(file)
+                if json_lines:
+                    print(json.dumps({'filename': file, 'error': 'failed while being processed'}))
+                continue
 
-            
-            if extension == '.asdf':
+            if json_lines:
+                print(json.dumps({'filename': file, **metadata}, default=_to_json))
+                continue
 
-                del metadata['asdf_library']
-                del metadata['history']
-            
             if len(filename) == 1:
                 for dict_elem in metadata:
                     print(f'{dict_elem}: {metadata[dict_elem]}')
             else:
                 for dict_elem in metadata:
                     print(f'{file}:{dict_elem}: {metadata[dict_elem]}')
-            
+
             print()
 
 
-    if wrong_file:
+    if wrong_file and not json_lines:
         print('These files failed while being processed:')
         for i in wrong_file:
             print(f'- {i}\n')
@@ -79,9 +114,14 @@ def cli():
     '''
     parser = ArgumentParser(description="Download the lates image from the ISA archives")
     parser.add_argument('filename', type=str, nargs='+')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of files to download and read at the same time, by default 1')
+    parser.add_argument('--json', action='store_true', help='Display the metadata of each file as one JSON object per line')
+    add_profile_arguments(parser)
 
     arguments = parser.parse_args()
-    aigean_metadata(arguments.filename)
+
+    with profiled(arguments, 'aigean_metadata'):
+        aigean_metadata(arguments.filename, jobs=arguments.jobs, json_lines=arguments.json)
 
 if __name__ == '__main__':
-    cli()
\ No newline at end of file
+    cli()
@@ -1,11 +1,60 @@
 from argparse import ArgumentParser
+from functools import partial
 import aigeanpy.net as net
-from aigeanpy.satmap import SatMap, get_satmap
+from aigeanpy.pipeline import Pipeline, Stage
+from aigeanpy.profiling import add_profile_arguments, profiled
+from aigeanpy.satmap import SatMap, get_satmap, mosaic_satmaps
 import os
 import sys
 
 
-def aigean_mosaic(resolution, filename):
+def _download(file):
+    '''Download a file if necessary.
+    '''
+    if os.path.exists(file) != True:
+        net.download_isa(file)
+
+    return file
+
+
+def _resample(satmap, resolution):
+    return satmap.resample(resolution)
+
+
+def mosaic_pipeline(filename, resolution=None, jobs=1):
+    '''Build the pipeline that downloads, reads and resamples the files of a mosaic.
+
+    The files are downloaded by jobs threads while the files already on disk
+    are read and resampled, by jobs worker processes when jobs is more than 1.
+
+    Parameters
+    ----------
+    filename : list[str]
+        The list of files of the mosaic
+
+    resolution : int, optional
+        The resolution of the mosaic. By default the images are not resampled
+        and SatMap.mosaic chooses the resolution.
+
+    jobs : int, optional
+        number of files downloaded, read and resampled at the same time, by default 1
+
+    Returns
+    -------
+    Pipeline
+        run it with pipeline.run(filename) to get the SatMaps in the order of filename
+    '''
+
+    stages = [Stage('download', _download, workers=jobs),
+              Stage('decode', get_satmap, workers=jobs, processes=jobs > 1)]
+
+    if resolution != None:
+        stages.append(Stage('resample', partial(_resample, resolution=resolution), workers=jobs, processes=jobs > 1))
+
+    return Pipeline(stages, queue_size=2*jobs)
+
+
+def aigean_mosaic(resolution, filename, jobs=1, stats=False):
     '''Given a resolution and a list of files, function will download
     the files if necessary, then create and save a mosaic with those files.
 
@@ -17,6 +66,12 @@ def aigean_mosaic(resolution, filename):
     filename : list[str]
         The list of files to use to create a mosaic. Must be an aigeanpy file
         and be of type asdf, hdf5 or zip
+
+    jobs : int, optional
+        number of files downloaded, read and resampled at the same time, by default 1
+
+    stats : bool, optional
+        display the time spent in each stage and how many files waited for it, by default False
     '''
 
     for file in filename:
@@ -24,27 +79,24 @@ def aigean_mosaic(resolution, filename):
         if extension not in ['.asdf', '.hdf5', '.zip']:
             sys.exit('Filetype must be one of asdf, hdf5 or zip')
 
+    if type(jobs) != int or jobs <= 0:
+        raise ValueError('jobs must be a positive integer')
+
     try:
-        if os.path.exists(filename[0]) != True:
-            net.download_isa(filename[0])
-
-        A = get_satmap(filename[0])
-
-        mosaic_results = [A]
-        for i in range(len(filename)-1):
-            
-            if os.path.exists(filename[i+1]) != True:
-                net.download_isa(filename[i+1])
-                
-            B = get_satmap(filename[i+1])
-            AB = mosaic_results[-1]
-            AB = AB.mosaic(B, resolution=resolution)
-            mosaic_results.append(AB)
-        
-        mosaic_results[-1].visualize(save=True)
+        # The files are downloaded, read and resampled by the pipeline, which hands
+        # them back in the order they were passed in. They are then pasted into a
+        # canvas allocated once, instead of a new canvas for every file added.
+        pipeline = mosaic_pipeline(filename, resolution=resolution, jobs=jobs)
+
+        mosaic_result = mosaic_satmaps(list(pipeline.run(filename)), resolution=resolution)
+
+        mosaic_result.visualize(save=True)
     
     except:
         sys.exit('Mosaic could not be done. This could be because one (or more) of the files is not an aigeanpy file or has been corrupted')
+
+    if stats:
+        print(pipeline.report())
         
 
 
@@ -54,9 +106,14 @@ def cli():
     parser = ArgumentParser(description="Download the lates image from the ISA archives")
     parser.add_argument('-r', '--resolution', type=int, help='The resolution of mosaic picture as an integer')
     parser.add_argument('filename', type=str, nargs='+', help='List of the filenames to create a mosaic with')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of files to download, read and resample at the same time, by default 1')
+    parser.add_argument('--stats', action='store_true', help='Display the time spent in each stage of the mosaic')
+    add_profile_arguments(parser)
 
     arguments = parser.parse_args()
-    aigean_mosaic(arguments.resolution, arguments.filename)
+
+    with profiled(arguments, 'aigean_mosaic'):
+        aigean_mosaic(arguments.resolution, arguments.filename, jobs=arguments.jobs, stats=arguments.stats)
 
 if __name__ == '__main__':
     cli()
\ No newline at end of file
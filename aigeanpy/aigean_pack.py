@@ -0,0 +1,42 @@
+from argparse import ArgumentParser
+import sys
+from aigeanpy.pack import pack, compact
+from aigeanpy.profiling import add_profile_arguments, profiled
+
+
+def cli():
+    '''Creates command line interface that packs observations into a container, or compacts one.
+    '''
+    parser = ArgumentParser(description="Pack many observations into one HDF5 container with an index")
+    parser.add_argument('container', type=str, help='The container, created if it does not exist')
+    parser.add_argument('filename', type=str, nargs='*', help='ASDF, HDF5 or zip files added to the container')
+    parser.add_argument('--compression', type=str, default='gzip', choices=['gzip', 'lzf', 'none'], help='Compression of the data, by default gzip')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of files to read at the same time, by default 1')
+    parser.add_argument('--replace', action='store_true', help='Write again the observations already in the container')
+    parser.add_argument('--compact', action='store_true', help='Rewrite the container afterwards to give back the space of replaced observations')
+    add_profile_arguments(parser)
+
+    arguments = parser.parse_args()
+
+    if not arguments.filename and not arguments.compact:
+        parser.error('give files to pack or --compact')
+
+    compression = None if arguments.compression == 'none' else arguments.compression
+
+    with profiled(arguments, 'aigean_pack'):
+        try:
+            if arguments.filename:
+                written = pack(arguments.filename, arguments.container, compression=compression,
+                               replace=arguments.replace, jobs=arguments.jobs)
+                print(f'{written} observations written to {arguments.container}')
+
+            if arguments.compact:
+                before, after = compact(arguments.container)
+                print(f'{arguments.container} compacted from {before} to {after} bytes')
+
+        except (OSError, KeyError, TypeError, ValueError) as error:
+            print(f'aigean_pack: {error}', file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == '__main__':
+    cli()
@@ -1,7 +1,11 @@
 from argparse import ArgumentParser
-from requests import get
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import json
+import os
+import time
 import aigeanpy.net as net
+from aigeanpy.profiling import add_profile_arguments, profiled
 from aigeanpy.satmap import SatMap, get_satmap
 import sys
 
@@ -26,17 +30,11 @@ def aigean_today(instrument, saveplot):
 
 
     date_today = datetime.today().strftime('%Y-%m-%d')
-    payload = {'start_date':date_today , 'stop_date':date_today, 'instrument':instrument}
-    r = get('http://dokku-app.dokku.arc.ucl.ac.uk/isa-archive/query',params=payload).json()
+    latest = net.query(date_today, date_today, instrument).latest()
 
-    if not r:
+    if not latest:
         sys.exit("There seems to be no observations made today")
 
-    date_time = [[i['date'] + ' ' +i['time']] for i in r]
-    date_time = [datetime.strptime(i[0],'%Y-%m-%d %H:%M:%S') for i in date_time]
-
-
-    latest = r[date_time.index(max(date_time))]
     latest_filename = latest['filename']
     net.download_isa(latest_filename)
 
@@ -48,6 +46,209 @@ def aigean_today(instrument, saveplot):
             sys.exit("The file downloaded can not be visualised.")
 
 
+# watch keeps running, and every interval seconds asks the archive for the
+# observations made since its previous query. It remembers the latest
+# observation of each instrument (in state_file too, if given, so a restarted
+# watch carries on where it stopped) and downloads every observation that is
+# newer, so none is missed when several arrive between two queries. All the requests go through one requests.Session, so the
+# connections to the archive are opened once and reused.
+#
+# When a query finds nothing new, or fails, the wait before the next one
+# doubles, up to max_interval, and goes back to interval as soon as a new
+# observation arrives. A download that fails only holds back the observations
+# of its instrument, which are fetched again at the next query.
+
+INSTRUMENTS = ['lir', 'manannan', 'fand', 'ecne']
+
+
+def _session(pool_size):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _record_time(record):
+    return record['date'] + 'T' + record['time']
+
+
+def _load_state(state_file):
+    if state_file and os.path.exists(state_file):
+        with open(state_file) as f:
+            return json.load(f)
+    return {}
+
+
+def _save_state(state_file, state):
+    if state_file:
+        temporary = state_file + '.part'
+        with open(temporary, 'w') as f:
+            json.dump(state, f, indent=1)
+        os.replace(temporary, state_file)
+
+
+def _fetch(record, save_dir, render, session):
+    # Files already on disk, such as those of a previous run, are not downloaded again
+    path = os.path.join(save_dir or '', record['filename'])
+    fetched = not os.path.exists(path)
+    if fetched:
+        net.download_isa(record['filename'], save_dir=save_dir, session=session)
+
+    # SatMap images are drawn on their own Figure, not through pyplot, so several can be rendered at once
+    if render:
+        get_satmap(path).visualize(save=True, savepath=os.path.join(save_dir, '') if save_dir else None)
+
+    return path, fetched
+
+
+def new_observations(result, seen, instrument=None):
+    '''Find the observations of each instrument that are newer than the latest one already seen
+
+    Parameters
+    ----------
+    result : net.QueryResult
+        the records returned by a query
+
+    seen : dict
+        the latest record already seen of each instrument, by lower case instrument name.
+        Of an instrument not seen yet, only the latest record is new.
+
+    instrument : str, optional
+        only look at the records of this instrument, by default all of them
+
+    Returns
+    -------
+    dict
+        the new records of each instrument that has some, oldest first, by lower case instrument name
+    '''
+
+    if instrument:
+        result = result.filter(instrument=instrument)
+
+    new = {}
+    for record in result.sort():
+        name = record['instrument'].lower()
+        previous = seen.get(name)
+        if previous == None or _record_time(record) > _record_time(previous):
+            new.setdefault(name, []).append(record)
+
+    # A first watch starts from the latest observations, not from all those of the day
+    for name, records in new.items():
+        if seen.get(name) == None:
+            new[name] = records[-1:]
+    return new
+
+
+def watch(instrument=None, saveplot=False, interval=60, max_interval=900, state_file=None,
+          iterations=None, save_dir=None, session=None, workers=4):
+    '''Keep downloading the new observations of the instruments as the archive receives them
+
+    Parameters
+    ----------
+    instrument : str, optional
+        one of lir, manannan, fand or ecne, by default all of them
+
+    saveplot : bool, optional
+        True to also save a PNG of every new observation, except those of Ecne
+
+    interval : float, optional
+        seconds between two queries, by default 60
+
+    max_interval : float, optional
+        longest wait between two queries when nothing new arrives or a query fails, by default 900
+
+    state_file : str, optional
+        JSON file where the latest observation of each instrument is kept between runs
+
+    iterations : int, optional
+        number of queries before returning, by default None (forever)
+
+    save_dir : str, optional
+        directory of the downloads, by default the current directory
+
+    session : requests.Session, optional
+        session to send the requests with, by default a new session with a pool of workers connections
+
+    workers : int, optional
+        most downloads at the same time, by default 4
+
+    Returns
+    -------
+    list[str]
+        the paths of the files downloaded, once iterations queries have been made
+    '''
+
+    if instrument and instrument not in INSTRUMENTS:
+        raise ValueError("instrument must be one of 'lir', 'manannan', 'fand' or 'ecne'")
+
+    if interval < 0 or max_interval < interval:
+        raise ValueError('interval must be positive and no longer than max_interval')
+
+    if session == None:
+        session = _session(workers)
+
+    seen = _load_state(state_file)
+    downloaded = []
+    wait = interval
+    # The first query covers today, the next ones start from the day of the previous
+    # one, so the observations made just before midnight are not missed
+    since = datetime.today().strftime('%Y-%m-%d')
+    count = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while iterations == None or count < iterations:
+            count += 1
+            today = datetime.today().strftime('%Y-%m-%d')
+
+            try:
+                result = net.query(since, today, instrument, session=session)
+            except Exception as error:
+                print(f'watch: {error}', file=sys.stderr)
+                result = net.QueryResult([])
+                failed = True
+            else:
+                failed = False
+
+            new = new_observations(result, seen, instrument)
+            futures = {name: [pool.submit(_fetch, record, save_dir, saveplot and name != 'ecne', session) for record in records]
+                       for name, records in new.items()}
+
+            # Each instrument moves on to the last of its observations fetched in order, so one
+            # that fails is fetched again at the next query, without holding back the others
+            arrived = False
+            for name, records in new.items():
+                for record, future in zip(records, futures[name]):
+                    try:
+                        path, fetched = future.result()
+                    except Exception as error:
+                        print(f"watch: {name}: {record['filename']}: {error}", file=sys.stderr)
+                        failed = True
+                        break
+                    if fetched:
+                        downloaded.append(path)
+                        print(f"{name}: downloaded {record['filename']}")
+                    seen[name] = record
+                    arrived = True
+                for future in futures[name]:
+                    future.cancel()
+
+            _save_state(state_file, seen)
+            # The next query starts from the day of this one only once everything until then is fetched
+            if not failed:
+                since = today
+
+            wait = interval if arrived else min(wait * 2, max_interval)
+
+            if iterations == None or count < iterations:
+                time.sleep(wait)
+
+    return downloaded
+
+
 def cli():
     '''Creates command line interface that calls on the aigean_today function.
     '''
@@ -55,10 +256,26 @@ def cli():
     parser = ArgumentParser(description="Download the lates image from the ISA archives")
     parser.add_argument('-i', '--instrument', type=str, help='The instrument whose image to download')
     parser.add_argument('-s', '--saveplot', action='store_true', help='Set to True to save the picture as a PGN')
+    parser.add_argument('-w', '--watch', action='store_true', help='Keep running and download every new observation')
+    parser.add_argument('--interval', type=float, default=60, help='Seconds between two queries of --watch, by default 60')
+    parser.add_argument('--max-interval', type=float, default=900, help='Longest wait of --watch when nothing new arrives, by default 900')
+    parser.add_argument('--state', type=str, default=None, help='JSON file where --watch keeps the latest observation of each instrument')
+    add_profile_arguments(parser)
 
     arguments = parser.parse_args()
 
-    aigean_today(arguments.instrument, arguments.saveplot)
+    with profiled(arguments, 'aigean_today'):
+        if not arguments.watch:
+            aigean_today(arguments.instrument, arguments.saveplot)
+            return
+
+        try:
+            watch(arguments.instrument, arguments.saveplot, interval=arguments.interval,
+                  max_interval=arguments.max_interval, state_file=arguments.state)
+        except ValueError as error:
+            sys.exit(str(error))
+        except KeyboardInterrupt:
+            pass
 
 if __name__ == '__main__':
     cli()
\ No newline at end of file
@@ -1,7 +1,7 @@
 from aigeanpy.clustering import cluster
-from pathlib import Path
+from pathlib import Path, PurePath
 
-def kmeans(filename, clusters=3, iterations=10):
+def kmeans(filename, clusters=3, iterations=10, init=None):
     '''Given a filen a file that can be converted into a list of tuples,
     from said list of tuples, choose 'clusters' random points to be centres.
     Then assign each tuple in list to the centre it is closest to, recalculate
@@ -18,6 +18,10 @@ def kmeans(filename, clusters=3, iterations=10):
     iterations : int, optional
         maximum number of times to iterate over the function, by default 10
 
+    init : str, path object or list[tuple(float)], optional
+        the initial centres, one per cluster, or the name of a .npy file of centres
+        saved with clustering_numpy.save_centroids. By default random points are chosen.
+
     Returns
     -------
     list(tuple(float))
@@ -44,6 +48,10 @@ def kmeans(filename, clusters=3, iterations=10):
     for line in lines:
         points.append(tuple(map(float, line.strip().split(','))))
 
-    centres, all_alloc_points = cluster(points, clusters, iterations)
+    if isinstance(init, (str, PurePath)):
+        from aigeanpy.clustering_numpy import load_centroids
+        init = load_centroids(init).tolist()
+
+    centres, all_alloc_points = cluster(points, clusters, iterations, init=init)
 
     return all_alloc_points
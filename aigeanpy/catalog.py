@@ -0,0 +1,266 @@
+from datetime import datetime, timezone
+from pathlib import Path
+import os
+import sqlite3
+from aigeanpy.read_files import read_metadata
+
+
+
+# The catalog is a SQLite database with one row per observation. When SQLite
+# was built with the R*Tree module, the footprints are also kept in an R-tree
+# so that spatial queries never scan the whole table; otherwise they fall back
+# to comparing the extent columns of the observations table.
+
+IMAGE_EXTENSIONS = ['.asdf', '.hdf5', '.zip']
+
+
+def to_timestamp(value, end_of_day=False):
+    """ Convert a date, a date and time or a datetime into seconds since the epoch (UTC)
+
+    Parameters
+    ----------
+    value: str or datetime
+            such as '2022-12-12', '2022-12-12 12:38:48' or datetime(2022, 12, 12)
+
+    end_of_day: bool
+            if True and value is only a date, return the last second of that day
+
+    Returns
+    -------
+    int
+        seconds since the epoch
+
+    Examples
+    --------
+    >>> to_timestamp('2022-12-12 12:38:48')
+    1670848728
+    >>> to_timestamp('2022-12-12', end_of_day=True) - to_timestamp('2022-12-12')
+    86399
+    """
+
+    if type(value) == str:
+        date_only = len(value.strip()) == 10
+        value = datetime.fromisoformat(value.strip())
+        if date_only and end_of_day:
+            value = value.replace(hour=23, minute=59, second=59)
+
+    elif not isinstance(value, datetime):
+        raise TypeError('Dates must be strings in format YYYY-mm-dd [HH:MM:SS] or datetime objects')
+
+    if value.tzinfo == None:
+        value = value.replace(tzinfo=timezone.utc)
+
+    return int(value.timestamp())
+
+
+class Catalog:
+    """A spatiotemporal index of the observations stored on disk
+
+        Parameters
+        ----------
+        path: str or path object
+                Where to keep the index. The default value ':memory:' keeps it in memory only;
+                any other path keeps it between sessions so only new files need to be read.
+    """
+
+    def __init__(self, path=':memory:') -> None:
+        self.connection = sqlite3.connect(str(path))
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS observations (
+                                       id INTEGER PRIMARY KEY,
+                                       path TEXT UNIQUE,
+                                       instrument TEXT,
+                                       timestamp INTEGER,
+                                       resolution REAL,
+                                       xmin REAL, xmax REAL, ymin REAL, ymax REAL,
+                                       mtime INTEGER, size INTEGER)''')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS by_instrument_time ON observations (instrument, timestamp)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS by_time ON observations (timestamp)')
+
+        try:
+            self.connection.execute('CREATE VIRTUAL TABLE IF NOT EXISTS extents USING rtree(id, xmin, xmax, ymin, ymax)')
+            self.rtree = True
+        except sqlite3.OperationalError:
+            self.rtree = False
+
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM observations').fetchone()[0]
+
+    def close(self):
+        """Close the database of the catalog"""
+        self.connection.close()
+
+    def _delete(self, row_id):
+        self.connection.execute('DELETE FROM observations WHERE id = ?', (row_id,))
+        if self.rtree:
+            self.connection.execute('DELETE FROM extents WHERE id = ?', (row_id,))
+
+    def add(self, filename, commit=True):
+        """Add a file to the catalog, reading only its metadata. Files already in the catalog
+        are only read again if their modification time or size has changed.
+
+        Parameters
+        ----------
+        filename: str or path object
+                name of the file, such as aigean_man_20221212_123848.hdf5
+
+        commit: bool
+                commit the change to the database straight away, by default True
+
+        Returns
+        -------
+        bool
+            True if the file was (re)read, False if it was already up to date
+        """
+
+        path = str(Path(filename).absolute())
+        stat = os.stat(path)
+
+        row = self.connection.execute('SELECT id, mtime, size FROM observations WHERE path = ?', (path,)).fetchone()
+        if row:
+            if row[1] == stat.st_mtime_ns and row[2] == stat.st_size:
+                return False
+            self._delete(row[0])
+
+        metadata = read_metadata(path)
+        xcoords = [float(i) for i in metadata['xcoords']]
+        ycoords = [float(i) for i in metadata['ycoords']]
+        timestamp = to_timestamp(metadata['date'] + ' ' + metadata['time'])
+
+        cursor = self.connection.execute('''INSERT INTO observations
+                                                (path, instrument, timestamp, resolution, xmin, xmax, ymin, ymax, mtime, size)
+                                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                                         (path, metadata['instrument'].lower(), timestamp, float(metadata['resolution']),
+                                          xcoords[0], xcoords[1], ycoords[0], ycoords[1], stat.st_mtime_ns, stat.st_size))
+        if self.rtree:
+            self.connection.execute('INSERT INTO extents VALUES (?, ?, ?, ?, ?)',
+                                    (cursor.lastrowid, xcoords[0], xcoords[1], ycoords[0], ycoords[1]))
+        if commit:
+            self.connection.commit()
+
+        return True
+
+    def update(self, directory='.'):
+        """Bring the catalog up to date with the ASDF, HDF5 and zip files of a directory:
+        new and changed files are read, files that no longer exist are dropped,
+        and unchanged files are not opened at all.
+
+        Parameters
+        ----------
+        directory: str or path object
+                directory to scan, by default the current working directory
+
+        Returns
+        -------
+        int
+            the number of files read
+        """
+
+        directory = Path(directory).absolute()
+        found = set()
+        changed = 0
+
+        for entry in os.scandir(directory):
+            if entry.is_file() and os.path.splitext(entry.name)[1] in IMAGE_EXTENSIONS:
+                found.add(str(directory / entry.name))
+                try:
+                    changed += self.add(directory / entry.name, commit=False)
+                except (OSError, KeyError, ValueError):
+                    # Not an observation, or a truncated one: leave it out of the catalog
+                    continue
+
+        prefix = str(directory) + os.sep
+        for row_id, path in self.connection.execute('SELECT id, path FROM observations WHERE path LIKE ?', (prefix + '%',)).fetchall():
+            if os.path.dirname(path) == str(directory) and path not in found:
+                self._delete(row_id)
+
+        self.connection.commit()
+
+        return changed
+
+    def _select(self, columns, bbox, time_range, instrument):
+        query = f'SELECT {columns} FROM observations'
+        conditions = []
+        parameters = []
+
+        if bbox != None:
+            if len(bbox) != 4:
+                raise TypeError('bbox must be a tuple in format of (xmin, ymin, xmax, ymax)')
+            if self.rtree:
+                query += ' JOIN extents ON extents.id = observations.id'
+                table = 'extents'
+            else:
+                table = 'observations'
+            conditions += [f'{table}.xmax >= ?', f'{table}.xmin <= ?', f'{table}.ymax >= ?', f'{table}.ymin <= ?']
+            parameters += [bbox[0], bbox[2], bbox[1], bbox[3]]
+
+        if time_range != None:
+            if len(time_range) != 2:
+                raise TypeError('time_range must be a tuple in format of (start, stop)')
+            conditions.append('observations.timestamp BETWEEN ? AND ?')
+            parameters += [to_timestamp(time_range[0]), to_timestamp(time_range[1], end_of_day=True)]
+
+        if instrument != None:
+            if type(instrument) != str:
+                raise TypeError("Instrument must be a string and one of 'Lir', 'Manannan' or 'Fand'")
+            conditions.append('observations.instrument = ?')
+            parameters.append(instrument.lower())
+
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY observations.timestamp, observations.path'
+
+        return self.connection.execute(query, parameters).fetchall()
+
+    def files(self, bbox=None, time_range=None, instrument=None):
+        """Find the files of the observations matching a query, ordered by time
+
+        Parameters
+        ----------
+        bbox: tuple, optional
+                (xmin, ymin, xmax, ymax) in earth coordinates. Observations whose footprint
+                intersects it are returned, by default None (anywhere)
+
+        time_range: tuple, optional
+                (start, stop), both inclusive, as strings in format YYYY-mm-dd [HH:MM:SS] or datetimes,
+                by default None (any time)
+
+        instrument: str, optional
+                one of 'Lir', 'Manannan' or 'Fand' (case insensitive), by default None (all instruments)
+
+        Returns
+        -------
+        list[str]
+            the paths of the files
+        """
+
+        return [row[0] for row in self._select('observations.path', bbox, time_range, instrument)]
+
+    def footprints(self, bbox=None, time_range=None, instrument=None):
+        """Find the observations matching a query, as Catalog.files does, with what the catalog
+        knows of each without opening its file
+
+        Returns
+        -------
+        list[tuple]
+            (path, instrument, timestamp, resolution, xmin, xmax, ymin, ymax) of each observation
+        """
+
+        columns = ', '.join('observations.' + i for i in ['path', 'instrument', 'timestamp', 'resolution', 'xmin', 'xmax', 'ymin', 'ymax'])
+        return self._select(columns, bbox, time_range, instrument)
+
+    def find(self, bbox=None, time_range=None, instrument=None):
+        """Find the observations matching a query, ordered by time. The parameters are
+        the same as for Catalog.files; each file is only read when its SatMap is reached.
+
+        Returns
+        -------
+        generator
+            a SatMap for each observation found
+        """
+
+        from aigeanpy.satmap import get_satmap
+
+        for path in self.files(bbox=bbox, time_range=time_range, instrument=instrument):
+            yield get_satmap(path)
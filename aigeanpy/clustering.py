@@ -3,7 +3,7 @@ from math import sqrt
 from pathlib import Path
 from random import randrange
 
-def cluster(points, clusters=3 ,max_iterations=10):
+def cluster(points, clusters=3 ,max_iterations=10, init=None):
     '''From a list of tuples, choose 'clusters' random points to be centres.
     Then assign each tuple in list to the centre it is closest to, recalculate
     the centre, then iterate over 'max_iterations' number of times.
@@ -22,6 +22,10 @@ def cluster(points, clusters=3 ,max_iterations=10):
     max_iterations : int, optional
         maximum number of times to iterate over the function, by default 10
 
+    init : list[tuple(float)], optional
+        the initial centres, one per cluster, such as the centres of a previous
+        run. By default random points are chosen.
+
     Returns
     -------
     list(tuple(float))
@@ -40,7 +44,12 @@ def cluster(points, clusters=3 ,max_iterations=10):
     if max_iterations <= 0:
         raise ValueError("Function must iterate atleast once")
 
-    m = [points[randrange(len(points))], points[randrange(len(points))], points[randrange(len(points))]]
+    if init is None:
+        m = [points[randrange(len(points))], points[randrange(len(points))], points[randrange(len(points))]]
+    else:
+        m = [tuple(float(c) for c in centre) for centre in init]
+        if len(m) != clusters:
+            raise ValueError("init must have one centre per cluster")
 
     alloc = [None]*len(points)
 
@@ -57,11 +66,16 @@ def cluster(points, clusters=3 ,max_iterations=10):
 
     while ITERATIONS < max_iterations:
 
+        previous = list(alloc)
         for i, p in enumerate(points):
 
             d = distance_to_centre(clusters=clusters)
             alloc[i] = d.index(min(d))
 
+        # No point changed centre, so the centres would not move either
+        if alloc == previous:
+            break
+
         for i in range(clusters):
             alloc_points = [p for j, p in enumerate(points) if alloc[j] == i]
 
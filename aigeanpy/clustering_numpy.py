@@ -1,11 +1,14 @@
+import os
 import numpy as np
 from argparse import ArgumentParser
 from pathlib import Path
+from aigeanpy.tracing import traced, span
 
-def cluster(points, clusters=3, max_iterations=10):
+def cluster(points, clusters=3, max_iterations=10, init=None):
     '''From a list of tuples, choose 'clusters' random points to be centres.
     Then assign each tuple in list to the centre it is closest to, recalculate
-    the centre, then iterate over 'max_iterations' number of times.
+    the centre, then iterate over 'max_iterations' number of times, stopping
+    early once no point changes centre.
 
     This version uses the numpy library and is cosiderably faster than the
     non-numpy version, especially when there are large number of data points.
@@ -18,6 +21,9 @@ def cluster(points, clusters=3, max_iterations=10):
         number of clusters, by default 3
     max_iterations : int, optional
         maximum number of times to iterate over the function, by default 10
+    init : numpy.ndarray or list, optional
+        the initial centres, one per cluster, such as the centres of a previous
+        run loaded with load_centroids. By default random points are chosen.
 
     Returns
     -------
@@ -37,32 +43,321 @@ def cluster(points, clusters=3, max_iterations=10):
     if max_iterations <= 0:
         raise ValueError("Function must iterate atleast once")
 
-    points = np.array(points)
-    m = points[np.random.choice(points.shape[0], size = clusters, replace = False)]
+    points = np.array(points, dtype=np.float64)
+    if init is None:
+        m = points[np.random.choice(points.shape[0], size = clusters, replace = False)]
+    else:
+        m = _initial_centres(init, clusters, points.shape[1])
 
-    ITERATIONS = 0
+    # The same iterations as cluster_array, stopping once no point changes cluster
+    m, alloc = _lloyd(points, m, max_iterations)
 
-    while ITERATIONS < max_iterations:
-        points_transformed = np.tile(points,(3,1))
-        points_transformed = np.reshape(points_transformed,(np.shape(points)[0],clusters,np.shape(points)[1]),order='F')
-
-        points_to_centres = np.linalg.norm((points_transformed - m),axis=2)
-
-        alloc = np.argmin(points_to_centres, axis=1)
-
-        for i in range(clusters):
-            m[i] = np.mean(points[alloc==i], axis=0)
-        ITERATIONS = max_iterations + 1
-    
-    m = []
     all_alloc_points = []
     for j in range(clusters):
-        alloc_points=[p for k, p in enumerate(points) if alloc[k] == j]
-        all_alloc_points.append(alloc_points)
-        m.append(np.mean(points[alloc==j], axis=0))
+        all_alloc_points.append(list(points[alloc == j]))
 
     return np.array(m), all_alloc_points
 
+@traced('cluster_array')
+def cluster_array(points, clusters=3, max_iterations=10, seed=None, init=None):
+    '''k-means clustering of the rows of a 2-D array.
+
+    Every iteration is a single vectorised pass over the points: the squared
+    distances to all the centres are computed as one matrix product and the
+    centres are updated with np.bincount, so no Python tuples are involved.
+    Iterating stops early once no point changes cluster. A cluster that loses
+    all its points keeps its previous centre. Started from the centres of a
+    previous run on similar points (init), it usually stops after a few iterations.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        array of shape (number of points, number of features)
+    clusters : int, optional
+        number of clusters, by default 3
+    max_iterations : int, optional
+        maximum number of times to iterate over the function, by default 10
+    seed : int, optional
+        seed of the random choice of the initial centres, by default None
+    init : numpy.ndarray, optional
+        the initial centres, of shape (clusters, number of features), such as the
+        centres of a previous run loaded with load_centroids. By default the initial
+        centres are random points and seed is used.
+
+    Returns
+    -------
+    return1 : numpy.ndarray
+        the final centres of the clusters, of shape (clusters, number of features)
+    return2 : numpy.ndarray
+        the cluster of each point, as int32
+    '''
+
+    if type(clusters) != int or type(max_iterations) != int:
+        raise TypeError("Clusters and iterations must be integers")
+
+    if clusters <= 0:
+        raise ValueError("There must be at least one cluster")
+
+    if max_iterations <= 0:
+        raise ValueError("Function must iterate atleast once")
+
+    points = np.asarray(points, dtype=np.float64)
+    if points.ndim != 2:
+        raise ValueError("points must be a 2-D array of shape (number of points, number of features)")
+
+    if points.shape[0] < clusters:
+        raise ValueError("There must be at least as many points as clusters")
+
+    if init is None:
+        rng = np.random.default_rng(seed)
+        m = points[rng.choice(points.shape[0], size=clusters, replace=False)].copy()
+    else:
+        m = _initial_centres(init, clusters, points.shape[1])
+
+    return _lloyd(points, m, max_iterations)
+
+
+def _assign(points, m):
+    # |p - m|^2 = |p|^2 - 2 p.m + |m|^2, and |p|^2 is the same for every centre
+    distances = (m**2).sum(axis=1) - 2 * points @ m.T
+    return np.argmin(distances, axis=1).astype(np.int32)
+
+
+def _initial_centres(init, clusters, n_features):
+    m = np.array(init, dtype=np.float64)
+    if m.shape != (clusters, n_features):
+        raise ValueError(f"init must have one centre per cluster, of shape ({clusters}, {n_features})")
+    if not np.isfinite(m).all():
+        raise ValueError("init must only contain finite values")
+    return m
+
+
+def _lloyd(points, m, max_iterations):
+    clusters = m.shape[0]
+    alloc = None
+
+    for iteration in range(max_iterations):
+        with span('kmeans.iteration', iteration=iteration, points=points.shape[0]):
+            new_alloc = _assign(points, m)
+            if alloc is not None and np.array_equal(new_alloc, alloc):
+                return m, alloc
+            alloc = new_alloc
+
+            counts = np.bincount(alloc, minlength=clusters)
+            for j in range(points.shape[1]):
+                sums = np.bincount(alloc, weights=points[:, j], minlength=clusters)
+                m[counts > 0, j] = sums[counts > 0] / counts[counts > 0]
+
+    # The centres moved in the last iteration, so assign the points to them once more
+    return m, _assign(points, m)
+
+
+@traced('cluster_chunked')
+def cluster_chunked(points, clusters=3, max_iterations=10, seed=None, chunk_size=65536, labels=None, init=None):
+    '''k-means clustering of the rows of a 2-D array too large to hold in memory
+    more than chunk_size rows at a time, such as an array memory-mapped with
+    np.load(filename, mmap_mode='r').
+
+    Each iteration reads the points once, chunk by chunk, assigning every chunk
+    to the current centres and accumulating the per-cluster sums and counts from
+    which the next centres are computed. The results are the same as those of
+    cluster_array with the same seed or initial centres.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        array of shape (number of points, number of features)
+    clusters : int, optional
+        number of clusters, by default 3
+    max_iterations : int, optional
+        maximum number of times to iterate over the function, by default 10
+    seed : int, optional
+        seed of the random choice of the initial centres, by default None
+    init : numpy.ndarray, optional
+        the initial centres, of shape (clusters, number of features), such as the
+        centres of a previous run loaded with load_centroids. By default the initial
+        centres are random points and seed is used.
+    chunk_size : int, optional
+        number of points read at a time, by default 65536
+    labels : numpy.ndarray, optional
+        int32 array of shape (number of points,) to write the cluster of each point
+        into, such as one made with np.lib.format.open_memmap. By default a new
+        array is allocated.
+
+    Returns
+    -------
+    return1 : numpy.ndarray
+        the final centres of the clusters, of shape (clusters, number of features)
+    return2 : numpy.ndarray
+        the cluster of each point, as int32
+    '''
+
+    if type(clusters) != int or type(max_iterations) != int or type(chunk_size) != int:
+        raise TypeError("Clusters, iterations and chunk_size must be integers")
+
+    if clusters <= 0:
+        raise ValueError("There must be at least one cluster")
+
+    if max_iterations <= 0:
+        raise ValueError("Function must iterate atleast once")
+
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be a positive integer")
+
+    if points.ndim != 2:
+        raise ValueError("points must be a 2-D array of shape (number of points, number of features)")
+
+    n_points, n_features = points.shape
+    if n_points < clusters:
+        raise ValueError("There must be at least as many points as clusters")
+
+    if labels is None:
+        labels = np.empty(n_points, dtype=np.int32)
+    elif labels.shape != (n_points,) or labels.dtype != np.int32:
+        raise ValueError("labels must be an int32 array with one element per point")
+
+    if init is None:
+        rng = np.random.default_rng(seed)
+        m = np.array(points[rng.choice(n_points, size=clusters, replace=False)], dtype=np.float64)
+    else:
+        m = _initial_centres(init, clusters, n_features)
+
+    for iteration in range(max_iterations):
+        sums = np.zeros((clusters, n_features))
+        counts = np.zeros(clusters, dtype=np.int64)
+        changed = 0
+
+        with span('kmeans.iteration', iteration=iteration, points=n_points):
+            for start in range(0, n_points, chunk_size):
+                chunk = np.asarray(points[start:start + chunk_size], dtype=np.float64)
+                alloc = _assign(chunk, m)
+
+                if iteration > 0:
+                    changed += np.count_nonzero(alloc != labels[start:start + chunk_size])
+                labels[start:start + chunk_size] = alloc
+
+                counts += np.bincount(alloc, minlength=clusters)
+                for j in range(n_features):
+                    sums[:, j] += np.bincount(alloc, weights=chunk[:, j], minlength=clusters)
+
+        if iteration > 0 and changed == 0:
+            return m, labels
+
+        m[counts > 0] = sums[counts > 0] / counts[counts > 0, None]
+
+    # The centres moved in the last iteration, so assign the points to them once more
+    for start in range(0, n_points, chunk_size):
+        labels[start:start + chunk_size] = _assign(np.asarray(points[start:start + chunk_size], dtype=np.float64), m)
+
+    return m, labels
+
+
+@traced('kmeans_predict')
+def predict(points, centres, chunk_size=65536, labels=None):
+    '''Assign points to the closest of fixed centres, such as the centres of a
+    previous clustering, without clustering them again.
+
+    The points are read chunk_size rows at a time, so they can be a memory-mapped
+    array larger than memory, and each chunk is assigned in one vectorised pass.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        array of shape (number of points, number of features)
+    centres : numpy.ndarray
+        array of shape (clusters, number of features)
+    chunk_size : int, optional
+        number of points read at a time, by default 65536
+    labels : numpy.ndarray, optional
+        int32 array of shape (number of points,) to write the cluster of each point
+        into. By default a new array is allocated.
+
+    Returns
+    -------
+    numpy.ndarray
+        the cluster of each point, as int32
+
+    Examples
+    --------
+    >>> predict(np.array([[0.0, 1.0], [9.0, 9.0]]), np.array([[0.0, 0.0], [10.0, 10.0]]))
+    array([0, 1], dtype=int32)
+    '''
+
+    if type(chunk_size) != int or chunk_size <= 0:
+        raise ValueError("chunk_size must be a positive integer")
+
+    if points.ndim != 2:
+        raise ValueError("points must be a 2-D array of shape (number of points, number of features)")
+
+    centres = np.asarray(centres, dtype=np.float64)
+    if centres.ndim != 2 or centres.shape[1] != points.shape[1] or centres.shape[0] == 0:
+        raise ValueError("centres must be a 2-D array with as many features as the points")
+
+    n_points = points.shape[0]
+    if labels is None:
+        labels = np.empty(n_points, dtype=np.int32)
+    elif labels.shape != (n_points,) or labels.dtype != np.int32:
+        raise ValueError("labels must be an int32 array with one element per point")
+
+    for start in range(0, n_points, chunk_size):
+        labels[start:start + chunk_size] = _assign(np.asarray(points[start:start + chunk_size], dtype=np.float64), centres)
+
+    return labels
+
+
+def save_centroids(filename, centres):
+    '''Save the centres of clusters as a .npy file, to start a later
+    clustering from them (init) or to assign new points to them (predict).
+
+    The file is written under a temporary name and renamed once complete,
+    so a run reading it never sees half a file.
+
+    Parameters
+    ----------
+    filename : str or path object
+        name of the file, such as ecne_centres.npy
+    centres : numpy.ndarray
+        array of shape (clusters, number of features)
+    '''
+
+    if not isinstance(filename, (str, os.PathLike)):
+        raise TypeError("filename must be a string or a path object")
+
+    centres = np.asarray(centres, dtype=np.float64)
+    if centres.ndim != 2:
+        raise ValueError("centres must be a 2-D array of shape (clusters, number of features)")
+
+    filename = os.fspath(filename)
+    with open(filename + '.part', 'wb') as f:
+        np.save(f, centres)
+    os.replace(filename + '.part', filename)
+
+
+def load_centroids(filename):
+    '''Load centres of clusters saved with save_centroids (or as the centres
+    of aigean_cluster).
+
+    Parameters
+    ----------
+    filename : str or path object
+        name of the .npy file
+
+    Returns
+    -------
+    numpy.ndarray
+        float64 array of shape (clusters, number of features)
+    '''
+
+    if not isinstance(filename, (str, os.PathLike)):
+        raise TypeError("filename must be a string or a path object")
+
+    centres = np.load(filename, allow_pickle=False)
+    if centres.ndim != 2:
+        raise ValueError("The centres must be a 2-D array of shape (clusters, number of features)")
+
+    return centres.astype(np.float64, copy=False)
+
+
 def cli():
     parser = ArgumentParser(description="Call the normal cluster function")
     parser.add_argument('filename', type=str, help='Name of the file that contains the points')
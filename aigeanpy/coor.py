@@ -1,6 +1,7 @@
-from aigeanpy.read_files import read_file
 import os
-import aigeanpy.net as net
+
+# aigeanpy imports this module, so the readers (and numpy behind them) are only
+# imported when a conversion is asked for.
 
 
 
@@ -25,6 +26,7 @@ class coor():
 
         Examples
         --------
+        >>> import aigeanpy.net as net
         >>> if os.path.exists('aigean_lir_20221212_123848.asdf') != True: net.download_isa("aigean_lir_20221212_123848.asdf")
         >>> coor.pixel_to_earth('aigean_lir_20221212_123848.asdf', (1,1))
         (45.0, 255.0)
@@ -37,11 +39,12 @@ class coor():
         if type(coordinates[0]) != int or type(coordinates[1]) != int:
             raise TypeError ("The number in coordinates must be integer")
 
+        from aigeanpy.metadata import SatMetadata
+        from aigeanpy.read_files import read_file
+
         metadata, data = read_file(filename)
+        metadata = SatMetadata(metadata)
         array_shape = data.shape
-        xcoords = metadata['xcoords']
-        ycoords = metadata['ycoords']
-        resolution = metadata['resolution']
     
 
         if coordinates[0] < 0 or coordinates[0] > (array_shape[0]-1):
@@ -50,10 +53,7 @@ class coor():
         if coordinates[1] < 0 or coordinates[1] > (array_shape[1]-1):
             raise ValueError ("The value of pixel coordinates is out of range")
 
-        x_earth = xcoords[0] + coordinates[1]*resolution + 0.5*resolution
-        y_earth = ycoords[1] - coordinates[0]*resolution - 0.5*resolution
-
-        earth_coords = (x_earth, y_earth)
+        earth_coords = metadata.pixel_to_earth(coordinates[0], coordinates[1])
 
         return earth_coords
 
@@ -77,6 +77,7 @@ class coor():
 
         Examples
         --------
+        >>> import aigeanpy.net as net
         >>> if os.path.exists('aigean_lir_20221212_123848.asdf') != True: net.download_isa("aigean_lir_20221212_123848.asdf")
         >>> coor.earth_to_pixel('aigean_lir_20221212_123848.asdf', (300.0, 150.0))
         (5.0, 9.0)
@@ -88,11 +89,13 @@ class coor():
         if type(coordinates) != tuple or len(coordinates) != 2:
             raise TypeError ("The type of coordinates must be tuple in format of (x, y)")
 
-        metadata, data = read_file(filename)
-        array_shape = data.shape
-        xcoords = metadata['xcoords']
-        ycoords = metadata['ycoords']
-        resolution = metadata['resolution']
+        from aigeanpy.metadata import SatMetadata
+        from aigeanpy.read_files import read_file
+
+        metadata = SatMetadata(read_file(filename)[0])
+        xcoords = metadata.xcoords
+        ycoords = metadata.ycoords
+        resolution = metadata.resolution
 
         if coordinates[0] < xcoords[0] or coordinates[0] > xcoords[1]:
             raise ValueError ("The value of earth coordinates is out of range")
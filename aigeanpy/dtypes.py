@@ -0,0 +1,111 @@
+from contextlib import contextmanager
+import threading
+import numpy as np
+
+
+# The dtype policy decides the dtype of the data aigeanpy reads, computes and
+# writes. By default (None) data keeps its native dtype: a float32 image stays
+# float32 through read_file, SatMap arithmetic and mosaics, and the canvases of
+# SatMap.__add__ and SatMap.mosaic are allocated in the dtype of the images
+# instead of always float64. A dtype can be set for the whole program with
+# set_dtype, for a block of code with use_dtype, or for one call with the dtype
+# argument of read_file, get_satmap and SatMap.mosaic. Reductions that sum many
+# values (SatMapStack statistics, clustering, Ecne statistics) still accumulate
+# in float64 and only store their results in the policy dtype.
+
+_policy = threading.local()
+_global_dtype = None
+
+
+def _check(dtype):
+    if dtype is None:
+        return None
+
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'f':
+        raise TypeError('The dtype must be a floating point dtype, such as float32 or float64')
+    return dtype
+
+
+def set_dtype(dtype):
+    """ Set the dtype of the data read and computed by aigeanpy
+
+    Parameters
+    ----------
+    dtype: str or numpy.dtype
+            a floating point dtype, such as 'float32', or None to keep the native dtype of the data
+    """
+
+    global _global_dtype
+    _global_dtype = _check(dtype)
+
+
+def get_dtype():
+    """ Get the dtype in use, None if the data keeps its native dtype """
+
+    return getattr(_policy, 'dtype', _global_dtype)
+
+
+@contextmanager
+def use_dtype(dtype):
+    """ Use a dtype for the data read and computed inside a with block, in this thread only
+
+    Examples
+    --------
+    >>> with use_dtype('float32'):
+    ...     get_dtype()
+    dtype('float32')
+    >>> get_dtype() is None
+    True
+    """
+
+    nested = hasattr(_policy, 'dtype')
+    previous = getattr(_policy, 'dtype', None)
+    _policy.dtype = _check(dtype)
+    try:
+        yield _policy.dtype
+    finally:
+        # Outside any with block the thread follows set_dtype again
+        if nested:
+            _policy.dtype = previous
+        else:
+            del _policy.dtype
+
+
+def resolve_dtype(dtype=None):
+    """ Get the dtype of one call: its own dtype argument if given, otherwise the policy in use """
+
+    if dtype is not None:
+        return _check(dtype)
+    return get_dtype()
+
+
+def result_dtype(*arrays, dtype=None):
+    """ Get the dtype of the result of combining arrays: the dtype of the call or the policy if set,
+    otherwise the native floating point dtype of the arrays (float64 for integer data)
+
+    Examples
+    --------
+    >>> result_dtype(np.ones(2, dtype=np.float32), np.ones(2, dtype=np.float32))
+    dtype('float32')
+    >>> result_dtype(np.ones(2, dtype=np.int16))
+    dtype('float64')
+    """
+
+    dtype = resolve_dtype(dtype)
+    if dtype is not None:
+        return dtype
+
+    native = np.result_type(*arrays)
+    if native.kind != 'f':
+        return np.dtype(np.float64)
+    return native
+
+
+def as_dtype(array, dtype=None):
+    """ Get an array in the dtype of the call or the policy, without copying if it already is """
+
+    dtype = resolve_dtype(dtype)
+    if dtype is None or array.dtype == dtype:
+        return array
+    return array.astype(dtype)
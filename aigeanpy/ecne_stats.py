@@ -0,0 +1,357 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import json
+import math
+import os
+import numpy as np
+import aigeanpy.net as net
+
+
+# The statistics of Ecne files are computed in one pass over each file, a
+# chunk of lines at a time, and kept as summaries that can be merged: the
+# moments with the pairwise update of Chan et al. (the merge form of Welford's
+# algorithm) and the quantiles with a DDSketch-style histogram of logarithmic
+# buckets, whose quantiles are within relative_accuracy of the exact ones.
+# A summary of a day of files merged with the summaries of the other days is
+# the same as the summary of the week, so raw files never need re-reading.
+
+VARIABLES = ['turbulence', 'salinity', 'algal_density']
+
+
+class QuantileSketch:
+    """A mergeable sketch of the distribution of a variable
+
+        Parameters
+        ----------
+        relative_accuracy: float
+                the quantiles returned are within this relative error of the
+                exact ones, by default 0.01
+    """
+
+    # Values closer to zero than this are counted as zero
+    MIN_VALUE = 1e-9
+
+    def __init__(self, relative_accuracy=0.01) -> None:
+
+        if type(relative_accuracy) != float or not 0 < relative_accuracy < 1:
+            raise ValueError('relative_accuracy must be a float between 0 and 1')
+
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+
+    def __len__(self):
+        return self.zeros + sum(self.positive.values()) + sum(self.negative.values())
+
+    def _add_to(self, store, magnitudes):
+        indices, counts = np.unique(np.ceil(np.log(magnitudes) / math.log(self.gamma)).astype(np.int64), return_counts=True)
+        for index, count in zip(indices.tolist(), counts.tolist()):
+            store[index] = store.get(index, 0) + count
+
+    def add(self, values):
+        """Add an array of values to the sketch"""
+
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+
+        self.zeros += int(np.count_nonzero(np.abs(values) < self.MIN_VALUE))
+        self._add_to(self.positive, values[values >= self.MIN_VALUE])
+        self._add_to(self.negative, -values[values <= -self.MIN_VALUE])
+
+    def merge(self, other):
+        """Add the values of another sketch with the same relative_accuracy to this one"""
+
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Only sketches with the same relative_accuracy can be merged')
+
+        for store, other_store in [(self.positive, other.positive), (self.negative, other.negative)]:
+            for index, count in other_store.items():
+                store[index] = store.get(index, 0) + count
+        self.zeros += other.zeros
+        return self
+
+    def _value(self, index):
+        return 2 * self.gamma**index / (self.gamma + 1)
+
+    def quantile(self, q):
+        """Get the q-quantile (0 <= q <= 1) of the values added, None if there are none"""
+
+        if not 0 <= q <= 1:
+            raise ValueError('q must be between 0 and 1')
+
+        total = len(self)
+        if total == 0:
+            return None
+
+        rank = q * (total - 1)
+        seen = 0
+
+        # From the most negative value to the largest one
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+
+        return self._value(max(self.positive))
+
+    def to_dict(self):
+        return {'relative_accuracy': self.relative_accuracy, 'zeros': self.zeros,
+                'positive': {str(k): v for k, v in self.positive.items()},
+                'negative': {str(k): v for k, v in self.negative.items()}}
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state['relative_accuracy'])
+        sketch.zeros = state['zeros']
+        sketch.positive = {int(k): v for k, v in state['positive'].items()}
+        sketch.negative = {int(k): v for k, v in state['negative'].items()}
+        return sketch
+
+
+class EcneStats:
+    """Summary statistics of the turbulence, salinity and algal density measured by Ecne
+
+        Parameters
+        ----------
+        relative_accuracy: float
+                relative accuracy of the quantiles, by default 0.01
+
+        Attributes
+        ----------
+        count, mean, min, max: numpy.ndarray
+                per variable, in the order of VARIABLES. Values that are not finite are skipped.
+
+        Examples
+        --------
+        >>> stats = EcneStats()
+        >>> stats.add(np.array([[1., 2., 3.], [3., 4., 5.]]))
+        >>> stats.mean.tolist()
+        [2.0, 3.0, 4.0]
+        >>> stats.variance().tolist()
+        [2.0, 2.0, 2.0]
+    """
+
+    def __init__(self, relative_accuracy=0.01) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.count = np.zeros(len(VARIABLES), dtype=np.int64)
+        self.mean = np.zeros(len(VARIABLES))
+        self.m2 = np.zeros(len(VARIABLES))
+        self.min = np.full(len(VARIABLES), np.inf)
+        self.max = np.full(len(VARIABLES), -np.inf)
+        self.sketches = [QuantileSketch(relative_accuracy) for _ in VARIABLES]
+
+    def _merge_moments(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(total > 0, self.mean + delta * count / total, 0.0)
+            self.m2 = np.where(total > 0, self.m2 + m2 + delta**2 * self.count * count / total, 0.0)
+        self.count = total
+
+    def add(self, rows):
+        """Add measurements, an array with one row per measurement and one column per variable"""
+
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim != 2 or rows.shape[1] != len(VARIABLES):
+            raise ValueError(f'The measurements must have {len(VARIABLES)} columns: ' + ', '.join(VARIABLES))
+
+        finite = np.isfinite(rows)
+        count = finite.sum(axis=0)
+        values = np.where(finite, rows, 0.0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, values.sum(axis=0) / count, 0.0)
+        m2 = (np.where(finite, rows - mean, 0.0)**2).sum(axis=0)
+        self._merge_moments(count, mean, m2)
+
+        self.min = np.minimum(self.min, np.where(finite, rows, np.inf).min(axis=0, initial=np.inf))
+        self.max = np.maximum(self.max, np.where(finite, rows, -np.inf).max(axis=0, initial=-np.inf))
+
+        for sketch, column in zip(self.sketches, rows.T):
+            sketch.add(column)
+
+    def merge(self, other):
+        """Add the statistics of another EcneStats to this one, as if its measurements had been added"""
+
+        self._merge_moments(other.count, other.mean, other.m2)
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+        return self
+
+    def variance(self, ddof=1):
+        """Get the variance of each variable, nan if there are not more than ddof measurements"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan)
+
+    def std(self, ddof=1):
+        """Get the standard deviation of each variable"""
+        return np.sqrt(self.variance(ddof))
+
+    def quantile(self, q):
+        """Get the q-quantile of each variable, within relative_accuracy"""
+        return np.array([np.nan if sketch.quantile(q) == None else sketch.quantile(q) for sketch in self.sketches])
+
+    def summary(self, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        """Get the statistics of each variable as a dictionary, such as summary()['salinity']['mean']"""
+
+        result = {}
+        variance = self.variance()
+        for i, variable in enumerate(VARIABLES):
+            result[variable] = {'count': int(self.count[i]), 'mean': float(self.mean[i]),
+                                'variance': float(variance[i]), 'min': float(self.min[i]), 'max': float(self.max[i])}
+            for q in quantiles:
+                result[variable][f'q{q:g}'] = self.sketches[i].quantile(q)
+        return result
+
+    def to_dict(self):
+        return {'variables': VARIABLES, 'relative_accuracy': self.relative_accuracy,
+                'count': self.count.tolist(), 'mean': self.mean.tolist(), 'm2': self.m2.tolist(),
+                'min': self.min.tolist(), 'max': self.max.tolist(),
+                'sketches': [sketch.to_dict() for sketch in self.sketches]}
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls(state['relative_accuracy'])
+        stats.count = np.array(state['count'], dtype=np.int64)
+        for key in ['mean', 'm2', 'min', 'max']:
+            setattr(stats, key, np.array(state[key], dtype=np.float64))
+        stats.sketches = [QuantileSketch.from_dict(i) for i in state['sketches']]
+        return stats
+
+    def save(self, filename):
+        """Save the statistics to a JSON file, to be merged later with others"""
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, filename):
+        """Read statistics saved with save"""
+        with open(filename, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+
+def summarise_file(filename, chunk_lines=100000, relative_accuracy=0.01):
+    """ Compute the statistics of an Ecne file in one pass, chunk_lines lines at a time
+
+    Parameters
+    ----------
+    filename: str
+            name of the file, such as aigean_ecn_20221212_123848.csv. It is downloaded if it is not on disk
+
+    chunk_lines: int
+            number of lines read at a time, by default 100000
+
+    relative_accuracy: float
+            relative accuracy of the quantiles, by default 0.01
+
+    Returns
+    -------
+    EcneStats
+        the statistics of the file
+    """
+
+    if type(filename) != str:
+        raise TypeError('filename must be of type string')
+
+    if type(chunk_lines) != int or chunk_lines <= 0:
+        raise ValueError('chunk_lines must be a positive integer')
+
+    if os.path.exists(filename) != True:
+        net.download_isa(filename)
+
+    stats = EcneStats(relative_accuracy)
+    with open(filename, 'r') as f:
+        while True:
+            lines = list(islice(f, chunk_lines))
+            if not lines:
+                break
+            stats.add(np.loadtxt(lines, delimiter=',', ndmin=2))
+
+    return stats
+
+
+def _summarise(job):
+    filename, chunk_lines, relative_accuracy = job
+    return summarise_file(filename, chunk_lines, relative_accuracy)
+
+
+def summarise_files(filenames, workers=None, chunk_lines=100000, relative_accuracy=0.01):
+    """ Compute the statistics of many Ecne files, in parallel across processes, merged into one
+
+    Parameters
+    ----------
+    filenames: list[str]
+            names of the files
+
+    workers: int
+            number of worker processes, by default None (one per CPU).
+            With workers=1 the files are read in this process.
+
+    chunk_lines: int
+            number of lines read at a time, by default 100000
+
+    relative_accuracy: float
+            relative accuracy of the quantiles, by default 0.01
+
+    Returns
+    -------
+    EcneStats
+        the statistics of all the files together
+    """
+
+    if type(filenames) != list:
+        raise TypeError('filenames must be a list')
+
+    if workers != None and (type(workers) != int or workers <= 0):
+        raise ValueError('workers must be a positive integer')
+
+    jobs = [(filename, chunk_lines, relative_accuracy) for filename in filenames]
+    stats = EcneStats(relative_accuracy)
+
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            stats.merge(_summarise(job))
+        return stats
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(_summarise, jobs):
+            stats.merge(partial)
+
+    return stats
+
+
+def merge_stats(summaries):
+    """ Merge statistics, such as those of each day saved with EcneStats.save, into one
+
+    Parameters
+    ----------
+    summaries: list[EcneStats or str]
+            statistics, or names of the JSON files they were saved to
+
+    Returns
+    -------
+    EcneStats
+        the statistics of all the measurements together
+    """
+
+    if type(summaries) != list or len(summaries) == 0:
+        raise TypeError('summaries must be a non-empty list')
+
+    summaries = [EcneStats.load(i) if type(i) == str else i for i in summaries]
+    stats = EcneStats(summaries[0].relative_accuracy)
+    for summary in summaries:
+        stats.merge(summary)
+    return stats
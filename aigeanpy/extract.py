@@ -0,0 +1,184 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+from aigeanpy.catalog import Catalog, to_timestamp
+from aigeanpy.metadata import SatMetadata
+from aigeanpy.read_files import read_metadata, read_pixels
+from aigeanpy.tracing import traced
+
+
+# extract_points samples many observations at many earth coordinates. The
+# footprint of every observation is known before any data is read (from the
+# catalog, or from the metadata of each file), so the points are grouped by
+# the observations that contain them: the points are sorted by x once, and
+# each footprint takes the points between its x edges with two binary
+# searches. Each file is then opened once, in parallel across files, and only
+# the window around its points is read (see read_files.read_pixels).
+
+METHODS = ['nearest', 'bilinear']
+
+
+def _observation(filename):
+    metadata = read_metadata(filename)
+    timestamp = to_timestamp(metadata['date'] + ' ' + metadata['time'])
+    return filename, metadata['instrument'].lower(), timestamp, SatMetadata(metadata)
+
+
+def _observations(files_or_catalog, bbox, time_range, workers):
+    if isinstance(files_or_catalog, Catalog):
+        return [(path, instrument, timestamp, SatMetadata(xcoords=[xmin, xmax], ycoords=[ymin, ymax], resolution=resolution))
+                for path, instrument, timestamp, resolution, xmin, xmax, ymin, ymax
+                in files_or_catalog.footprints(bbox=bbox, time_range=time_range)]
+
+    if type(files_or_catalog) != list or any(type(i) != str for i in files_or_catalog):
+        raise TypeError('files_or_catalog must be a Catalog or a list of filenames')
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_observation, files_or_catalog))
+
+
+def _sample(observation, xs, ys, points, method):
+    path, instrument, timestamp, metadata = observation
+    x_left, resolution, _, y_top, _, _ = metadata.geotransform
+
+    rows, cols = metadata.earth_to_pixel(xs, ys)
+
+    if method == 'nearest':
+        values = read_pixels(path, rows, cols).astype(np.float64)
+
+    else:
+        # Distances in pixels from the centre of the first pixel, kept inside the image,
+        # so points less than half a pixel from an edge take the values of the edge
+        last_row = round((metadata.ycoords[1] - metadata.ycoords[0]) / resolution) - 1
+        last_col = round((metadata.xcoords[1] - metadata.xcoords[0]) / resolution) - 1
+        fraction_rows = np.clip((y_top - ys) / resolution - 0.5, 0, last_row)
+        fraction_cols = np.clip((xs - x_left) / resolution - 0.5, 0, last_col)
+
+        top = np.floor(fraction_rows).astype(np.int64)
+        left = np.floor(fraction_cols).astype(np.int64)
+        bottom = np.minimum(top + 1, last_row)
+        right = np.minimum(left + 1, last_col)
+        weight_rows = fraction_rows - top
+        weight_cols = fraction_cols - left
+
+        corners = read_pixels(path, np.concatenate([top, top, bottom, bottom]),
+                              np.concatenate([left, right, left, right])).astype(np.float64).reshape(4, -1)
+        values = (corners[0] * (1 - weight_rows) * (1 - weight_cols) + corners[1] * (1 - weight_rows) * weight_cols
+                  + corners[2] * weight_rows * (1 - weight_cols) + corners[3] * weight_rows * weight_cols)
+
+    return points, path, instrument, timestamp, rows, cols, values
+
+
+def _table(samples, width):
+    dtype = [('point', np.int64), ('filename', f'U{max(width, 1)}'), ('instrument', 'U16'), ('time', 'datetime64[s]'),
+             ('row', np.int64), ('col', np.int64), ('value', np.float64)]
+    size = sum(len(i[0]) for i in samples)
+    table = np.zeros(size, dtype=dtype)
+
+    start = 0
+    for points, path, instrument, timestamp, rows, cols, values in samples:
+        end = start + len(points)
+        table['point'][start:end] = points
+        table['filename'][start:end] = path
+        table['instrument'][start:end] = instrument
+        table['time'][start:end] = np.datetime64(timestamp, 's')
+        table['row'][start:end] = rows
+        table['col'][start:end] = cols
+        table['value'][start:end] = values
+        start = end
+
+    return table
+
+
+@traced('extract_points', record=lambda table: {'rows': len(table)})
+def extract_points(files_or_catalog, xs, ys, times=None, method='nearest', max_delta=None, workers=4):
+    """ Get the values of observations at earth coordinates
+
+    Parameters
+    ----------
+    files_or_catalog: list[str] or Catalog
+            the observations to sample: a list of ASDF, HDF5 or zip files, or a Catalog,
+            from which only the observations around the points are taken
+
+    xs, ys: ndarray
+            earth coordinates of the points
+
+    times: ndarray, optional
+            time of each point, as strings in format YYYY-mm-dd[THH:MM:SS] or datetime64. When given,
+            each point is only sampled in the observation covering it that is closest in time.
+            By default every observation covering a point is sampled.
+
+    method: str
+            'nearest' (the default) takes the value of the pixel containing the point, 'bilinear'
+            interpolates between the centres of the four pixels around it
+
+    max_delta: float, optional
+            with times, the largest difference in seconds between a point and its observation
+
+    workers: int
+            number of files read at the same time, by default 4
+
+    Returns
+    -------
+    numpy.ndarray
+        a structured array with one row per point sampled in an observation, ordered by point and time,
+        with fields 'point' (the index of the point in xs), 'filename', 'instrument', 'time',
+        'row' and 'col' (the pixel containing the point) and 'value'
+    """
+
+    if method not in METHODS:
+        raise ValueError("method must be 'nearest' or 'bilinear'")
+
+    if type(workers) != int or workers <= 0:
+        raise ValueError('workers must be a positive integer')
+
+    xs = np.asarray(xs, dtype=np.float64).reshape(-1)
+    ys = np.asarray(ys, dtype=np.float64).reshape(-1)
+
+    if xs.shape != ys.shape:
+        raise ValueError('xs and ys must have the same length')
+
+    if times is not None:
+        times = np.asarray(times, dtype='datetime64[s]').reshape(-1).astype(np.int64)
+        if times.shape != xs.shape:
+            raise ValueError('times must have one time per point')
+
+    if len(xs) == 0:
+        return _table([], 1)
+
+    bbox = (xs.min(), ys.min(), xs.max(), ys.max())
+    time_range = None
+    if times is not None and max_delta is not None:
+        time_range = tuple(datetime.fromtimestamp(int(i), timezone.utc) for i in [times.min() - max_delta, times.max() + max_delta])
+
+    observations = _observations(files_or_catalog, bbox, time_range, workers)
+
+    # The points inside each footprint: x0 <= x < x1 and y0 < y <= y1, as for earth_to_pixel
+    order = np.argsort(xs, kind='stable')
+    xs_sorted = xs[order]
+    jobs = []
+    for observation in observations:
+        xcoords, ycoords = observation[3].xcoords, observation[3].ycoords
+        candidates = order[np.searchsorted(xs_sorted, xcoords[0], 'left'):np.searchsorted(xs_sorted, xcoords[1], 'left')]
+        points = candidates[(ys[candidates] > ycoords[0]) & (ys[candidates] <= ycoords[1])]
+
+        if times is not None and max_delta is not None:
+            points = points[np.abs(times[points] - observation[2]) <= max_delta]
+
+        if len(points):
+            jobs.append((observation, np.sort(points)))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        samples = list(pool.map(lambda job: _sample(job[0], xs[job[1]], ys[job[1]], job[1], method), jobs))
+
+    table = _table(samples, max([len(i[0]) for i in observations], default=1))
+    times_table = table['time'].astype(np.int64)
+
+    if times is not None and len(table):
+        # Keep the observation closest in time to each point
+        delta = np.abs(times_table - times[table['point']])
+        closest = np.lexsort((times_table, delta, table['point']))
+        first = np.unique(table['point'][closest], return_index=True)[1]
+        table = table[closest[first]]
+
+    return table[np.lexsort((table['time'].astype(np.int64), table['point']))]
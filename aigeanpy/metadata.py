@@ -0,0 +1,149 @@
+import numpy as np
+
+
+
+# SatMetadata is still a dictionary, so everything that reads or writes the
+# metadata of a SatMap with metadata['xcoords'] keeps working and keeps seeing
+# the values exactly as they were read (lists from ASDF and zip files, arrays
+# from HDF5 files). Next to it, the values every SatMap method needs are kept
+# normalised in slots - plain floats and tuples - along with the affine
+# geotransform of the image, and refreshed whenever one of their keys changes.
+
+_NAMED_KEYS = ['observatory', 'instrument', 'date', 'time', 'operation']
+_GEOMETRY_KEYS = ['xcoords', 'ycoords', 'resolution']
+
+
+def _whole(value):
+    # Resolutions are whole metres in the files of the instruments and are shown as such (15 m/px, not 15.0)
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class SatMetadata(dict):
+    """The metadata of a SatMap: a dictionary of the values read from the file,
+        with the normalised values also available as attributes
+
+        Attributes
+        ----------
+        observatory, instrument, date, time, operation: str
+                None if not in the metadata
+
+        xcoords, ycoords: tuple(float)
+                the earth coordinates of the edges of the image, (min, max)
+
+        resolution: float
+                the size of a pixel in earth coordinates
+
+        geotransform: tuple(float)
+                (x_left, resolution, 0, y_top, 0, -resolution), so that the earth coordinates
+                of the corner of pixel (row, col) are
+                (x_left + col*resolution, y_top - row*resolution)
+    """
+
+    __slots__ = ['observatory', 'instrument', 'date', 'time', 'operation',
+                 'xcoords', 'ycoords', 'resolution', 'geotransform']
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._refresh()
+
+    def _refresh(self):
+        for key in _NAMED_KEYS:
+            setattr(self, key, self.get(key))
+
+        if all(key in self for key in _GEOMETRY_KEYS):
+            self.xcoords = (float(self['xcoords'][0]), float(self['xcoords'][1]))
+            self.ycoords = (float(self['ycoords'][0]), float(self['ycoords'][1]))
+            self.resolution = float(self['resolution'])
+            self.geotransform = (self.xcoords[0], self.resolution, 0.0, self.ycoords[1], 0.0, -self.resolution)
+        else:
+            self.xcoords = self.ycoords = self.resolution = self.geotransform = None
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if key in _NAMED_KEYS or key in _GEOMETRY_KEYS:
+            self._refresh()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._refresh()
+
+    def __reduce__(self):
+        return (SatMetadata, (dict(self),))
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._refresh()
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        self._refresh()
+        return value
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._refresh()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._refresh()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._refresh()
+
+    def copy(self):
+        return SatMetadata(self)
+
+    def pixel_to_earth(self, rows, cols):
+        """Get the earth coordinates of the centres of pixels
+
+        Parameters
+        ----------
+        rows, cols: int or ndarray
+                pixel coordinates
+
+        Returns
+        -------
+        tuple
+            the x and y earth coordinates of the centres of the pixels (floats or arrays, like rows and cols)
+
+        Examples
+        --------
+        >>> metadata = SatMetadata(xcoords=[0.0, 600.0], ycoords=[0.0, 300.0], resolution=30)
+        >>> metadata.pixel_to_earth(1, 1)
+        (45.0, 255.0)
+        """
+
+        x_left, resolution, _, y_top, _, _ = self.geotransform
+        return x_left + (cols + 0.5)*resolution, y_top - (rows + 0.5)*resolution
+
+    def earth_to_pixel(self, xs, ys):
+        """Get the pixels containing earth coordinates
+
+        Parameters
+        ----------
+        xs, ys: float or ndarray
+                earth coordinates
+
+        Returns
+        -------
+        tuple
+            the rows and columns of the pixels (integers or integer arrays, like xs and ys)
+
+        Examples
+        --------
+        >>> metadata = SatMetadata(xcoords=[0.0, 600.0], ycoords=[0.0, 300.0], resolution=30)
+        >>> metadata.earth_to_pixel(45.0, 255.0)
+        (1, 1)
+        """
+
+        x_left, resolution, _, y_top, _, _ = self.geotransform
+        rows = np.floor((y_top - np.asarray(ys)) / resolution).astype(int)
+        cols = np.floor((np.asarray(xs) - x_left) / resolution).astype(int)
+
+        if rows.ndim == 0:
+            return int(rows), int(cols)
+        return rows, cols
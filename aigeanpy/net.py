@@ -1,11 +1,16 @@
 from argparse import ArgumentParser
-from requests import get
+from datetime import date, timedelta
 from pathlib import Path
 from os.path import isdir
+import numpy as np
+import os
+import shutil
+from aigeanpy.tracing import traced
 
 
 
 
+@traced('query_isa')
 def query_isa(start_date :str = None , stop_date :str = None, instrument :str = None) -> str:
     '''This function prints results from the ISA data archive query service as
     JSON files and returns the url of the query.
@@ -55,6 +60,9 @@ def query_isa(start_date :str = None , stop_date :str = None, instrument :str =
         raise TypeError ("Instrument must be a string and one of 'Lir', 'Manannan', 'Fand' or 'Ecne'")
 
 
+    # requests is only imported when a query is made, to keep `import aigeanpy` fast
+    from requests import get
+
     payload = {'start_date':start_date , 'stop_date':stop_date , 'instrument':instrument}
 
     timeout = 5
@@ -69,9 +77,10 @@ def query_isa(start_date :str = None , stop_date :str = None, instrument :str =
         # If r.json() returns an error message, then print the error message and also return it.
         # Else print the json file line by line, then return the url used to find the query.
         # This will be used for tests, and also allows the users to manually perform the query.
-        for i in r.json():
+        records = r.json()
+        for i in records:
             if i == 'message':
-                error_message = r.json()['message']
+                error_message = records['message']
                 print(error_message)
                 return error_message
             else:
@@ -80,10 +89,341 @@ def query_isa(start_date :str = None , stop_date :str = None, instrument :str =
         return r.url
 
 
-def download_isa(filename, save_dir=None):
+QUERY_URL = 'http://dokku-app.dokku.arc.ucl.ac.uk/isa-archive/query'
+
+# The query service refuses ranges longer than three days (both ends included)
+QUERY_WINDOW_DAYS = 3
+
+
+class QueryResult:
+    """The records returned by the ISA data archive query service, parsed once
+        and kept as columns: filename, instrument and datetime (numpy datetime64
+        in seconds, stored as int64), plus the original records.
+
+        Parameters
+        ----------
+        records: list[dict]
+                records as returned by the query service, each with at least
+                'filename', 'instrument', 'date' and 'time'
+    """
+
+    def __init__(self, records) -> None:
+        self.records = list(records)
+        self.filename = np.array([i['filename'] for i in self.records], dtype=str)
+        self.instrument = np.array([i['instrument'] for i in self.records], dtype=str)
+        self.datetime = np.array([i['date'] + 'T' + i['time'] for i in self.records], dtype='datetime64[s]')
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def _take(self, indices):
+        return QueryResult([self.records[i] for i in indices])
+
+    @classmethod
+    def concatenate(cls, results):
+        """Join several results, such as those of consecutive query windows, into one"""
+        return cls([record for result in results for record in result.records])
+
+    def filter(self, instrument=None, start=None, stop=None):
+        """Keep the records of an instrument and/or between two times
+
+        Parameters
+        ----------
+        instrument: str, optional
+                one of 'Lir', 'Manannan', 'Fand' or 'Ecne' (case insensitive)
+
+        start, stop: str, optional
+                times in format YYYY-mm-dd[THH:MM:SS], both inclusive
+
+        Returns
+        -------
+        QueryResult
+            the records kept, in their original order
+        """
+
+        keep = np.ones(len(self), dtype=bool)
+        if instrument != None:
+            keep &= np.char.lower(self.instrument) == instrument.lower()
+        if start != None:
+            keep &= self.datetime >= np.datetime64(start, 's')
+        if stop != None:
+            if len(stop) == 10:
+                stop = stop + 'T23:59:59'
+            keep &= self.datetime <= np.datetime64(stop, 's')
+
+        return self._take(np.flatnonzero(keep))
+
+    def sort(self, reverse=False):
+        """Order the records by time, the most recent last (or first if reverse is True)"""
+
+        order = np.argsort(self.datetime, kind='stable')
+        if reverse:
+            order = order[::-1]
+        return self._take(order)
+
+    def latest(self):
+        """Get the most recent record, or None if there are no records"""
+
+        if not len(self):
+            return None
+        return self.records[int(np.argmax(self.datetime))]
+
+    def latest_per_instrument(self):
+        """Get the most recent record of each instrument
+
+        Returns
+        -------
+        dict
+            the most recent record for each instrument, by instrument name
+        """
+
+        if not len(self):
+            return {}
+
+        # Sort by instrument, then time: the last record of each instrument is its latest
+        order = np.lexsort((self.datetime.astype(np.int64), self.instrument))
+        instruments = self.instrument[order]
+        last = np.flatnonzero(np.append(instruments[1:] != instruments[:-1], True))
+
+        return {str(instruments[i]): self.records[order[i]] for i in last}
+
+
+@traced('query', record=lambda result: {'records': len(result)})
+def query(start_date=None, stop_date=None, instrument=None, session=None):
+    '''Query the ISA data archive and return the records found, without printing them.
+
+    Unlike query_isa, ranges longer than three days are allowed: they are
+    split into three-day windows and the results joined together.
+
+    Parameters
+    ----------
+    start_date: str (date in format YYYY-mm-dd), optional
+                first day to search for data, by default the default of the query service.
+
+    stop_date: str (date in format YYYY-mm-dd), optional
+                last day (inclusive) to search for data, by default start_date.
+
+    instrument: str, optional
+                one of the possible instruments: 'Lir', 'Manannan', 'Fand' or 'Ecne',
+                by default None (all the instruments).
+
+    session: requests.Session, optional
+                session to send the requests with, so its connections are reused.
+
+    Returns
+    -------
+    QueryResult
+        the records found
+    '''
+
+    if start_date and type(start_date) != str:
+        raise TypeError ('Start_date must be a string in format YYYY-mm-dd')
+
+    if stop_date and type(stop_date) != str:
+        raise TypeError ('Stop_date must be a string in format YYYY-mm-dd')
+
+    if instrument and type(instrument) != str:
+        raise TypeError ("Instrument must be a string and one of 'Lir', 'Manannan', 'Fand' or 'Ecne'")
+
+    if stop_date and not start_date:
+        raise ValueError ('If stop_date is set, then start_date must also be set')
+
+    if session == None:
+        import requests
+        session = requests
+
+    windows = [(start_date, stop_date)]
+    if start_date:
+        first = date.fromisoformat(start_date)
+        last = date.fromisoformat(stop_date) if stop_date else first
+        windows = []
+        while first <= last:
+            end = min(first + timedelta(days=QUERY_WINDOW_DAYS - 1), last)
+            windows.append((first.isoformat(), end.isoformat()))
+            first = end + timedelta(days=1)
+
+    results = []
+    for start, stop in windows:
+        payload = {'start_date':start , 'stop_date':stop , 'instrument':instrument}
+        records = session.get(QUERY_URL, params=payload, timeout=5).json()
+
+        if 'message' in records:
+            raise ValueError(records['message'])
+
+        results.append(QueryResult(records))
+
+    return QueryResult.concatenate(results)
+
+
+DOWNLOAD_URL = 'https://dokku-app.dokku.arc.ucl.ac.uk/isa-archive/download'
+
+CHUNK_SIZE = 1 << 16
+
+
+# Downloads are written to '<filename>.part' and only renamed to <filename> once
+# their size (and checksum, when given) has been checked, so a file with the
+# final name is always complete. An interrupted download leaves the .part file
+# behind, and the next call asks the server only for the missing bytes with an
+# HTTP Range request.
+#
+# A download split into n segments writes segment i to '<filename>.part<i>of<n>', so
+# the size of every file on disk is always the number of bytes received, as
+# resuming relies on. The segments are joined into the .part file once all of
+# them are complete.
+
+def _total_size(response, offset):
+    # Content-Range: bytes <first>-<last>/<total>
+    content_range = response.headers.get('Content-Range')
+    if content_range and '/' in content_range and not content_range.endswith('*'):
+        return int(content_range.rsplit('/', 1)[1])
+
+    content_length = response.headers.get('Content-Length')
+    if content_length != None:
+        return offset + int(content_length)
+
+    return None
+
+
+def _download_stream(session, payload, part_path, digest=None):
+    '''Download into part_path, resuming from the bytes already in it,
+    and feed every byte of the file to digest (a hashlib object) if given.
+    Returns the total size announced by the server, or None if unknown.
+    '''
+
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+    with session.get(DOWNLOAD_URL, params=payload, headers=headers, stream=True, timeout=30) as r:
+
+        if r.status_code == 416:
+            # The .part file is at least as long as the file on the server. Only a
+            # checksum can tell whether those bytes are right, so without one the
+            # download starts over.
+            if digest != None:
+                _hash_file(part_path, digest, offset)
+                return _total_size(r, offset) if r.headers.get('Content-Range') else offset
+            r.close()
+            part_path.unlink()
+            return _download_stream(session, payload, part_path)
+
+        r.raise_for_status()
+
+        if r.status_code != 206:
+            # The server sent the whole file again, so start over
+            offset = 0
+
+        total = _total_size(r, offset)
+
+        if digest != None and offset:
+            _hash_file(part_path, digest, offset)
+
+        with open(part_path, 'r+b' if offset else 'wb') as f:
+            f.seek(offset)
+            f.truncate()
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                if digest != None:
+                    digest.update(chunk)
+
+    return total
+
+
+def _segment_paths(part_path, segments):
+    return [part_path.with_name(f'{part_path.name}{i}of{segments}') for i in range(segments)]
+
+
+def _started_segments(part_path):
+    # The number of segments of an interrupted download, so it is resumed as it was split
+    for path in part_path.parent.glob(part_path.name + '*of*'):
+        count = path.name[len(part_path.name):].split('of')[-1]
+        if count.isdigit():
+            return int(count)
+    return None
+
+
+def _download_segments(session, payload, part_path, segments):
+    '''Download into part_path as several byte ranges at the same time,
+    resuming the segments of an interrupted call.
+    Returns the total size announced by the server, or None if unknown.
+    '''
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    started = _started_segments(part_path)
+    if started != None:
+        segments = started
+
+    # A .part file left by a single stream is carried on as a single stream
+    elif part_path.exists():
+        return _download_stream(session, payload, part_path)
+
+    with session.get(DOWNLOAD_URL, params=payload, headers={'Range': 'bytes=0-0'}, stream=True, timeout=30) as r:
+        r.raise_for_status()
+        total = _total_size(r, 0) if r.status_code == 206 else None
+
+    if total == None or total < 2:
+        # No Range support, or nothing worth splitting: a single stream is all we can do
+        return _download_stream(session, payload, part_path)
+
+    # Never more segments than bytes, so no range is empty
+    segments = min(segments, total)
+    paths = _segment_paths(part_path, segments)
+    bounds = np.linspace(0, total, segments + 1).astype(np.int64)
+
+    def download_segment(path, first, last):
+        done = path.stat().st_size if path.exists() else 0
+        if first + done >= last:
+            return
+
+        headers = {'Range': f'bytes={first + done}-{last - 1}'}
+        with session.get(DOWNLOAD_URL, params=payload, headers=headers, stream=True, timeout=30) as r:
+            r.raise_for_status()
+            if r.status_code != 206:
+                raise IOError(f'The server ignored the byte range of segment {path.name}')
+            with open(path, 'ab') as f:
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk[:last - first - f.tell()])
+
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        list(pool.map(download_segment, paths, bounds[:-1], bounds[1:]))
+
+    # Every segment is complete, so join them
+    with open(part_path, 'wb') as f:
+        for path in paths:
+            with open(path, 'rb') as segment:
+                shutil.copyfileobj(segment, f, CHUNK_SIZE)
+
+    for path in paths:
+        path.unlink()
+
+    return total
+
+
+def _hash_file(path, digest, length):
+    with open(path, 'rb') as f:
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            digest.update(chunk)
+            length -= len(chunk)
+
+
+@traced('download_isa', record=lambda path: {'bytes': os.path.getsize(path)})
+def download_isa(filename, save_dir=None, size=None, checksum=None, segments=1, session=None):
     '''given a filename (from running the net.query_isa() function),
     downloads the file, by default in the current directory.
 
+    The file is first written to '<filename>.part' and only renamed to filename
+    once complete. If a previous download was interrupted, only the missing
+    bytes are requested.
+
     Parameters
     ----------
     filename : string
@@ -92,12 +432,30 @@ def download_isa(filename, save_dir=None):
     save_dir : string or path object, optional
                 Given save_dir, downloads the file in the directory pointed by save_dir.
                 by default None for the function (which downloads to the current working directory)
+
+    size : int, optional
+                expected size of the file in bytes. By default the size announced by the server is checked.
+
+    checksum : str, optional
+                expected SHA-256 of the file, as a hexadecimal string. By default not checked.
+
+    segments : int, optional
+                number of byte ranges downloaded at the same time, by default 1.
+                An interrupted download split into segments carries on from the bytes
+                already downloaded in each segment.
+
+    session : requests.Session, optional
+                session to send the requests with, so its connections are reused.
+
+    Returns
+    -------
+    str
+        the path of the file downloaded
     '''
 
+    if type(segments) != int or segments <= 0:
+        raise ValueError('segments must be a positive integer')
 
-    payload = {'filename':filename}
-    r = get('https://dokku-app.dokku.arc.ucl.ac.uk/isa-archive/download',params=payload)
-    
     if save_dir:
         path = Path(save_dir)
 
@@ -112,8 +470,46 @@ def download_isa(filename, save_dir=None):
         if not path.exists() or not isdir(save_dir):
             raise NameError(f"Directory pointed by {save_dir} doesn't exist")
 
-        open(f"{save_dir}/{filename}", "wb").write(r.content)
+        destination = path / filename
     
     else:
-        open(f"{filename}", "wb").write(r.content)
-        
\ No newline at end of file
+        destination = Path(filename)
+
+    if session == None:
+        import requests
+        session = requests
+
+    part_path = destination.with_name(destination.name + '.part')
+    payload = {'filename':filename}
+
+    digest = None
+    if checksum != None:
+        from hashlib import sha256
+        digest = sha256()
+
+    if segments == 1:
+        # The checksum is computed while the bytes arrive
+        total = _download_stream(session, payload, part_path, digest)
+    else:
+        total = _download_segments(session, payload, part_path, segments)
+        if digest != None:
+            _hash_file(part_path, digest, part_path.stat().st_size)
+
+    downloaded = part_path.stat().st_size
+    expected = size if size != None else total
+
+    if expected != None and downloaded < expected:
+        # Keep the .part file, the next call carries on from here
+        raise IOError(f'Download of {filename} is incomplete: {downloaded} of {expected} bytes')
+
+    if expected != None and downloaded > expected:
+        part_path.unlink()
+        raise IOError(f'Download of {filename} is larger than expected: {downloaded} instead of {expected} bytes')
+
+    if checksum != None and digest.hexdigest() != checksum.lower():
+        part_path.unlink()
+        raise IOError(f'Download of {filename} does not match its checksum')
+
+    part_path.replace(destination)
+
+    return str(destination)
@@ -0,0 +1,312 @@
+import os
+import numpy as np
+from aigeanpy.catalog import to_timestamp
+from aigeanpy.dtypes import as_dtype
+from aigeanpy.pipeline import Pipeline, Stage
+from aigeanpy.read_files import read_file
+from aigeanpy.write_files import _plain
+
+# h5py takes a long time to import, so it is imported the first time a
+# container is written or opened.
+
+
+# A container packs many observations into one HDF5 file, so a batch job over
+# thousands of small files opens one file instead of paying the fixed cost of
+# opening each of them (parsing the YAML of ASDF files, opening HDF5 files,
+# reading the central directory of zip files).
+#
+#   /observations/<key>   the data of each observation, chunked and compressed,
+#                         with its metadata as attributes (as in the HDF5 files
+#                         of the Manannan instrument)
+#   /index                one row per observation: key, instrument, time, resolution
+#                         and footprint, so observations are found by key or by
+#                         query without touching their datasets
+#
+# The key of an observation is the name of its file without the extension,
+# such as aigean_lir_20221223_024822.
+
+INDEX_DTYPE = np.dtype([('key', 'S64'), ('instrument', 'S16'), ('timestamp', np.int64), ('resolution', np.float64),
+                        ('xmin', np.float64), ('xmax', np.float64), ('ymin', np.float64), ('ymax', np.float64),
+                        ('rows', np.int64), ('cols', np.int64)])
+
+# Entries of the metadata of ASDF files that describe the file, not the observation
+_FILE_KEYS = ['asdf_library', 'history']
+
+
+def _key(filename):
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def _read(filename):
+    metadata, data = read_file(filename, cache=False)
+    return _key(filename), metadata, data
+
+
+def _index_row(key, metadata, shape):
+    xcoords = [float(i) for i in metadata['xcoords']]
+    ycoords = [float(i) for i in metadata['ycoords']]
+    return (key.encode(), str(metadata['instrument']).lower().encode(), to_timestamp(metadata['date'] + ' ' + metadata['time']),
+            float(metadata['resolution']), xcoords[0], xcoords[1], ycoords[0], ycoords[1], shape[0], shape[1])
+
+
+def _write_index(f, rows):
+    table = np.array(sorted(rows.values(), key=lambda row: (row[2], row[0])), dtype=INDEX_DTYPE)
+    if 'index' in f:
+        del f['index']
+    f.create_dataset('index', data=table, maxshape=(None,))
+
+
+def _read_index(f):
+    if 'index' not in f:
+        return {}
+    return {row['key'].decode(): tuple(row) for row in f['index'][()]}
+
+
+def pack(filenames, container, compression='gzip', chunks=True, replace=False, jobs=1):
+    """ Pack observations into a container file, adding them to it if it already exists
+
+    Parameters
+    ----------
+    filenames: list[str]
+            the ASDF, HDF5 and zip files of the observations
+
+    container: str
+            name of the container, such as aigean_2022_12.hdf5
+
+    compression: str
+            compression of the datasets, 'gzip' (the default), 'lzf' or None
+
+    chunks: bool or tuple
+            The default value of chunks is True and h5py chooses the shape of the chunks.
+            Otherwise the shape of the chunks, such as (256, 256).
+
+    replace: bool
+            The default value of replace is False and observations already in the container
+            are skipped. When replace is True they are written again. The space of the data
+            replaced is only given back by compact.
+
+    jobs: int
+            number of files read at the same time, by default 1
+
+    Returns
+    -------
+    int
+        the number of observations written
+    """
+
+    import h5py
+
+    if type(filenames) != list or any(type(i) != str for i in filenames):
+        raise TypeError('filenames must be a list of filenames')
+
+    if type(container) != str:
+        raise TypeError('container must be of type string')
+
+    with h5py.File(container, 'a') as f:
+        observations = f.require_group('observations')
+        rows = _read_index(f)
+
+        # The container itself is left out, as a glob such as *.hdf5 also matches it
+        todo = [i for i in filenames if (replace or _key(i) not in rows) and os.path.abspath(i) != os.path.abspath(container)]
+
+        # Files are read ahead in threads, and written one at a time as h5py writes from one thread
+        pipeline = Pipeline([Stage('read', _read, workers=jobs)], queue_size=max(2, jobs))
+        written = 0
+
+        try:
+            for key, metadata, data in pipeline.run(todo):
+                if key in observations:
+                    del observations[key]
+
+                dataset = observations.create_dataset(key, data=data, chunks=chunks, compression=compression,
+                                                      shuffle=compression is not None)
+                for name, value in metadata.items():
+                    if value is not None and name not in _FILE_KEYS and type(value) != dict:
+                        dataset.attrs[name] = _plain(value)
+
+                rows[key] = _index_row(key, metadata, data.shape)
+                written += 1
+
+        finally:
+            # The index always describes the observations written, even if a file failed to read
+            _write_index(f, rows)
+
+    return written
+
+
+def compact(container, output=None):
+    """ Rewrite a container without the space left by replaced observations
+
+    Parameters
+    ----------
+    container: str
+            name of the container
+
+    output: str
+            name of the container written, by default container itself, which is
+            replaced once the new one is complete
+
+    Returns
+    -------
+    tuple
+        the size in bytes of the container before and after
+    """
+
+    import h5py
+
+    target = output or container
+    temporary = target + '.part'
+
+    try:
+        with h5py.File(container, 'r') as source, h5py.File(temporary, 'w') as destination:
+            destination.create_group('observations')
+            for key in source['observations']:
+                source.copy(source['observations'][key], destination['observations'], name=key)
+            source.copy(source['index'], destination, name='index')
+
+        before = os.path.getsize(container)
+        os.replace(temporary, target)
+
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+    return before, os.path.getsize(target)
+
+
+class PackedArchive:
+    """The observations of a container written by pack, read only when asked for
+
+        The container is opened once and its index read; the data of an observation is
+        only read when its SatMap is returned.
+
+        Parameters
+        ----------
+        container: str
+                name of the container
+
+        Examples
+        --------
+        >>> with PackedArchive('aigean_2022_12.hdf5') as archive:  # doctest: +SKIP
+        ...     image = archive['aigean_lir_20221223_024822']
+        ...     images = list(archive.find(bbox=(0, 0, 600, 300), instrument='lir'))
+    """
+
+    def __init__(self, container) -> None:
+        import h5py
+
+        self.file = h5py.File(container, 'r')
+        self.index = self.file['index'][()]
+        self._keys = np.char.decode(self.index['key'])
+        self._instruments = np.char.decode(self.index['instrument'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        """Close the container"""
+        self.file.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.file['observations']
+
+    def keys(self):
+        """The keys of the observations, ordered by time"""
+        return self._keys.tolist()
+
+    def metadata(self, key):
+        """Get the metadata of an observation, without reading its data"""
+        return dict(self.file['observations'][key].attrs)
+
+    def get(self, key, window=None, dtype=None):
+        """Get an observation as a SatMap
+
+        Parameters
+        ----------
+        key: str
+                the key of the observation, such as aigean_lir_20221223_024822
+        window: tuple, optional
+                (first row, end row, first column, end column) to read only part of the data.
+                The coordinates of the SatMap are those of the window.
+        dtype: str or numpy.dtype
+                The default value of dtype is None and the data keeps the dtype of the policy
+                set with aigeanpy.dtypes, or of the container.
+        """
+
+        from aigeanpy.satmap import SatMap
+
+        if key not in self:
+            raise KeyError(f'{key} is not in the container')
+
+        dataset = self.file['observations'][key]
+        metadata = dict(dataset.attrs)
+
+        if window is None:
+            data = dataset[()]
+        else:
+            first_row, end_row, first_col, end_col = window
+            data = dataset[first_row:end_row, first_col:end_col]
+            resolution = float(metadata['resolution'])
+            x_left, y_top = float(metadata['xcoords'][0]), float(metadata['ycoords'][1])
+            metadata['xcoords'] = np.array([x_left + first_col*resolution, x_left + (first_col + data.shape[1])*resolution])
+            metadata['ycoords'] = np.array([y_top - (first_row + data.shape[0])*resolution, y_top - first_row*resolution])
+
+        return SatMap(as_dtype(data, dtype), metadata)
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def query(self, bbox=None, time_range=None, instrument=None):
+        """Find the observations matching a query, as Catalog.files does, from the index only
+
+        Parameters
+        ----------
+        bbox: tuple, optional
+                (xmin, ymin, xmax, ymax) in earth coordinates. Observations whose footprint
+                intersects it are returned, by default None (anywhere)
+
+        time_range: tuple, optional
+                (start, stop), both inclusive, as strings in format YYYY-mm-dd [HH:MM:SS] or datetimes,
+                by default None (any time)
+
+        instrument: str, optional
+                one of 'Lir', 'Manannan' or 'Fand' (case insensitive), by default None (all instruments)
+
+        Returns
+        -------
+        list[str]
+            the keys of the observations, ordered by time
+        """
+
+        index = self.index
+        keep = np.ones(len(index), dtype=bool)
+
+        if bbox != None:
+            if len(bbox) != 4:
+                raise TypeError('bbox must be a tuple in format of (xmin, ymin, xmax, ymax)')
+            keep &= (index['xmax'] >= bbox[0]) & (index['xmin'] <= bbox[2]) & (index['ymax'] >= bbox[1]) & (index['ymin'] <= bbox[3])
+
+        if time_range != None:
+            if len(time_range) != 2:
+                raise TypeError('time_range must be a tuple in format of (start, stop)')
+            keep &= (index['timestamp'] >= to_timestamp(time_range[0])) & (index['timestamp'] <= to_timestamp(time_range[1], end_of_day=True))
+
+        if instrument != None:
+            if type(instrument) != str:
+                raise TypeError("Instrument must be a string and one of 'Lir', 'Manannan' or 'Fand'")
+            keep &= self._instruments == instrument.lower()
+
+        return self._keys[keep].tolist()
+
+    def find(self, bbox=None, time_range=None, instrument=None):
+        """Find the observations matching a query, as a SatMap each, read as the generator reaches it"""
+
+        for key in self.query(bbox=bbox, time_range=time_range, instrument=instrument):
+            yield self.get(key)
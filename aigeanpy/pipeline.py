@@ -0,0 +1,263 @@
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue, Empty, Full
+from time import perf_counter
+import threading
+
+
+# A Pipeline connects stages through bounded queues. Each stage has its own
+# worker threads taking items from the queue before it and putting results in
+# the queue after it, so a download, a decode and a resample of different files
+# all run at the same time. When a queue is full the stage feeding it waits,
+# so a fast stage never runs far ahead of a slow one (backpressure) and only
+# a few items per stage are ever held in memory.
+#
+# Results that come out of the last stage before those of earlier items wait
+# to be yielded in order. While more than queue_size of them wait, no new item
+# is fed in, so one slow item doesn't let all the later ones pile up.
+#
+# A stage with processes=True runs its function in a pool of worker
+# processes, for work that holds the GIL such as decoding and resampling;
+# its threads only hand items to the pool and wait for the results.
+
+_END = object()
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+class Stage:
+    """A step of a Pipeline
+
+        Parameters
+        ----------
+        name: str
+                name of the stage in the report
+
+        function: callable
+                applied to every item. For a stage with processes=True it must
+                be a module-level function, and items and results must pickle.
+
+        workers: int
+                number of items processed at the same time, by default 1
+
+        processes: bool
+                The default value of processes is False and the function runs in
+                threads, which suits downloads and file I/O. When processes is True
+                it runs in a pool of worker processes.
+    """
+
+    def __init__(self, name, function, workers=1, processes=False) -> None:
+
+        if type(workers) != int or workers <= 0:
+            raise ValueError('workers must be a positive integer')
+
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.processes = processes
+
+        self.items = 0
+        self.busy = 0.0
+        self.depth_total = 0
+        self.depth_max = 0
+
+
+class Pipeline:
+    """Stages run concurrently, connected by bounded queues
+
+        Parameters
+        ----------
+        stages: list[Stage]
+                the stages, in the order items go through them
+
+        queue_size: int
+                most items waiting between two stages, by default 4
+
+        Examples
+        --------
+        >>> pipeline = Pipeline([Stage('double', lambda x: 2*x, workers=2), Stage('add', lambda x: x + 1)])
+        >>> list(pipeline.run(range(5)))
+        [1, 3, 5, 7, 9]
+    """
+
+    def __init__(self, stages, queue_size=4) -> None:
+
+        if type(stages) != list or len(stages) == 0:
+            raise TypeError('stages must be a non-empty list of Stage')
+
+        if type(queue_size) != int or queue_size <= 0:
+            raise ValueError('queue_size must be a positive integer')
+
+        self.stages = stages
+        self.queue_size = queue_size
+        self.wall = 0.0
+
+    def _put(self, queue, item, stop):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def _get(self, queue, stop):
+        while not stop.is_set():
+            try:
+                return queue.get(timeout=0.1)
+            except Empty:
+                pass
+        return _END
+
+    def _worker(self, stage, pool, inbox, outbox, stop, remaining, lock):
+        while True:
+            depth = inbox.qsize()
+            with lock:
+                stage.depth_total += depth
+                stage.depth_max = max(stage.depth_max, depth)
+
+            item = self._get(inbox, stop)
+            if item is _END:
+                # Let the other workers of the stage see the end too,
+                # and the last one to stop tells the next stage
+                self._put(inbox, _END, stop)
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    self._put(outbox, _END, stop)
+                return
+
+            index, value = item
+            if not isinstance(value, _Failed):
+                start = perf_counter()
+                try:
+                    if pool:
+                        value = pool.submit(stage.function, value).result()
+                    else:
+                        value = stage.function(value)
+                except Exception as error:
+                    value = _Failed(error)
+                with lock:
+                    stage.busy += perf_counter() - start
+                    stage.items += 1
+
+            self._put(outbox, (index, value), stop)
+
+    def run(self, items, ordered=True):
+        """Send items through the stages and yield the results of the last stage
+
+        Parameters
+        ----------
+        items: iterable
+                the inputs of the first stage, read as the first stage is ready for them
+
+        ordered: bool
+                The default value of ordered is True and the results are yielded in the order
+                of items. Otherwise each result is yielded as soon as it is ready.
+
+        Returns
+        -------
+        generator
+            the results. If a stage fails on an item, its exception is raised when
+            that item comes out of the pipeline and the pipeline is stopped.
+        """
+
+        for stage in self.stages:
+            stage.items = 0
+            stage.busy = 0.0
+            stage.depth_total = 0
+            stage.depth_max = 0
+
+        queues = [Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        stop = threading.Event()
+        lock = threading.Lock()
+        pools = [ProcessPoolExecutor(max_workers=stage.workers) if stage.processes else None for stage in self.stages]
+        threads = []
+        waiting = {}
+        reordered = threading.Condition()
+
+        def feed():
+            for index, item in enumerate(items):
+                with reordered:
+                    while len(waiting) > self.queue_size and not stop.is_set():
+                        reordered.wait(0.1)
+                if stop.is_set():
+                    return
+                self._put(queues[0], (index, item), stop)
+            self._put(queues[0], _END, stop)
+
+        threads.append(threading.Thread(target=feed, daemon=True))
+        for i, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(target=self._worker, daemon=True,
+                                                args=(stage, pools[i], queues[i], queues[i + 1], stop, remaining, lock)))
+
+        start = perf_counter()
+        for thread in threads:
+            thread.start()
+
+        try:
+            following = 0
+
+            while True:
+                item = self._get(queues[-1], stop)
+                if item is _END:
+                    break
+
+                index, value = item
+                if isinstance(value, _Failed):
+                    raise value.error
+
+                if not ordered:
+                    yield value
+                    continue
+
+                # Results that come out early wait for the ones before them
+                with reordered:
+                    waiting[index] = value
+                while following in waiting:
+                    with reordered:
+                        value = waiting.pop(following)
+                        reordered.notify()
+                    yield value
+                    following += 1
+
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            for pool in pools:
+                if pool:
+                    pool.shutdown(cancel_futures=True)
+            self.wall = perf_counter() - start
+
+    def stats(self):
+        """Get the statistics of the last run of each stage
+
+        Returns
+        -------
+        list[dictionary]
+            for each stage its 'name', the 'items' processed, the 'busy' seconds spent in its function
+            (summed over its workers), its 'throughput' in items per second of the whole run, and the
+            mean and largest number of items waiting in its input queue ('queue_mean', 'queue_max')
+        """
+
+        stats = []
+        for stage in self.stages:
+            samples = stage.items + stage.workers
+            stats.append({'name': stage.name, 'workers': stage.workers, 'items': stage.items, 'busy': stage.busy,
+                          'throughput': stage.items / self.wall if self.wall else 0.0,
+                          'queue_mean': stage.depth_total / samples, 'queue_max': stage.depth_max})
+        return stats
+
+    def report(self):
+        """Get the statistics of the last run as a table"""
+
+        lines = [f"{'stage':12s} {'workers':>7s} {'items':>6s} {'busy s':>8s} {'items/s':>8s} {'queue':>6s} {'max':>4s}"]
+        for i in self.stats():
+            lines.append(f"{i['name']:12s} {i['workers']:7d} {i['items']:6d} {i['busy']:8.2f} {i['throughput']:8.2f} {i['queue_mean']:6.2f} {i['queue_max']:4d}")
+        lines.append(f'wall time: {self.wall:.2f} s')
+        return '\n'.join(lines)
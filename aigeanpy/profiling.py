@@ -0,0 +1,221 @@
+from contextlib import contextmanager
+import os
+import sys
+
+
+# Every console script accepts --profile and --trace-memory, so a slow or
+# memory-hungry production run can be measured as it is, without rerunning
+# it by hand. The reports are written to --report-dir (by default
+# aigeanpy_reports), named after the script, and the output of the script
+# itself is left unchanged: only the location of the reports is printed,
+# on stderr.
+#
+#   <script>.pstats      cProfile statistics, for pstats or snakeviz
+#   <script>.txt         the 40 functions with the largest cumulative time
+#   <script>.collapsed   collapsed stacks, for flamegraph.pl or speedscope
+#   <script>_memory.txt  peak traced memory, the top allocation sites near the
+#                        peak and those still allocated at the end
+#
+# tracemalloc only gives the size of the peak, not what was allocated then, so
+# while memory is traced a thread samples the traced memory and takes a
+# snapshot each time it grows past the largest one snapshotted.
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+MAX_DEPTH = 64
+# Stacks taking less than this fraction of the run are left out of the collapsed stacks
+MIN_SHARE = 0.001
+# Seconds between two samples of the traced memory, and growth past the largest
+# snapshot that takes a new one
+SAMPLE_INTERVAL = 0.05
+SNAPSHOT_GROWTH = 1.05
+
+
+def add_profile_arguments(parser):
+    """ Add --profile, --trace-memory and --report-dir to the ArgumentParser of a console script """
+
+    parser.add_argument('--profile', action='store_true', help='Profile the run with cProfile and write pstats and collapsed stacks to the report directory')
+    parser.add_argument('--trace-memory', action='store_true', help='Trace memory allocations and write the peak and the top allocation sites to the report directory')
+    parser.add_argument('--report-dir', type=str, default='aigeanpy_reports', help='Directory of the reports of --profile and --trace-memory, by default aigeanpy_reports')
+
+
+def _label(function):
+    filename, line, name = function
+    if filename == '~':
+        # built-in functions, such as <built-in method numpy.zeros>
+        return name.replace(';', ',')
+    return f'{name} ({os.path.basename(filename)}:{line})'.replace(';', ',')
+
+
+def collapsed_stacks(stats):
+    """ Turn cProfile statistics into collapsed stacks, one 'caller;...;function microseconds' line per stack
+
+    cProfile only records which function called which, not whole stacks, so the
+    time of a function called from several places is shared between its callers
+    in proportion to the time it spent under each of them. Stacks taking less than
+    MIN_SHARE of the run are left out, which keeps the output small.
+
+    Parameters
+    ----------
+    stats: pstats.Stats
+            the statistics of a profiled run
+
+    Returns
+    -------
+    list[str]
+        the lines of the collapsed stacks
+    """
+
+    entries = stats.stats
+    callees = {}
+    for function, (cc, nc, tottime, cumtime, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((function, edge[3]))
+
+    totals = {}
+    smallest = MIN_SHARE * max([entry[3] for entry in entries.values() if not entry[4]], default=0.0)
+
+    def walk(function, path, share):
+        tottime, cumtime = entries[function][2], entries[function][3]
+        stack = path + [_label(function)]
+        key = ';'.join(stack)
+        totals[key] = totals.get(key, 0.0) + tottime * share
+
+        if len(stack) >= MAX_DEPTH:
+            return
+
+        for callee, edge_time in callees.get(function, []):
+            callee_time = entries[callee][3]
+            if callee_time <= 0 or _label(callee) in stack:
+                continue
+            callee_share = share * min(edge_time / callee_time, 1.0)
+            if callee_time * callee_share >= smallest:
+                walk(callee, stack, callee_share)
+
+    for function, entry in entries.items():
+        # Roots are the functions nobody profiled called
+        if not entry[4]:
+            walk(function, [], 1.0)
+
+    return [f'{key} {round(seconds * 1e6)}' for key, seconds in totals.items() if round(seconds * 1e6) > 0]
+
+
+def _write_profile(profiler, report_dir, name):
+    import pstats
+
+    profiler.dump_stats(os.path.join(report_dir, name + '.pstats'))
+
+    with open(os.path.join(report_dir, name + '.txt'), 'w') as f:
+        stats = pstats.Stats(profiler, stream=f)
+        stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+
+    with open(os.path.join(report_dir, name + '.collapsed'), 'w') as f:
+        f.write('\n'.join(collapsed_stacks(pstats.Stats(profiler))) + '\n')
+
+
+class _PeakSampler:
+    """Keeps the top allocation sites of the largest traced memory sampled"""
+
+    def __init__(self) -> None:
+        import threading
+
+        self.size = 0
+        self.top = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+
+    def _sample(self):
+        import tracemalloc
+
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            current = tracemalloc.get_traced_memory()[0]
+            if current > self.size * SNAPSHOT_GROWTH:
+                # Only the statistics are kept, so the snapshots don't add to the memory traced
+                self.top = tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]
+                self.size = current
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+def _write_top(f, title, top):
+    f.write(f'top {len(top)} allocation sites {title}:\n')
+    for statistic in top:
+        f.write(f'{statistic.size / 2**20:10.3f} MiB {statistic.count:8d} blocks  {statistic.traceback}\n')
+
+
+def _write_memory(report_dir, name, sampler):
+    import tracemalloc
+
+    sampler.stop()
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    top = snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+
+    with open(os.path.join(report_dir, name + '_memory.txt'), 'w') as f:
+        f.write(f'peak: {peak / 2**20:.2f} MiB\n')
+        f.write(f'still allocated at the end: {current / 2**20:.2f} MiB\n\n')
+        if sampler.size > current:
+            _write_top(f, f'near the peak (sampled at {sampler.size / 2**20:.2f} MiB)', sampler.top)
+        else:
+            # Nothing sampled above what is left at the end, such as in a run shorter than SAMPLE_INTERVAL
+            f.write('no sample near the peak larger than the memory still allocated at the end\n')
+        f.write('\n')
+        _write_top(f, 'still allocated at the end', top)
+
+
+@contextmanager
+def profiled(arguments, name):
+    """ Profile the code run inside the with block, as asked by the options added with add_profile_arguments
+
+    Parameters
+    ----------
+    arguments: argparse.Namespace
+            the parsed arguments of the console script
+
+    name: str
+            name of the console script, used to name the reports
+    """
+
+    profile = getattr(arguments, 'profile', False)
+    trace_memory = getattr(arguments, 'trace_memory', False)
+
+    if not profile and not trace_memory:
+        yield
+        return
+
+    report_dir = arguments.report_dir
+    os.makedirs(report_dir, exist_ok=True)
+
+    sampler = None
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start(10)
+        sampler = _PeakSampler()
+
+    profiler = None
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        yield
+
+    # The reports are also written when the script stops with sys.exit
+    finally:
+        if profiler:
+            profiler.disable()
+
+        # Before the profile is written, so that writing it isn't in the memory report
+        if trace_memory:
+            _write_memory(report_dir, name, sampler)
+
+        if profiler:
+            _write_profile(profiler, report_dir, name)
+
+        print(f'Reports of {name} written to {os.path.abspath(report_dir)}', file=sys.stderr)
@@ -1,22 +1,28 @@
-import asdf
-import h5py
 import zipfile
 import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from copy import deepcopy
 import numpy
 from io import BytesIO
 import csv
 import os
-from os import getcwd
+import struct
 from os.path import isfile, splitext
 import aigeanpy.net as net
+from aigeanpy.dtypes import as_dtype
+from aigeanpy.tracing import traced, data_info
 
-
+# asdf and h5py take a long time to import, so each reader imports
+# the library it needs the first time it is called.
 
 
 # read_asdf opens an asdf file using the python asdf library
 # and saves all of its data in a dictionary called metadata.
 # data is then extracted and deleted from the metadata dictionary
 
+@traced('read_asdf', record=data_info)
 def read_asdf(filename): 
     """ Read an ASDF file and return metadata and data of image
 
@@ -43,6 +49,8 @@ def read_asdf(filename):
     (10, 20)
     """
 
+    import asdf
+
     metadata = dict(asdf.open(filename))
     data = numpy.array(metadata["data"])
     del metadata["data"]
@@ -54,6 +62,7 @@ def read_asdf(filename):
 # For the ISA case the dataset is stored in the 'observation',
 # and the metadata is stored as attributes of 'observation'.
 
+@traced('read_h5py', record=data_info)
 def read_h5py(filename):
     """ Read a h5py file and return metadata and data of image
 
@@ -80,6 +89,8 @@ def read_h5py(filename):
     (10, 30)
     """
 
+    import h5py
+
     f = h5py.File(filename, 'r')
     metadata = dict(f['observation'].attrs)
     data = numpy.array(f['observation']['data'])
@@ -94,6 +105,7 @@ def read_h5py(filename):
 # Metadata is stored in metdata.json
 # and the data is stored in observation.npy
 
+@traced('read_zip', record=data_info)
 def read_zip(filename):
     """ Read a zip file from fand instrument and return metadata and data of image
     
@@ -136,6 +148,144 @@ def read_zip(filename):
 
 
 
+# mmap_zip reads only metadata.json and maps observation.npy into memory,
+# which is possible when it is stored uncompressed, as write_zip does:
+# the array then starts at a fixed offset of the zip file, after the
+# local header of the member and the header of the npy format.
+
+def mmap_zip(filename):
+    """ Read the metadata of a zip file and memory-map its data, without reading it
+
+    Parameters
+    ----------
+    filename: str
+            name of the file to read, such as aigean_fan_20221212_123848.zip
+
+    Returns
+    -------
+    return1: dictionary
+            The information of image
+
+    return2: numpy.memmap
+            read-only data of image, read from the file as it is used
+    """
+
+    with zipfile.ZipFile(filename) as zip_ob:
+        metadata = json.loads(zip_ob.read("metadata.json"))
+        info = zip_ob.getinfo("observation.npy")
+
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError('observation.npy is compressed, so it cannot be memory-mapped. Use read_zip instead.')
+
+    with open(filename, 'rb') as f:
+        f.seek(info.header_offset)
+        name_length, extra_length = struct.unpack('<HH', f.read(30)[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+
+        version = numpy.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = numpy.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = numpy.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    data = numpy.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape,
+                        order='F' if fortran_order else 'C')
+
+    return metadata, data
+
+
+# open_data opens the data of an image without reading it: an h5py dataset for
+# HDF5 files, the memory-mapped array of ASDF files and a memory map of zip
+# files whose observation.npy is stored uncompressed. Slicing it reads only the
+# window asked for. Other zip files are decompressed whole.
+
+@contextmanager
+def open_data(filename):
+    """ Open the data of an image, read only as it is sliced, and close the file afterwards
+
+    Parameters
+    ----------
+    filename: str
+            name of the file to open, such as aigean_man_20221212_123848.hdf5
+
+    Yields
+    ------
+    array-like
+        the data of the image, with shape and dtype, only valid inside the with block
+
+    Examples
+    --------
+    >>> with open_data('aigean_man_20221212_123848.hdf5') as data:  # doctest: +SKIP
+    ...     window = data[100:200, 50:80]
+    """
+
+    if type(filename) != str:
+        raise TypeError('Argument "filename" must be of type string')
+
+    extension = splitext(filename)[1]
+
+    if extension == '.hdf5':
+        import h5py
+        with h5py.File(filename, 'r') as f:
+            yield f['observation']['data']
+
+    elif extension == '.asdf':
+        import asdf
+        # Memory-mapped, so slicing reads the window instead of the whole block
+        with asdf.open(filename, memmap=True) as f:
+            yield f['data']
+
+    elif extension == '.zip':
+        try:
+            data = mmap_zip(filename)[1]
+        except ValueError:
+            data = read_zip(filename)[1]
+        yield data
+
+    else:
+        raise FileNotFoundError ("The file must be of type ASDF, HDF5 or zip")
+
+
+# read_pixels reads the values of some pixels of an image, reading only the
+# window around them where open_data allows it.
+
+@traced('read_pixels', record=lambda values: {'pixels': len(values)})
+def read_pixels(filename, rows, cols):
+    """ Read the values of pixels of an image, reading only the window that holds them where the format allows
+
+    Parameters
+    ----------
+    filename: str
+            name of the file to read, such as aigean_man_20221212_123848.hdf5
+
+    rows, cols: ndarray
+            rows and columns of the pixels, moved to the nearest edge of the image if they fall outside it
+
+    Returns
+    -------
+    ndarray
+        the value of each pixel, in the dtype of the file
+    """
+
+    if type(filename) != str:
+        raise TypeError('Argument "filename" must be of type string')
+
+    rows = numpy.asarray(rows, dtype=numpy.int64)
+    cols = numpy.asarray(cols, dtype=numpy.int64)
+
+    with open_data(filename) as data:
+        shape = data.shape
+        if rows.size == 0:
+            return numpy.zeros(rows.shape, dtype=data.dtype)
+        rows_in = numpy.clip(rows, 0, shape[0] - 1)
+        cols_in = numpy.clip(cols, 0, shape[1] - 1)
+        first_row, first_col = int(rows_in.min()), int(cols_in.min())
+        window = numpy.asarray(data[first_row:int(rows_in.max()) + 1, first_col:int(cols_in.max()) + 1])
+        return window[rows_in - first_row, cols_in - first_col]
+
+
+@traced('read_csv', record=data_info)
 def read_csv(filename):
     """ Read a csv file from fand instrument and return the data of csv
     
@@ -179,9 +329,101 @@ def read_csv(filename):
         return numpy.array(object=[turbulence,salinity,algal_density])
 
 
+# Files that have already been read are kept in an in-process cache, keyed by
+# their absolute path and checked against their modification time and size,
+# so a file that changed on disk is always read again. The cache holds at most
+# CACHE_MAX_BYTES of data, dropping the least recently used files first.
+# The arrays it hands out are read-only, so cached data can't be changed by
+# whoever reads it; copy an array (data.copy()) to modify it.
+
+CACHE_MAX_BYTES = 256 * 2**20
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {'hits': 0, 'misses': 0, 'bytes': 0}
+
+
+def _nbytes(result):
+    if type(result) == tuple:
+        return result[1].nbytes
+    return result.nbytes
+
+
+def _read_only(result):
+    if type(result) == tuple:
+        result[1].setflags(write=False)
+    else:
+        result.setflags(write=False)
+    return result
+
+
+def _copy_metadata(result):
+    # The data is shared but each caller gets its own metadata dictionary
+    if type(result) == tuple:
+        return deepcopy(result[0]), result[1]
+    return result
+
+
+def cache_info():
+    """ Get the hits, misses and size of the cache of read_file
+
+    Returns
+    -------
+    dictionary
+        'hits', 'misses', 'files', 'bytes' and 'max_bytes'
+    """
+
+    with _cache_lock:
+        return dict(_cache_stats, files=len(_cache), max_bytes=CACHE_MAX_BYTES)
+
+
+def cache_clear():
+    """ Empty the cache of read_file and reset its counters """
+
+    with _cache_lock:
+        _cache.clear()
+        _cache_stats.update(hits=0, misses=0, bytes=0)
+
+
+def set_cache_size(max_bytes):
+    """ Set the most data the cache of read_file can hold, in bytes.
+    0 turns the cache off.
+    """
+
+    global CACHE_MAX_BYTES
+
+    if type(max_bytes) != int or max_bytes < 0:
+        raise ValueError('max_bytes must be a positive integer or 0')
+
+    with _cache_lock:
+        CACHE_MAX_BYTES = max_bytes
+        _evict()
+
+
+def _evict():
+    while _cache and _cache_stats['bytes'] > CACHE_MAX_BYTES:
+        stamp, result = _cache.popitem(last=False)[1]
+        _cache_stats['bytes'] -= _nbytes(result)
+
+
+def _read(filename, extension):
+    if extension == '.asdf':
+        return read_asdf(filename)
+
+    elif extension == '.hdf5':
+        return read_h5py(filename)
+
+    elif extension == '.zip':
+        return read_zip(filename)
+
+    else:
+        return read_csv(filename)
+
+
 # Determines the type of file (given a file name)
 # Then extracts data using the functions defines above
-def read_file(filename):
+@traced('read_file', record=data_info)
+def read_file(filename, cache=True, dtype=None):
     """  Determine the type of the file and return metadata and data of image
     
     Parameters
@@ -189,6 +431,16 @@ def read_file(filename):
     filename: str
             name of the file to read, such as aigean_fan_20221212_123848.zip
 
+    cache: bool
+            The default value of cache is True and a file already read is not decoded again,
+            unless it changed on disk. The data returned is then read-only.
+
+    dtype: str or numpy.dtype
+            The default value of dtype is None and the data is returned in the dtype set with
+            aigeanpy.dtypes.set_dtype, or in the dtype stored in the file if none is set.
+            Otherwise the data is converted to this floating point dtype, such as 'float32'.
+            The cache always holds the data as stored in the file.
+
     Returns
     -------
     return1: dictionary
@@ -201,27 +453,101 @@ def read_file(filename):
     if type(filename) != str:
         raise TypeError('Argument "filename" must be of type string')
 
-    current_working_directory = getcwd()
-    file_exists = isfile(path=(current_working_directory+'/'+filename))
+    # Relative names are looked up in the current working directory,
+    # absolute ones (as stored by aigeanpy.catalog) are used as they are.
+    file_exists = isfile(filename)
 
 
     if not file_exists:
-        raise FileNotFoundError ("The file must exists be in the current working directory")
+        raise FileNotFoundError ("The file must exist, by default in the current working directory")
+
+    extension = splitext(filename)[1]
+
+    if extension not in ['.asdf', '.hdf5', '.zip', '.csv']:
+        raise FileNotFoundError ("The file must be in the current working directory and must be of type ASDF, HDF5, zip or csv")
+
+    return _as_dtype(_read_cached(filename, extension, cache), dtype)
+
+
+def _as_dtype(result, dtype):
+    if type(result) == tuple:
+        return result[0], as_dtype(result[1], dtype)
+    return as_dtype(result, dtype)
+
+
+def _read_cached(filename, extension, cache):
+    if not cache:
+        return _read(filename, extension)
+
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    with _cache_lock:
+        entry = _cache.get(path)
+        if entry and entry[0] == stamp:
+            _cache.move_to_end(path)
+            _cache_stats['hits'] += 1
+            return _copy_metadata(entry[1])
+        _cache_stats['misses'] += 1
+
+    result = _read_only(_read(filename, extension))
+
+    with _cache_lock:
+        entry = _cache.pop(path, None)
+        if entry:
+            _cache_stats['bytes'] -= _nbytes(entry[1])
+
+        if _nbytes(result) <= CACHE_MAX_BYTES:
+            _cache[path] = (stamp, result)
+            _cache_stats['bytes'] += _nbytes(result)
+            _evict()
+
+    return _copy_metadata(result)
+
+
+# read_metadata only reads the header of an ASDF, HDF5 or zip file:
+# the data block of an ASDF file is loaded lazily and never touched,
+# only the attributes of the HDF5 'observation' group are read,
+# and only metadata.json is extracted from the zip archive.
+@traced('read_metadata')
+def read_metadata(filename):
+    """ Read only the metadata of an image, without decoding its data
+
+    Parameters
+    ----------
+    filename: str
+            name of the file to read, such as aigean_man_20221212_123848.hdf5
+
+    Returns
+    -------
+    dictionary
+        The information of image
+    """
+
+    if type(filename) != str:
+        raise TypeError('Argument "filename" must be of type string')
+
+    if not isfile(filename):
+        raise FileNotFoundError ("The file must exist, by default in the current working directory")
 
     extension = splitext(filename)[1]
 
     if extension == '.asdf':
-        return read_asdf(filename)
+        import asdf
+        with asdf.open(filename) as f:
+            metadata = {key: f[key] for key in f.keys() if key not in ['data', 'asdf_library', 'history']}
 
     elif extension == '.hdf5':
-        return read_h5py(filename)
+        import h5py
+        with h5py.File(filename, 'r') as f:
+            metadata = dict(f['observation'].attrs)
 
     elif extension == '.zip':
-        return read_zip(filename)
-
-    elif extension == '.csv':
-        return read_csv(filename)
+        with zipfile.ZipFile(filename) as zip_ob:
+            metadata = json.loads(zip_ob.read("metadata.json"))
 
     else:
-        raise FileNotFoundError ("The file must be in the current working directory and must be of type ASDF, HDF5, zip or csv")
+        raise FileNotFoundError ("The file must be of type ASDF, HDF5 or zip")
 
+    return metadata
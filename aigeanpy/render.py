@@ -0,0 +1,214 @@
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.image as mpimg
+import numpy as np
+from aigeanpy.tracing import traced, span
+
+
+
+# quicklook_filename builds the name used for a saved image of a SatMap,
+# the same one SatMap.visualize has always used, e.g.
+# Aigean_Lir_20221223_024822.png or Aigean_Lir_20221223_024822_subtract.png
+
+def quicklook_filename(metadata):
+    """ Build the PNG filename for the image of a SatMap
+
+    Parameters
+    ----------
+    metadata: dictionary
+            metadata of the SatMap
+
+    Returns
+    -------
+    str
+        filename of the image, such as Aigean_Lir_20221223_024822.png
+    """
+
+    if 'operation' in metadata:
+        filename = metadata["observatory"] + "_" + metadata["instrument"] + "_" + metadata["date"] + "_" + metadata["time"] + "_" + metadata["operation"] + ".png"
+    else:
+        filename = metadata["observatory"] + "_" + metadata["instrument"] + "_" + metadata["date"] + "_" + metadata["time"] + ".png"
+    filename = filename.replace('-', "")
+    filename = filename.replace(':', "")
+
+    return filename
+
+
+def thin_ticks(length, max_ticks=10):
+    """ Choose at most max_ticks evenly spaced pixel positions along an axis
+
+    Parameters
+    ----------
+    length: int
+            number of pixels along the axis
+
+    max_ticks: int
+            maximum number of ticks to return, by default 10
+
+    Returns
+    -------
+    ndarray
+        the pixel positions where ticks are placed
+
+    Examples
+    --------
+    >>> thin_ticks(5)
+    array([0, 1, 2, 3, 4])
+    >>> thin_ticks(1000, 3)
+    array([  0, 500, 999])
+    """
+
+    if type(max_ticks) != int or max_ticks <= 0:
+        raise ValueError('max_ticks must be a positive integer')
+
+    if length <= max_ticks:
+        return np.arange(length)
+
+    return np.unique(np.linspace(0, length - 1, max_ticks).round().astype(int))
+
+
+def _colormap(satmap):
+    if 'operation' in satmap.metadata and satmap.metadata['operation'] == "subtract":
+        return "PRGn"
+    return None
+
+
+def draw(satmap, ax, max_ticks=10):
+    """ Draw a SatMap on a matplotlib axes, labelling at most max_ticks
+    ticks per axis with earth coordinates of the pixel centres
+
+    Parameters
+    ----------
+    satmap: SatMap
+            the image to draw
+
+    ax: matplotlib.axes.Axes
+            the axes to draw on
+
+    max_ticks: int
+            maximum number of ticks on each axis, by default 10
+    """
+
+    resolution = satmap.metadata.resolution
+    xcoords = satmap.metadata.xcoords
+    ycoords = satmap.metadata.ycoords
+
+    x_ticks = thin_ticks(int(satmap.data.shape[1]), max_ticks)
+    y_ticks = thin_ticks(int(satmap.data.shape[0]), max_ticks)
+
+    x_labels = xcoords[0] + resolution/2 + x_ticks*resolution
+    y_labels = ycoords[1] - resolution/2 - y_ticks*resolution
+
+    ax.imshow(satmap.data, cmap=_colormap(satmap))
+    ax.tick_params(axis='both', labelsize=7)
+    ax.set_xticks(x_ticks, [str(i) for i in x_labels], rotation=90, fontsize=7)
+    ax.set_yticks(y_ticks, [str(i) for i in y_labels])
+
+
+# render_png never touches pyplot: the figure lives only as long as this call,
+# so rendering many images in a loop neither slows down nor leaks figures.
+
+@traced('render_png')
+def render_png(satmap, savepath=None, axes=True, max_ticks=10, dpi=100):
+    """ Save the image of a SatMap as a PNG without going through pyplot
+
+    Parameters
+    ----------
+    satmap: SatMap or str
+            the image to save, or the name of a file to read it from
+
+    savepath: str
+            The default value of savepath is None and the file would be stored in the current directory.
+            Otherwise it is prepended to the filename, as in SatMap.visualize
+
+    axes: bool
+            The default value of axes is True and the image is drawn with labelled axes. When axes is False,
+            the colour-mapped array is written directly, one PNG pixel per data pixel.
+
+    max_ticks: int
+            maximum number of ticks on each axis, by default 10
+
+    dpi: int
+            resolution of the figure when axes is True, by default 100
+
+    Returns
+    -------
+    str
+        the path of the PNG written
+    """
+
+    if type(satmap) == str:
+        from aigeanpy.satmap import get_satmap
+        satmap = get_satmap(satmap)
+
+    if not satmap.metadata:
+        raise TypeError('Metadata for this file is not available, which suggests that file being analysed is not from one of the ISA imagers.')
+
+    if type(savepath) != str and savepath != None:
+        raise TypeError('The type of savepath should be string.')
+
+    if type(axes) != bool:
+        raise TypeError('The type of axes should be bool, such as True and False')
+
+    filename = quicklook_filename(satmap.metadata)
+    if savepath != None:
+        filename = savepath + filename
+
+    if axes:
+        fig = Figure(dpi=dpi)
+        FigureCanvasAgg(fig)
+        with span('render.draw', shape=list(satmap.data.shape)):
+            draw(satmap, fig.add_subplot(), max_ticks=max_ticks)
+        with span('render.savefig', filename=filename):
+            fig.savefig(filename)
+    else:
+        with span('render.imsave', shape=list(satmap.data.shape)):
+            mpimg.imsave(filename, satmap.data, cmap=_colormap(satmap))
+
+    return filename
+
+
+def _render_one(job):
+    satmap, savepath, axes, max_ticks = job
+    return render_png(satmap, savepath=savepath, axes=axes, max_ticks=max_ticks)
+
+
+def render_many(satmaps, workers=None, savepath=None, axes=True, max_ticks=10):
+    """ Save the images of many SatMaps as PNGs, in parallel across processes
+
+    Parameters
+    ----------
+    satmaps: list[SatMap or str]
+            the images to save. Passing filenames instead of SatMaps lets each
+            worker read its own file, so no arrays are sent between processes.
+
+    workers: int
+            number of worker processes, by default None (one per CPU).
+            With workers=1 the images are rendered in this process.
+
+    savepath: str
+            prepended to each filename, as in render_png
+
+    axes: bool
+            draw labelled axes (True) or write only the colour-mapped array (False)
+
+    max_ticks: int
+            maximum number of ticks on each axis, by default 10
+
+    Returns
+    -------
+    list[str]
+        the paths of the PNGs written, in the same order as satmaps
+    """
+
+    if workers != None and (type(workers) != int or workers <= 0):
+        raise ValueError('workers must be a positive integer')
+
+    jobs = [(satmap, savepath, axes, max_ticks) for satmap in satmaps]
+
+    if workers == 1 or len(jobs) <= 1:
+        return [_render_one(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_one, jobs))
@@ -1,18 +1,23 @@
 from aigeanpy.read_files import read_file
-import matplotlib.pyplot as plt
+from aigeanpy.metadata import SatMetadata, _whole
+from aigeanpy.clustering_numpy import cluster_array
+from aigeanpy.dtypes import result_dtype
+from aigeanpy.tracing import traced, span, data_info
 import aigeanpy.net as net
-from skimage.transform import rescale, downscale_local_mean
 from pathlib import Path
 import numpy as np
 import os
 
 
-def get_satmap(filename):
+def get_satmap(filename, dtype=None):
     """Function to generate SatMap object
     Parameters
     ----------
     filename: string
             The name of the file
+    dtype: str or numpy.dtype
+            The default value of dtype is None and the data keeps the dtype of the policy
+            set with aigeanpy.dtypes, or of the file. Otherwise the data is converted to it.
     Returns
     -------
     object
@@ -22,11 +27,11 @@ def get_satmap(filename):
     extension = os.path.splitext(filename)[1]
     
     if extension == '.csv':
-        data = read_file(filename)
+        data = read_file(filename, dtype=dtype)
         return SatMap(data)
     
     elif extension == '.asdf' or extension == '.hdf5' or extension == '.zip':
-        metadata, data = read_file(filename)
+        metadata, data = read_file(filename, dtype=dtype)
         return SatMap(data,metadata)
     
     else:
@@ -34,6 +39,274 @@ def get_satmap(filename):
     
     
 
+# overlap finds the area covered by every one of the satmaps (which must share
+# a resolution) and, for each of them, the slices of its data that fall inside.
+def overlap(*satmaps):
+    """Find the area covered by all the SatMaps and the part of each one inside it
+    Parameters
+    ----------
+    satmaps: SatMap
+            two or more SatMaps with the same resolution
+
+    Returns
+    -------
+    return1: list
+            x coordinates of the overlapping area
+
+    return2: list
+            y coordinates of the overlapping area
+
+    return3: list[tuple(slice)]
+            for each SatMap, the (row, column) slices of its data inside the overlapping area
+    """
+
+    resolution = satmaps[0].metadata.resolution
+
+    xcoords_overlap = [max(i.metadata.xcoords[0] for i in satmaps), min(i.metadata.xcoords[1] for i in satmaps)]
+    ycoords_overlap = [max(i.metadata.ycoords[0] for i in satmaps), min(i.metadata.ycoords[1] for i in satmaps)]
+
+    if xcoords_overlap[0] >= xcoords_overlap[1] or ycoords_overlap[0] >= ycoords_overlap[1]:
+        raise ValueError('The satmaps are non-overlapping.')
+
+    windows = []
+    for satmap in satmaps:
+        xcoords = satmap.metadata.xcoords
+        ycoords = satmap.metadata.ycoords
+
+        col_range = [round((xcoords_overlap[0]-xcoords[0])/resolution), round((xcoords_overlap[1]-xcoords[0])/resolution + 0.001)]
+        row_range = [round((ycoords[1]-ycoords_overlap[1])/resolution), round((ycoords[1]-ycoords_overlap[0])/resolution + 0.001)]
+
+        windows.append((slice(row_range[0], row_range[1]), slice(col_range[0], col_range[1])))
+
+    return xcoords_overlap, ycoords_overlap, windows
+
+
+# resample_data brings the data of an image to another resolution: finer
+# resolutions are interpolated with cubic splines, coarser ones are averaged
+# over blocks of whole pixels. SatMap.mosaic resamples both images with it.
+def resample_data(data, from_resolution, resolution):
+    """Resample the data of an image from one resolution to another
+    Parameters
+    ----------
+    data: ndarray
+            data of the image
+    from_resolution: float
+            resolution of the data
+    resolution: float
+            resolution wanted
+
+    Returns
+    -------
+    ndarray
+            the resampled data, in the dtype of data if it is floating point
+    """
+
+    if from_resolution == resolution:
+        return data
+
+    from skimage.transform import rescale, downscale_local_mean
+
+    if from_resolution > resolution:
+        return rescale(data, from_resolution/resolution, order=3, mode = 'edge')
+
+    scale = round(resolution/from_resolution)
+    return downscale_local_mean(data, (scale, scale))
+
+
+# _canvas lays images out on the grid covering all of them, at a resolution:
+# the union of their coordinates, its number of rows and columns, and the
+# (first row, end row, first column, end column) of the grid each image covers.
+def _canvas(satmaps, resolution):
+    xcoords_add = [min(i.metadata.xcoords[0] for i in satmaps), max(i.metadata.xcoords[1] for i in satmaps)]
+    ycoords_add = [min(i.metadata.ycoords[0] for i in satmaps), max(i.metadata.ycoords[1] for i in satmaps)]
+
+    row = round((ycoords_add[1] - ycoords_add[0]) / resolution)
+    col = round((xcoords_add[1] - xcoords_add[0]) / resolution)
+
+    ranges = []
+    for satmap in satmaps:
+        xcoords = satmap.metadata.xcoords
+        ycoords = satmap.metadata.ycoords
+
+        col_range = [round((xcoords[0]-xcoords_add[0])/resolution), round((xcoords[1]-xcoords_add[0])/resolution + 0.001)]
+        row_range = [round((ycoords_add[1]-ycoords[1])/resolution), round((ycoords_add[1]-ycoords[0])/resolution + 0.001)]
+
+        ranges.append((row_range[0], row_range[1], col_range[0], col_range[1]))
+
+    return xcoords_add, ycoords_add, row, col, ranges
+
+
+# largest_covered_window finds the largest rectangle of a canvas covered by
+# tiles, for mosaics without padding. The rows and columns are grouped into
+# bands between consecutive tile edges, so the coverage mask has at most
+# 2n + 1 bands along each axis for n tiles, however many pixels they hold.
+# Row by row, the covered height of each column band is a histogram, whose
+# largest rectangle is found with a stack of increasing heights.
+def largest_covered_window(windows, shape):
+    """Find the largest rectangle of a canvas in which every pixel is covered by a tile
+    Parameters
+    ----------
+    windows: list[tuple]
+            for each tile, the (first row, end row, first column, end column) of the canvas it covers
+    shape: tuple
+            the (rows, columns) of the canvas
+
+    Returns
+    -------
+    tuple
+            the (first row, end row, first column, end column) of the rectangle
+
+    Examples
+    --------
+    >>> largest_covered_window([(0, 10, 0, 20), (5, 30, 10, 20)], (30, 20))
+    (0, 30, 10, 20)
+    """
+
+    row_edges = np.unique([0, shape[0]] + [w[0] for w in windows] + [w[1] for w in windows])
+    col_edges = np.unique([0, shape[1]] + [w[2] for w in windows] + [w[3] for w in windows])
+
+    covered = np.zeros((len(row_edges) - 1, len(col_edges) - 1), dtype=bool)
+    for first_row, end_row, first_col, end_col in windows:
+        covered[np.searchsorted(row_edges, first_row):np.searchsorted(row_edges, end_row),
+                np.searchsorted(col_edges, first_col):np.searchsorted(col_edges, end_col)] = True
+
+    band_heights = np.diff(row_edges)
+    heights = np.zeros(len(col_edges) - 1, dtype=np.int64)
+    best_area = 0
+    best = (0, 0, 0, 0)
+
+    for band in range(len(band_heights)):
+        # Covered height of each column band, ending at the bottom of this row band
+        heights = np.where(covered[band], heights + band_heights[band], 0)
+        end_row = int(row_edges[band + 1])
+
+        stack = []
+        for i, height in enumerate(heights.tolist() + [0]):
+            start = i
+            while stack and stack[-1][1] >= height:
+                start, top = stack.pop()
+                area = top * int(col_edges[i] - col_edges[start])
+                if area > best_area:
+                    best_area = area
+                    best = (end_row - top, end_row, int(col_edges[start]), int(col_edges[i]))
+            stack.append((start, height))
+
+    return best
+
+
+# mosaic_satmaps combines any number of images of the same day on one grid,
+# the later images drawn over the earlier ones. Only the output window is
+# allocated: the whole canvas with padding, the largest covered rectangle
+# without it, and each image is copied into the part of it that it covers.
+def mosaic_satmaps(satmaps, resolution = None, padding = True, dtype = None):
+    """Combine SatMaps of the same date, possibly from different instruments, into one image
+    Parameters
+    ----------
+    satmaps: list[SatMap]
+            the images, the later ones drawn over the earlier ones where they overlap
+    resolution: int
+            Resolution for the resultant image. If the resolution is not provided, it would be the finest of the satmaps.
+    padding: bool
+            The default value of padding would be True and the return image would cover all the satmaps, with blanks.
+            When padding is False, the resultant image is the largest rectangle fully covered by the satmaps.
+    dtype: str or numpy.dtype
+            The default value of dtype is None and the image keeps the dtype of the policy set with
+            aigeanpy.dtypes, or of the satmaps. Otherwise the images are resampled and combined in it.
+    Returns
+    -------
+    object
+        A object in format of SatMap, with the metadata of the first satmap and operation 'mosaic'
+    """
+
+    if type(satmaps) != list or len(satmaps) == 0 or any(type(i) != SatMap for i in satmaps):
+        raise TypeError('The satmaps must be a non-empty list of SatMap.')
+
+    if any(not i.metadata for i in satmaps):
+        raise TypeError('Metadata for this file is not available, which suggests that file being analysed is not from one of the ISA imagers.')
+
+    if resolution != None and type(resolution) != int:
+        raise TypeError('The resolution must be an integer.')
+
+    if resolution != None and resolution <= 0:
+        raise ValueError('The resolution must be positive')
+
+    if type(padding) != bool:
+        raise TypeError('The padding must be True or False')
+
+    first = satmaps[0].metadata
+
+    if any(i.metadata['date'] != first['date'] for i in satmaps):
+        raise TypeError('Two satmaps are not from the same day.')
+
+    if resolution == None:
+        resolution = min(i.metadata.resolution for i in satmaps)
+
+    for satmap in satmaps:
+        xcoords = satmap.metadata.xcoords
+        ycoords = satmap.metadata.ycoords
+        if resolution >= (ycoords[1] - ycoords[0]) or resolution >= (xcoords[1] - xcoords[0]):
+            raise ValueError('Resolution is too large.')
+
+    # The images are converted before resampling, as rescale keeps float32 data float32
+    dtype = result_dtype(*[i.data for i in satmaps], dtype=dtype)
+
+    with span('mosaic.resample', resolution=resolution):
+        images = [resample_data(i.data.astype(dtype, copy=False), i.metadata.resolution, resolution) for i in satmaps]
+
+    xcoords_add, ycoords_add, row, col, ranges = _canvas(satmaps, resolution)
+
+    # The earth coordinates of the tile edges, by row and column of the canvas
+    x_edges = {0: xcoords_add[0], col: xcoords_add[1]}
+    y_edges = {0: ycoords_add[1], row: ycoords_add[0]}
+
+    windows = []
+    for satmap, image, (first_row, end_row, first_col, end_col) in zip(satmaps, images, ranges):
+        x_edges.setdefault(first_col, satmap.metadata.xcoords[0])
+        x_edges.setdefault(end_col, satmap.metadata.xcoords[1])
+        y_edges.setdefault(first_row, satmap.metadata.ycoords[1])
+        y_edges.setdefault(end_row, satmap.metadata.ycoords[0])
+
+        windows.append((first_row, min(end_row, first_row + image.shape[0], row),
+                        first_col, min(end_col, first_col + image.shape[1], col)))
+
+    if padding:
+        window = (0, row, 0, col)
+    else:
+        window = largest_covered_window(windows, (row, col))
+
+    first_row, end_row, first_col, end_col = window
+
+    with span('mosaic.composite', shape=[end_row - first_row, end_col - first_col]) as composite:
+        data = np.zeros((end_row - first_row, end_col - first_col), dtype=dtype)
+
+        for image, (top, bottom, left, right) in zip(images, windows):
+            rows = slice(max(top, first_row), min(bottom, end_row))
+            cols = slice(max(left, first_col), min(right, end_col))
+            if rows.start >= rows.stop or cols.start >= cols.stop:
+                continue
+            data[rows.start - first_row:rows.stop - first_row, cols.start - first_col:cols.stop - first_col] = \
+                image[rows.start - top:rows.stop - top, cols.start - left:cols.stop - left]
+
+        composite.set(bytes=int(data.nbytes))
+
+    metadata_add = {}
+    metadata_add["observatory"] = first["observatory"]
+    metadata_add["instrument"] = first['instrument']
+
+    # The edges of the largest covered rectangle are tile edges, so they keep the coordinates of the tiles
+    metadata_add["xcoords"] = np.array([x_edges.get(first_col, xcoords_add[0] + first_col*resolution),
+                                        x_edges.get(end_col, xcoords_add[0] + end_col*resolution)])
+    metadata_add["ycoords"] = np.array([y_edges.get(end_row, ycoords_add[1] - end_row*resolution),
+                                        y_edges.get(first_row, ycoords_add[1] - first_row*resolution)])
+
+    metadata_add['resolution'] = _whole(resolution)
+    metadata_add["date"] = first["date"]
+    metadata_add['time'] = first['time']
+    metadata_add['operation'] = 'mosaic'
+
+    return SatMap(data, metadata_add)
+
+
 class SatMap:
     """An object to manipulate the data
         Parameters
@@ -46,14 +319,18 @@ class SatMap:
         
         metadata: dictionary
                 The default value of metadata is None. Store the information of file if the file has the metadata.
+                It is kept as a SatMetadata, a dictionary whose coordinates and resolution are also
+                available as attributes, such as metadata.xcoords.
             """
     def __init__(self,data, metadata=None) -> None:
         self.data = data
+        if metadata != None and type(metadata) != SatMetadata:
+            metadata = SatMetadata(metadata)
         self.metadata = metadata
 
     def __str__(self):
-        boottom_left = (self.metadata['xcoords'][0], self.metadata['ycoords'][0])
-        top_right = (self.metadata['xcoords'][1], self.metadata['ycoords'][1])
+        boottom_left = (self.metadata.xcoords[0], self.metadata.ycoords[0])
+        top_right = (self.metadata.xcoords[1], self.metadata.ycoords[1])
         info = "<" + self.metadata["observatory"] + "/" + self.metadata["instrument"] + ":" + " " + str(boottom_left) + " - " + str(top_right) + " " + str(self.metadata["resolution"]) + " m/px>"
         return info
 
@@ -123,8 +400,8 @@ class SatMap:
 
         if self.metadata:
             field_of_view = (
-                self.metadata['xcoords'][1]-self.metadata['xcoords'][0],
-                self.metadata['ycoords'][1]-self.metadata['ycoords'][0]
+                self.metadata.xcoords[1]-self.metadata.xcoords[0],
+                self.metadata.ycoords[1]-self.metadata.ycoords[0]
             )
             
             return field_of_view
@@ -176,9 +453,9 @@ class SatMap:
         """
 
         if self.metadata:
-            xcoords = self.metadata['xcoords']
-            ycoords = self.metadata['ycoords']
-            resolution = self.metadata['resolution']
+            xcoords = self.metadata.xcoords
+            ycoords = self.metadata.ycoords
+            resolution = self.metadata.resolution
             x_centre = xcoords[0] + (self.data.shape[1]/2)*resolution
             y_centre = ycoords[1] - (self.data.shape[0]/2)*resolution 
             centre_coor = (x_centre, y_centre)
@@ -189,6 +466,7 @@ class SatMap:
             raise TypeError('Metadata for this file is not available, which suggests that file being analysed is not from one of the ISA imagers.')
 
 
+    @traced(record=data_info)
     def __add__(self, other):
 
         """Add two SatMap object for the image on the same date and from the same instrument and return the result in format of SatMap 
@@ -227,13 +505,13 @@ class SatMap:
             if self.metadata['date'] != other.metadata["date"]:
                 raise TypeError('Two satmaps are not from the same day.')
 
-            resolution = self.metadata['resolution']
+            resolution = self.metadata.resolution
 
-            xcoords_self = self.metadata['xcoords']
-            ycoords_self = self.metadata['ycoords']
+            xcoords_self = self.metadata.xcoords
+            ycoords_self = self.metadata.ycoords
 
-            xcoords_other = other.metadata['xcoords']
-            ycoords_other = other.metadata['ycoords']
+            xcoords_other = other.metadata.xcoords
+            ycoords_other = other.metadata.ycoords
 
             xcoords_add = [min(xcoords_self[0], xcoords_other[0]), max(xcoords_self[1], xcoords_other[1])]
             ycoords_add = [min(ycoords_self[0], ycoords_other[0]), max(ycoords_self[1], ycoords_other[1])]
@@ -241,7 +519,8 @@ class SatMap:
             row = round((ycoords_add[1] - ycoords_add[0]) / resolution)
             col = round((xcoords_add[1] - xcoords_add[0]) / resolution)
 
-            data_add = np.zeros((row, col))
+            # The canvas keeps the dtype of the images (or of the dtype policy), not always float64
+            data_add = np.zeros((row, col), dtype=result_dtype(self.data, other.data))
 
             col_range_self = [round((xcoords_self[0]-xcoords_add[0])/resolution), round((xcoords_self[1]-xcoords_add[0])/resolution + 0.001)]
             row_range_self = [round((ycoords_add[1]-ycoords_self[1])/resolution), round((ycoords_add[1]-ycoords_self[0])/resolution + 0.001)]
@@ -267,6 +546,7 @@ class SatMap:
             raise TypeError('Metadata for this file is not available,which suggests that file being analysed is not from one of the ISA imagers.')
 
 
+    @traced(record=data_info)
     def __sub__(self, other):
 
         """Subtract two SatMap object for the image on the different date and from the same instrument and return the result in format of SatMap 
@@ -305,33 +585,12 @@ class SatMap:
             if self.metadata['date'] == other.metadata["date"]:
                 raise TypeError('Two satmaps are from the same day.')
 
-            resolution = self.metadata['resolution']
-
-            xcoords_self = self.metadata['xcoords']
-            ycoords_self = self.metadata['ycoords']
-
-            xcoords_other = other.metadata['xcoords']
-            ycoords_other = other.metadata['ycoords']
-
-            xcoords_subtract = [max(xcoords_self[0], xcoords_other[0]), min(xcoords_self[1], xcoords_other[1])]
-            ycoords_subtract = [max(ycoords_self[0], ycoords_other[0]), min(ycoords_self[1], ycoords_other[1])]
-
-            if xcoords_subtract[0] >= xcoords_subtract[1] or ycoords_subtract[0] >= ycoords_subtract[1]:
+            try:
+                xcoords_subtract, ycoords_subtract, windows = overlap(self, other)
+            except ValueError:
                 raise TypeError('Two satmaps are non-overlapping.')
 
-            row = round((ycoords_subtract[1] - ycoords_subtract[0]) / resolution)
-            col = round((xcoords_subtract[1] - xcoords_subtract[0]) / resolution)
-
-            data_subtract = np.zeros((row, col))
-
-            col_range_self = [round((xcoords_subtract[0]-xcoords_self[0])/resolution), round((xcoords_subtract[1]-xcoords_self[0])/resolution + 0.001)]
-            row_range_self = [round((ycoords_self[1]-ycoords_subtract[1])/resolution), round((ycoords_self[1]-ycoords_subtract[0])/resolution + 0.001)]
-
-            col_range_other = [round((xcoords_subtract[0]-xcoords_other[0])/resolution), round((xcoords_subtract[1]-xcoords_other[0])/resolution + 0.001)]
-            row_range_other = [round((ycoords_other[1]-ycoords_subtract[1])/resolution), round((ycoords_other[1]-ycoords_subtract[0])/resolution + 0.001)]
-
-            data_subtract = self.data[row_range_self[0]:row_range_self[1], col_range_self[0]:col_range_self[1]]
-            data_subtract = data_subtract - other.data[row_range_other[0]:row_range_other[1], col_range_other[0]:col_range_other[1]]
+            data_subtract = np.subtract(self.data[windows[0]], other.data[windows[1]], dtype=result_dtype(self.data, other.data))
 
             metadata_subtract = self.metadata.copy()
             metadata_subtract["xcoords"] = np.array(xcoords_subtract)
@@ -350,7 +609,8 @@ class SatMap:
 
 
 
-    def mosaic(self, other, resolution = None, padding = True):
+    @traced(record=data_info)
+    def mosaic(self, other, resolution = None, padding = True, dtype = None):
 
         """Add two SatMap object for the image on the same date and from the mixing instrument and return the result in format of SatMap 
         Parameters
@@ -363,8 +623,11 @@ class SatMap:
         resolution: int
                 Resolution for the resultant image. If the resolution is not provided, it would be one of two satmaps with larger detail.
         padding: bool
-                The default value of padding would be Ture and the return image would contain blanks. When padding is False, the resulant image 
-                 would only cover the maximum portion without blanks.
+                The default value of padding would be Ture and the return image would contain blanks. When padding is False, the resulant image
+                 would only cover the largest rectangle without blanks, see largest_covered_window.
+        dtype: str or numpy.dtype
+                The default value of dtype is None and the image keeps the dtype of the policy set with
+                aigeanpy.dtypes, or of the two satmaps. Otherwise the images are resampled and combined in it.
         Returns
         -------
         object
@@ -387,189 +650,205 @@ class SatMap:
         327
         """
 
-        if self.metadata and other.metadata:
+        return mosaic_satmaps([self, other], resolution=resolution, padding=padding, dtype=dtype)
 
-            if resolution != None and type(resolution) != int:
-                raise TypeError('The resolution must be an integer.')
 
-            if resolution != None and resolution <= 0:
-                raise ValueError('The resolution must be positive')
 
-            if type(padding) != bool:
-                raise TypeError('The padding must be True or False')
+    @traced(record=data_info)
+    def cluster(self, k, features = 'value', max_iterations = 10, seed = None):
 
-            if self.metadata['date'] != other.metadata["date"]:
-                raise TypeError('Two satmaps are not from the same day.')
+        """Group the pixels of the image into k clusters with k-means and return the cluster of each pixel in format of SatMap
+        Parameters
+        ----------
+        self: object
+                Object of SatMap
+        
+        k: int
+                Number of clusters
+        features: str, SatMap or list
+                What each pixel is clustered on. 'value' is the value of the pixel, 'coords' the earth coordinates
+                of its centre, and a SatMap on the same grid (same shape, xcoords and ycoords) adds the value
+                of the same pixel in that image, such as the observation of another instrument.
+                The default value of features is 'value'. Each feature is standardised before clustering.
+        max_iterations: int
+                Maximum number of iterations of k-means, by default 10
+        seed: int
+                Seed of the random choice of the initial centres, by default None
+        Returns
+        -------
+        object
+            A object in format of SatMap on the same grid, whose data is the cluster (int32) of each pixel
+        Examples
+        --------
+        >>> image = SatMap(np.array([[0., 0., 10.], [0., 10., 10.]]), {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:38:48', 'xcoords': [0.0, 90.0], 'ycoords': [0.0, 60.0], 'resolution': 30})
+        >>> labels = image.cluster(2, seed = 0)
+        >>> bool(labels.data[0, 0] == labels.data[1, 0] and labels.data[0, 0] != labels.data[0, 2])
+        True
+        """
+
+        if not self.metadata:
+            raise TypeError('Metadata for this file is not available, which suggests that file being analysed is not from one of the ISA imagers.')
+
+        if type(features) != list:
+            features = [features]
+
+        rows, cols = self.data.shape
+        columns = []
+
+        for feature in features:
+            if type(feature) == SatMap:
+                if feature.data.shape != self.data.shape or feature.metadata.xcoords != self.metadata.xcoords or feature.metadata.ycoords != self.metadata.ycoords:
+                    raise ValueError('Satmaps used as features must be on the same grid as the image being clustered.')
+                columns.append(feature.data.reshape(-1))
+
+            elif feature == 'value':
+                columns.append(self.data.reshape(-1))
+
+            elif feature == 'coords':
+                x_earth, y_earth = self.metadata.pixel_to_earth(np.arange(rows)[:, None], np.arange(cols)[None, :])
+                columns.append(np.broadcast_to(x_earth, (rows, cols)).reshape(-1))
+                columns.append(np.broadcast_to(y_earth, (rows, cols)).reshape(-1))
 
-            if resolution == None:
-                if self.metadata['resolution'] <= other.metadata['resolution']:
-                    resolution = self.metadata['resolution']
-                else:
-                    resolution = other.metadata['resolution']
-
-            xcoords_self = self.metadata['xcoords']
-            ycoords_self = self.metadata['ycoords']
-
-            xcoords_other = other.metadata['xcoords']
-            ycoords_other = other.metadata['ycoords']
-
-            if resolution >= (ycoords_self[1] - ycoords_self[0]) or resolution >= (xcoords_self[1] - xcoords_self[0]) or resolution >= (ycoords_other[1] - ycoords_other[0]) or resolution >= (xcoords_other[1] - xcoords_other[0]):
-                raise ValueError('Resolution is too large.')
-
-            #rescale images
-            if self.metadata['resolution'] != resolution:
-                if self.metadata['resolution'] > resolution:
-                    self_scale = self.metadata['resolution']/resolution
-                    self_data_rescale = rescale(self.data, self_scale, order=3, mode = 'edge')
-                else:
-                    self_scale = round(resolution/self.metadata['resolution'])
-                    self_data_rescale = downscale_local_mean(self.data, (self_scale, self_scale) )
-                    print(self_data_rescale.shape)
-            else:
-                self_data_rescale = self.data[:]
-
-            if other.metadata['resolution'] != resolution:
-                if other.metadata['resolution'] > resolution:
-                    other_scale = other.metadata['resolution']/resolution
-                    other_data_rescale = rescale(other.data, other_scale, order=3, mode = 'edge')
-                else:
-                    other_scale = round(resolution/other.metadata['resolution'])
-                    other_data_rescale = downscale_local_mean(other.data, (other_scale, other_scale) )
             else:
-                other_data_rescale = other.data[:]
+                raise ValueError("Features must be 'value', 'coords' or a SatMap.")
 
-            #get the image after adding
-            xcoords_add = [min(xcoords_self[0], xcoords_other[0]), max(xcoords_self[1], xcoords_other[1])]
-            ycoords_add = [min(ycoords_self[0], ycoords_other[0]), max(ycoords_self[1], ycoords_other[1])]
+        points = np.column_stack(columns).astype(np.float64)
 
-            row = round((ycoords_add[1] - ycoords_add[0]) / resolution)
-            col = round((xcoords_add[1] - xcoords_add[0]) / resolution)
+        # Standardise the features so that values and coordinates weigh the same
+        spread = points.std(axis=0)
+        spread[spread == 0] = 1
+        points = (points - points.mean(axis=0)) / spread
 
-            data_add = np.zeros((row, col))
+        centres, labels = cluster_array(points, clusters=k, max_iterations=max_iterations, seed=seed)
 
-            col_range_self = [round((xcoords_self[0]-xcoords_add[0])/resolution), round((xcoords_self[1]-xcoords_add[0])/resolution + 0.001)]
-            row_range_self = [round((ycoords_add[1]-ycoords_self[1])/resolution), round((ycoords_add[1]-ycoords_self[0])/resolution + 0.001)]
+        metadata_cluster = self.metadata.copy()
+        metadata_cluster['operation'] = 'cluster'
 
+        return SatMap(labels.reshape(rows, cols), metadata_cluster)
 
-            col_range_other = [round((xcoords_other[0]-xcoords_add[0])/resolution), round((xcoords_other[1]-xcoords_add[0])/resolution + 0.001)]
-            row_range_other = [round((ycoords_add[1]-ycoords_other[1])/resolution), round((ycoords_add[1]-ycoords_other[0])/resolution + 0.001)]
 
+    @traced(record=data_info)
+    def resample(self, resolution, dtype = None):
 
-            row_self_reshape = row_range_self[1] - row_range_self[0]
-            col_self_reshape = col_range_self[1] - col_range_self[0]
-            row_other_reshape = row_range_other[1] - row_range_other[0]
-            col_other_reshape = col_range_other[1] - col_range_other[0]
-            data_add[row_range_self[0]:row_range_self[1], col_range_self[0]:col_range_self[1]] = self_data_rescale[0:row_self_reshape, 0:col_self_reshape]
-            data_add[row_range_other[0]:row_range_other[1], col_range_other[0]:col_range_other[1]] = other_data_rescale[0:row_other_reshape, 0:col_other_reshape]
+        """Resample the image to another resolution and return the result in format of SatMap
+        Parameters
+        ----------
+        self: object
+                Object of SatMap
+        
+        resolution: int
+                Resolution of the resultant image
+        dtype: str or numpy.dtype
+                The default value of dtype is None and the image keeps the dtype of the policy set with
+                aigeanpy.dtypes, or its own.
+        Returns
+        -------
+        object
+            A object in format of SatMap covering the same area at the new resolution
+        Examples
+        --------
+        >>> image = SatMap(np.ones((10, 20)), {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:38:48', 'xcoords': [0.0, 600.0], 'ycoords': [0.0, 300.0], 'resolution': 30})
+        >>> image.resample(15).data.shape
+        (20, 40)
+        """
 
-            if padding == True:
+        if not self.metadata:
+            raise TypeError('Metadata for this file is not available, which suggests that file being analysed is not from one of the ISA imagers.')
 
-                metadata_add = {}
+        if type(resolution) != int:
+            raise TypeError('The resolution must be an integer.')
 
-                metadata_add["observatory"] = self.metadata["observatory"]
+        if resolution <= 0:
+            raise ValueError('The resolution must be positive')
 
-                instrument = self.metadata['instrument']
-                metadata_add["instrument"] = instrument
+        data = resample_data(self.data.astype(result_dtype(self.data, dtype=dtype), copy=False), self.metadata.resolution, resolution)
 
-                metadata_add["xcoords"] = np.array(xcoords_add)
-                metadata_add["ycoords"] = np.array(ycoords_add)
+        metadata_resample = self.metadata.copy()
+        metadata_resample['resolution'] = resolution
 
-                metadata_add['resolution'] = resolution
+        return SatMap(data, metadata_resample)
 
-                metadata_add["date"] = self.metadata["date"]
 
-                time_add = self.metadata['time']
-                metadata_add['time'] = time_add
-                metadata_add['operation'] = 'mosaic'
+    @traced()
+    def save(self, path, format = None, chunks = True, compression = 'default', dtype = None):
 
-                return SatMap(data_add, metadata_add)
+        """Save the SatMap to a file in one of the layouts of the ISA imagers, so that it can be read again with get_satmap
+        Parameters
+        ----------
+        self: object
+                Object of SatMap
+        
+        path: str
+                Name of the file to write, such as aigean_man_20221212_123848_mosaic.hdf5
+        format: str
+                'hdf5', 'zip' or 'asdf'. The default value of format is None and it is chosen from the extension of path.
+        chunks: bool or tuple
+                Shape of the chunks of HDF5 data. The default value of chunks is True and h5py chooses it.
+        compression: str
+                The default value of compression is 'default': HDF5 data is compressed with gzip, while zip and ASDF data
+                is stored uncompressed, so the data of a zip file can be memory-mapped with read_files.mmap_zip.
+                'lzf' or None for HDF5, 'deflate' for zip and 'zlib' or 'lz4' for ASDF are also available.
+        dtype: str or numpy.dtype
+                The default value of dtype is None and the data is written in the dtype of the policy set with
+                aigeanpy.dtypes, or in its own dtype.
+        Returns
+        -------
+        str
+            The name of the file written
+        Examples
+        --------
+        >>> image = SatMap(np.ones((10, 20)), {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:38:48', 'xcoords': [0.0, 600.0], 'ycoords': [0.0, 300.0], 'resolution': 30})
+        >>> filename = image.save('aigean_lir_20221212_123848_copy.zip')
+        >>> get_satmap(filename).data.shape
+        (10, 20)
+        >>> os.remove(filename)
+        """
 
-            else:
-                #without padding
-                
-                # find the overlapping area
-                xcoords_overlap = [max(xcoords_self[0], xcoords_other[0]), min(xcoords_self[1], xcoords_other[1])]
-                ycoords_overlap = [max(ycoords_self[0], ycoords_other[0]), min(ycoords_self[1], ycoords_other[1])]
-
-
-                if xcoords_overlap[0] >= xcoords_overlap[1] or ycoords_overlap[0] >= ycoords_overlap[1]:
-                    row_overlap = 0
-                    col_overlap = 0
-                    col_range_overlap = [0,0]
-                    row_range_overlap = [0,0]
-                else:
-                    row_overlap = round((ycoords_overlap[1] - ycoords_overlap[0]) / resolution)
-                    col_overlap = round((xcoords_overlap[1] - xcoords_overlap[0]) / resolution)
-                    col_range_overlap = [round((xcoords_overlap[0]-xcoords_add[0])/resolution), round((xcoords_overlap[1]-xcoords_add[0])/resolution + 0.001)]
-                    row_range_overlap = [round((ycoords_add[1]-ycoords_overlap[1])/resolution), round((ycoords_add[1]-ycoords_overlap[0])/resolution + 0.001)]
-
-                #comparing areas of different part
-
-                area1 = row_overlap*col
-                area2 = col_overlap*row
-                area3 = self_data_rescale.shape[0]*self_data_rescale.shape[1]
-                area4 = other_data_rescale.shape[0]*other_data_rescale.shape[1]
-
-                maximum_area = 0
-                col_range_nonpad = []
-                row_range_nonpad = []
-                xcoords_nonpad = []
-                ycoords_nonpad = []
-
-                if maximum_area <= area1:
-                    maximum_area = area1
-                    col_range_nonpad = [0, col]
-                    row_range_nonpad = row_range_overlap[:]
-                    xcoords_nonpad = xcoords_add[:]
-                    ycoords_nonpad = ycoords_overlap[:]
-
-                    if maximum_area <= area2:
-                        maximum_area = area2
-                        col_range_nonpad = col_range_overlap[:]
-                        row_range_nonpad = [0, row]
-                        xcoords_nonpad = xcoords_overlap[:]
-                        ycoords_nonpad = ycoords_add[:]
-
-                        if maximum_area <= area3:
-                            maximum_area = area3
-                            col_range_nonpad = col_range_self[:]
-                            row_range_nonpad = row_range_self[:]
-                            xcoords_nonpad = xcoords_self[:]
-                            ycoords_nonpad = ycoords_self[:]
-
-                            if maximum_area <= area4:
-                                maximum_area = area4
-                                col_range_nonpad = col_range_other[:]
-                                row_range_nonpad = row_range_other[:]
-                                xcoords_nonpad = xcoords_other[:]
-                                ycoords_nonpad = ycoords_other[:]
-
-                row_nonpad = row_range_nonpad[1]-row_range_nonpad[0]
-                col_nonpad = col_range_nonpad[1] - col_range_nonpad[0]
-                data_nonpad = np.zeros((row_nonpad, col_nonpad))
-                data_nonpad = data_add[row_range_nonpad[0]:row_range_nonpad[1], col_range_nonpad[0]:col_range_nonpad[1]]
-
-                metadata_nonpad = {}
-                metadata_nonpad["observatory"] = self.metadata["observatory"]
-
-                instrument = self.metadata['instrument']
-                metadata_nonpad["instrument"] = instrument
-
-                metadata_nonpad["xcoords"] = np.array(xcoords_nonpad)
-                metadata_nonpad["ycoords"] = np.array(ycoords_nonpad)
-
-                metadata_nonpad['resolution'] = resolution
-
-                metadata_nonpad["date"] = self.metadata["date"]
-
-                time_add = self.metadata['time'] 
-                metadata_nonpad['time'] = time_add
-                metadata_nonpad['operation'] = 'mosaic'
-
-                return SatMap(data_nonpad, metadata_nonpad)
+        if not self.metadata:
+            raise TypeError('Metadata for this file is not available, which suggests that file being analysed is not from one of the ISA imagers.')
+
+        from aigeanpy.write_files import write_file
+
+        return write_file(path, self.metadata, self.data, format=format, chunks=chunks, compression=compression, dtype=dtype)
+
+
+    def zonal_stats(self, zones, statistics = None):
+        """Get statistics of the pixels of the image inside zones, such as harbours or survey boxes
+        Parameters
+        ----------
+        zones: Zones, dictionary or list
+                boxes (xmin, ymin, xmax, ymax) or polygons [(x, y), ...] in earth coordinates, see aigeanpy.zonal
+        statistics: list[str]
+                any of 'count', 'sum', 'mean', 'std', 'min' and 'max', by default ['count', 'mean', 'min', 'max']
+        Returns
+        -------
+        dictionary
+            'zone', the names of the zones, and an array for each statistic with one value per zone
+        """
+
+        from aigeanpy.zonal import zonal_stats
+
+        return zonal_stats(self, zones, statistics=statistics)
 
-    
 
+    def to_sparse(self, block_size = 256):
+        """Store the image as blocks of block_size x block_size pixels, keeping only the blocks that are not all zeros
+        Parameters
+        ----------
+        block_size: int
+                number of rows and columns of each block, by default 256
+        Returns
+        -------
+        object
+            A SparseSatMap, see aigeanpy.sparse
+        """
+
+        from aigeanpy.sparse import SparseSatMap
+
+        return SparseSatMap.from_satmap(self, block_size=block_size)
+
+
+    @traced()
     def visualize(self, save = False, savepath = None):
 
         """Fuction for displaying or saving the image 
@@ -601,41 +880,16 @@ class SatMap:
         if type(savepath) != str and savepath != None:
             raise TypeError('The type of savepath should be string.')
 
-        x_len = int(self.data.shape[1])
-        y_len = int(self.data.shape[0])
-        x_ticks = np.arange(x_len)
-        y_ticks = np.arange(y_len)
-
-        resolution = self.metadata['resolution']
-
-        x_labels = np.arange(self.metadata['xcoords'][0] + resolution/2, self.metadata['xcoords'][1], self.metadata['resolution'])
-        y_labels = np.arange(self.metadata['ycoords'][1] - resolution/2 , self.metadata['ycoords'][0], -(self.metadata['resolution']))
-
-        if 'operation' in self.metadata and self.metadata['operation'] == "subtract":
-            plt.imshow(self.data, cmap = "PRGn" )
-        else:
-            plt.imshow(self.data )
-        plt.tick_params(axis='both', labelsize=7)
-        plt.xticks(x_ticks, x_labels)
-        plt.xticks(rotation=90, fontsize=7)
-        plt.yticks(y_ticks, y_labels)
+        # matplotlib is only imported when an image is drawn
+        from aigeanpy.render import draw, render_png
 
         if save == False:
+            import matplotlib.pyplot as plt
+
+            fig, ax = plt.subplots()
+            draw(self, ax)
             plt.show()
+            plt.close(fig)
 
         else:
-            if 'operation' in self.metadata:
-                filename = self.metadata["observatory"] + "_" + self.metadata["instrument"] + "_" +self.metadata["date"] + "_" + self.metadata["time"] + "_" + self.metadata["operation"]+ ".png"
-            else:
-                filename = self.metadata["observatory"] + "_" + self.metadata["instrument"] + "_" +self.metadata["date"] + "_" + self.metadata["time"] + ".png"
-            filename = filename.replace('-', "")
-            filename = filename.replace(':', "")
-
-            if savepath == None:
-                plt.savefig(filename)
-            else:
-                pathname = savepath + filename
-                plt.savefig(pathname)
-
-
-
+            render_png(self, savepath=savepath)
@@ -0,0 +1,443 @@
+from math import ceil, floor
+import os
+import numpy as np
+from aigeanpy.satmap import SatMap, _canvas, resample_data
+from aigeanpy.metadata import SatMetadata, _whole
+from aigeanpy.dtypes import result_dtype, resolve_dtype
+from aigeanpy.tracing import traced, span
+
+
+# A SparseSatMap is an image cut into square blocks of block_size x block_size
+# pixels, of which only the blocks holding data are stored, in a dictionary
+# keyed by (block row, block column). The blocks that are not stored are zero.
+# Mosaics of scattered passes over the Aigean area are mostly zeros, so their
+# memory grows with the area the passes cover rather than with the rectangle
+# around them. The blocks of the edges are stored whole; the pixels beyond
+# the image are ignored.
+#
+# The image is only made dense when asked, by densify or window, and saving
+# to HDF5 writes one chunk per stored block, so the blocks that are not stored
+# take no space in the file either.
+
+BLOCK_SIZE = 256
+
+
+def _info(result):
+    return {'shape': list(result.shape()), 'bytes': result.nbytes, 'blocks': len(result.blocks)}
+
+
+class SparseSatMap:
+    """An image stored as blocks, only where it holds data, with the interface of SatMap
+
+        Parameters
+        ----------
+        metadata: dictionary
+                the information of the image, with its xcoords, ycoords and resolution
+
+        shape: tuple
+                number of (rows, columns) of the image
+
+        dtype: str or numpy.dtype
+                dtype of the data, by default float64
+
+        block_size: int
+                number of rows and columns of each block, by default 256
+
+        Examples
+        --------
+        >>> image = SatMap(np.zeros((600, 1000)), {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:38:48', 'xcoords': [0.0, 30000.0], 'ycoords': [0.0, 18000.0], 'resolution': 30})
+        >>> image.data[10:20, 900:950] = 1
+        >>> sparse = SparseSatMap.from_satmap(image)
+        >>> len(sparse.blocks), sparse.shape()
+        (1, (600, 1000))
+        >>> bool((sparse.densify().data == image.data).all())
+        True
+    """
+
+    def __init__(self, metadata, shape, dtype=np.float64, block_size=BLOCK_SIZE) -> None:
+
+        if type(block_size) != int or block_size <= 0:
+            raise ValueError('block_size must be a positive integer')
+
+        if len(shape) != 2 or shape[0] < 0 or shape[1] < 0:
+            raise ValueError('shape must be the (rows, columns) of the image')
+
+        if type(metadata) != SatMetadata:
+            metadata = SatMetadata(metadata)
+
+        self.metadata = metadata
+        self.rows, self.cols = int(shape[0]), int(shape[1])
+        self.dtype = np.dtype(dtype)
+        self.block_size = block_size
+        self.blocks = {}
+
+    @classmethod
+    def from_satmap(cls, satmap, block_size=BLOCK_SIZE):
+        """Store the blocks of a SatMap that are not all zeros"""
+
+        if not satmap.metadata:
+            raise TypeError('Metadata for this file is not available, which suggests that file being analysed is not from one of the ISA imagers.')
+
+        sparse = cls(satmap.metadata.copy(), satmap.data.shape, dtype=satmap.data.dtype, block_size=block_size)
+        sparse.paste(satmap.data, 0, 0)
+        return sparse
+
+    def __str__(self):
+        bottom_left = (self.metadata.xcoords[0], self.metadata.ycoords[0])
+        top_right = (self.metadata.xcoords[1], self.metadata.ycoords[1])
+        return "<" + self.metadata["observatory"] + "/" + self.metadata["instrument"] + ": " + str(bottom_left) + " - " + str(top_right) + " " + str(self.metadata["resolution"]) + " m/px, " + str(len(self.blocks)) + " blocks>"
+
+    def meta(self):
+        """Get the metadata of image"""
+        return self.metadata
+
+    def shape(self):
+        """Get the shape of the image, as that of the data of a SatMap"""
+        return (self.rows, self.cols)
+
+    def fov(self):
+        """Get the field of view of image in earth coordinates"""
+        return (self.metadata.xcoords[1] - self.metadata.xcoords[0], self.metadata.ycoords[1] - self.metadata.ycoords[0])
+
+    def centre(self):
+        """Get the centre coordinate of image in earth coordinates"""
+        resolution = self.metadata.resolution
+        return (self.metadata.xcoords[0] + (self.cols/2)*resolution, self.metadata.ycoords[1] - (self.rows/2)*resolution)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the blocks stored"""
+        return self.block_size * self.block_size * self.dtype.itemsize * len(self.blocks)
+
+    def coverage(self):
+        """Fraction of the blocks of the image that are stored"""
+        total = ceil(self.rows / self.block_size) * ceil(self.cols / self.block_size)
+        return len(self.blocks) / total if total else 0.0
+
+    def _block_ranges(self, first_row, end_row, first_col, end_col):
+        # The blocks overlapping a window, with the part of the window in each
+        size = self.block_size
+        for block_row in range(first_row // size, (end_row - 1) // size + 1):
+            for block_col in range(first_col // size, (end_col - 1) // size + 1):
+                top, bottom = max(first_row, block_row * size), min(end_row, (block_row + 1) * size)
+                left, right = max(first_col, block_col * size), min(end_col, (block_col + 1) * size)
+                yield (block_row, block_col), top, bottom, left, right
+
+    def _clip(self, first_row, end_row, first_col, end_col):
+        return max(first_row, 0), min(end_row, self.rows), max(first_col, 0), min(end_col, self.cols)
+
+    def paste(self, data, row, col):
+        """Draw an array over the image, its first pixel at (row, col). Blocks are only
+        added where the array is not zero, and the parts outside the image are left out.
+
+        Parameters
+        ----------
+        data: ndarray
+                the values to draw
+        row, col: int
+                row and column of the image where the first pixel of data goes
+        """
+
+        first_row, end_row, first_col, end_col = self._clip(row, row + data.shape[0], col, col + data.shape[1])
+        if first_row >= end_row or first_col >= end_col:
+            return
+
+        size = self.block_size
+        for key, top, bottom, left, right in self._block_ranges(first_row, end_row, first_col, end_col):
+            part = data[top - row:bottom - row, left - col:right - col]
+            block = self.blocks.get(key)
+            if block is None:
+                if not part.any():
+                    continue
+                block = self.blocks[key] = np.zeros((size, size), dtype=self.dtype)
+            block[top - key[0]*size:bottom - key[0]*size, left - key[1]*size:right - key[1]*size] = part
+
+    def clear(self, first_row, end_row, first_col, end_col):
+        """Set a window of the image to zero, dropping the blocks that become empty"""
+
+        first_row, end_row, first_col, end_col = self._clip(first_row, end_row, first_col, end_col)
+        if first_row >= end_row or first_col >= end_col:
+            return
+
+        size = self.block_size
+        for key, top, bottom, left, right in self._block_ranges(first_row, end_row, first_col, end_col):
+            block = self.blocks.get(key)
+            if block is None:
+                continue
+            if bottom - top == size and right - left == size:
+                del self.blocks[key]
+                continue
+            block[top - key[0]*size:bottom - key[0]*size, left - key[1]*size:right - key[1]*size] = 0
+            if not block.any():
+                del self.blocks[key]
+
+    def items(self):
+        """The blocks stored, as (row, column, data) with the data cut at the edges of the image"""
+
+        size = self.block_size
+        for (block_row, block_col), block in self.blocks.items():
+            row, col = block_row * size, block_col * size
+            yield row, col, block[:min(size, self.rows - row), :min(size, self.cols - col)]
+
+    def window(self, first_row, end_row, first_col, end_col):
+        """Get a window of the image as a dense array
+
+        Parameters
+        ----------
+        first_row, end_row, first_col, end_col: int
+                rows and columns of the window, the ends excluded
+
+        Returns
+        -------
+        ndarray
+            the data of the window, zeros where no block is stored
+        """
+
+        data = np.zeros((end_row - first_row, end_col - first_col), dtype=self.dtype)
+        for row, col, block in self.items():
+            top, bottom = max(row, first_row), min(row + block.shape[0], end_row)
+            left, right = max(col, first_col), min(col + block.shape[1], end_col)
+            if top < bottom and left < right:
+                data[top - first_row:bottom - first_row, left - first_col:right - first_col] = block[top - row:bottom - row, left - col:right - col]
+        return data
+
+    def densify(self):
+        """Get the whole image as a SatMap"""
+
+        with span('sparse.densify', shape=[self.rows, self.cols]):
+            return SatMap(self.window(0, self.rows, 0, self.cols), self.metadata.copy())
+
+    def crop(self, xcoords, ycoords):
+        """Keep the part of the image inside earth coordinates, as a SparseSatMap
+
+        Parameters
+        ----------
+        xcoords, ycoords: list
+                the [first, last] earth coordinates to keep along each axis,
+                extended to whole pixels and cut at the edges of the image
+
+        Returns
+        -------
+        SparseSatMap
+            the part of the image kept, with the same block size
+        """
+
+        resolution = self.metadata.resolution
+        x0, y1 = self.metadata.xcoords[0], self.metadata.ycoords[1]
+
+        first_row, end_row, first_col, end_col = self._clip(floor((y1 - ycoords[1]) / resolution + 0.001), ceil((y1 - ycoords[0]) / resolution - 0.001),
+                                                            floor((xcoords[0] - x0) / resolution + 0.001), ceil((xcoords[1] - x0) / resolution - 0.001))
+        if first_row >= end_row or first_col >= end_col:
+            raise ValueError('The coordinates are outside the image.')
+
+        metadata = self.metadata.copy()
+        metadata['xcoords'] = np.array([x0 + first_col*resolution, x0 + end_col*resolution])
+        metadata['ycoords'] = np.array([y1 - end_row*resolution, y1 - first_row*resolution])
+
+        cropped = SparseSatMap(metadata, (end_row - first_row, end_col - first_col), dtype=self.dtype, block_size=self.block_size)
+        for row, col, block in self.items():
+            cropped.paste(block, row - first_row, col - first_col)
+        return cropped
+
+    def _draw(self, other, row, col):
+        # Draw a SatMap or SparseSatMap over the image, its zeros included
+        if type(other) == SparseSatMap:
+            rows, cols = other.shape()
+            self.clear(row, row + rows, col, col + cols)
+            for block_row, block_col, block in other.items():
+                self.paste(block, row + block_row, col + block_col)
+        else:
+            self.clear(row, row + other.data.shape[0], col, col + other.data.shape[1])
+            self.paste(other.data, row, col)
+
+    @traced('SparseSatMap.__add__', record=_info)
+    def __add__(self, other):
+        """Combine with another image of the same day and instrument, as SatMap.__add__ does,
+        the other image drawn over this one where they overlap
+
+        Parameters
+        ----------
+        other: SatMap or SparseSatMap
+                image at the same resolution
+
+        Returns
+        -------
+        SparseSatMap
+            the image covering both, with the block size of this one
+        """
+
+        if not other.metadata:
+            raise TypeError('Metadata for this file is not available,which suggests that file being analysed is not from one of the ISA imagers.')
+
+        if self.metadata["instrument"] != other.metadata["instrument"]:
+            raise TypeError('Two satmaps are not from the same instrument.')
+
+        if self.metadata['date'] != other.metadata["date"]:
+            raise TypeError('Two satmaps are not from the same day.')
+
+        if self.metadata.resolution != other.metadata.resolution:
+            raise ValueError('The satmaps do not have the same resolution.')
+
+        xcoords_add, ycoords_add, row, col, ranges = _canvas([self, other], self.metadata.resolution)
+
+        metadata_add = self.metadata.copy()
+        metadata_add["xcoords"] = np.array(xcoords_add)
+        metadata_add["ycoords"] = np.array(ycoords_add)
+        metadata_add['time'] = self.metadata['time'] + "_and_" + other.metadata['time']
+        metadata_add['operation'] = 'add'
+
+        other_dtype = other.dtype if type(other) == SparseSatMap else other.data.dtype
+        result = SparseSatMap(metadata_add, (row, col), dtype=result_dtype(np.empty(0, self.dtype), np.empty(0, other_dtype)), block_size=self.block_size)
+        result._draw(self, ranges[0][0], ranges[0][2])
+        result._draw(other, ranges[1][0], ranges[1][2])
+        return result
+
+    def overview(self, max_pixels=2048):
+        """Get the image as a SatMap of at most max_pixels rows and columns, taking every
+        n-th pixel of the blocks stored, without making the whole image dense"""
+
+        step = max(1, ceil(max(self.rows, self.cols) / max_pixels))
+        if step == 1:
+            return self.densify()
+
+        data = np.zeros((ceil(self.rows / step), ceil(self.cols / step)), dtype=self.dtype)
+        for row, col, block in self.items():
+            first_row, first_col = (-row) % step, (-col) % step
+            part = block[first_row::step, first_col::step]
+            top, left = (row + first_row) // step, (col + first_col) // step
+            data[top:top + part.shape[0], left:left + part.shape[1]] = part
+
+        metadata = self.metadata.copy()
+        metadata['resolution'] = _whole(self.metadata.resolution * step)
+        return SatMap(data, metadata)
+
+    @traced('SparseSatMap.save')
+    def save(self, path, format=None, compression='gzip', dtype=None):
+        """Save the image to a file that get_satmap can read
+
+        HDF5 files are written block by block, with one chunk per block, and the blocks
+        that are not stored are not written. Zip and ASDF files hold dense data, so the
+        image is made dense to write them.
+
+        Parameters
+        ----------
+        path: str
+                name of the file, with extension .hdf5, .zip or .asdf
+        format: str
+                'hdf5', 'zip' or 'asdf', by default chosen from the extension of path
+        compression: str
+                compression of the HDF5 chunks, by default 'gzip'. Ignored for zip and ASDF files.
+        dtype: str or numpy.dtype
+                The default value of dtype is None and the data is written in the dtype set with
+                aigeanpy.dtypes, or its own dtype. Otherwise it is converted to this dtype.
+
+        Returns
+        -------
+        str
+            The name of the file written
+        """
+
+        from aigeanpy.write_files import FORMATS
+
+        if type(path) != str:
+            raise TypeError('Argument "filename" must be of type string')
+
+        if (format or FORMATS.get(os.path.splitext(path)[1])) != 'hdf5':
+            return self.densify().save(path, format=format, dtype=dtype)
+
+        if os.path.splitext(path)[1] != '.hdf5':
+            raise ValueError('A hdf5 file must have the extension .hdf5, so that read_file can read it')
+
+        import h5py
+
+        dtype = resolve_dtype(dtype)
+        if dtype is None:
+            dtype = self.dtype
+        chunks = (max(1, min(self.block_size, self.rows)), max(1, min(self.block_size, self.cols)))
+        temporary = path + '.part'
+
+        try:
+            with h5py.File(temporary, 'w') as f:
+                group = f.create_group('observation')
+                dataset = group.create_dataset('data', shape=(self.rows, self.cols), dtype=dtype, chunks=chunks,
+                                               compression=compression, shuffle=compression is not None, fillvalue=0)
+                for row, col, block in self.items():
+                    dataset[row:row + block.shape[0], col:col + block.shape[1]] = block
+                for key, value in self.metadata.items():
+                    if value is not None:
+                        group.attrs[key] = value
+
+            os.replace(temporary, path)
+
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+        return path
+
+    def visualize(self, save=False, savepath=None, max_pixels=2048):
+        """Display or save the image, as SatMap.visualize, from an overview of at most
+        max_pixels rows and columns"""
+
+        self.overview(max_pixels).visualize(save=save, savepath=savepath)
+
+
+@traced('sparse.composite', record=_info)
+def composite(satmaps, resolution=None, block_size=BLOCK_SIZE, dtype=None):
+    """Combine images of the same date into a SparseSatMap, as mosaic_satmaps does with padding,
+    storing only the blocks the images cover
+
+    Parameters
+    ----------
+    satmaps: list[SatMap or SparseSatMap]
+            the images, the later ones drawn over the earlier ones where they overlap.
+            SparseSatMaps must already be at the resolution of the result.
+    resolution: int
+            Resolution for the resultant image. If the resolution is not provided, it would be the finest of the satmaps.
+    block_size: int
+            number of rows and columns of each block, by default 256
+    dtype: str or numpy.dtype
+            The default value of dtype is None and the image keeps the dtype of the policy set with
+            aigeanpy.dtypes, or of the satmaps.
+
+    Returns
+    -------
+    SparseSatMap
+        the image covering all the satmaps, with the metadata of the first one and operation 'mosaic'
+    """
+
+    if type(satmaps) != list or len(satmaps) == 0:
+        raise TypeError('The satmaps must be a non-empty list of SatMap or SparseSatMap.')
+
+    if any(not i.metadata for i in satmaps):
+        raise TypeError('Metadata for this file is not available, which suggests that file being analysed is not from one of the ISA imagers.')
+
+    first = satmaps[0].metadata
+
+    if any(i.metadata['date'] != first['date'] for i in satmaps):
+        raise TypeError('Two satmaps are not from the same day.')
+
+    if resolution == None:
+        resolution = min(i.metadata.resolution for i in satmaps)
+
+    if any(type(i) == SparseSatMap and i.metadata.resolution != resolution for i in satmaps):
+        raise ValueError('SparseSatMaps must already be at the resolution of the result.')
+
+    dtype = result_dtype(*[np.empty(0, i.dtype if type(i) == SparseSatMap else i.data.dtype) for i in satmaps], dtype=dtype)
+
+    xcoords_add, ycoords_add, row, col, ranges = _canvas(satmaps, resolution)
+
+    metadata = {'observatory': first['observatory'], 'instrument': first['instrument'],
+                'xcoords': np.array(xcoords_add), 'ycoords': np.array(ycoords_add), 'resolution': _whole(resolution),
+                'date': first['date'], 'time': first['time'], 'operation': 'mosaic'}
+
+    result = SparseSatMap(metadata, (row, col), dtype=dtype, block_size=block_size)
+
+    for satmap, (first_row, end_row, first_col, end_col) in zip(satmaps, ranges):
+        if type(satmap) != SparseSatMap:
+            # One image at a time is resampled, so only one dense image is held with the result
+            data = resample_data(satmap.data.astype(dtype, copy=False), satmap.metadata.resolution, resolution)
+            satmap = SatMap(data[:end_row - first_row, :end_col - first_col], satmap.metadata)
+        result._draw(satmap, first_row, first_col)
+
+    return result
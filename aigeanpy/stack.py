@@ -0,0 +1,185 @@
+from aigeanpy.satmap import SatMap, overlap
+from aigeanpy.dtypes import result_dtype
+from aigeanpy.read_files import open_data, read_metadata
+import numpy as np
+
+
+
+# A SatMapStack keeps, for each observation, only a view of the part of its data
+# inside the area they all cover (the same windows SatMap.__sub__ uses).
+# Per-pixel statistics are computed over blocks of chunk_rows rows at a time:
+# only a (N, chunk_rows, columns) block is ever stacked in memory, and sums are
+# accumulated in float64 whatever the dtype of the observations, and the
+# results are stored in the dtype of the observations (or of the dtype policy).
+
+# A stack built from files keeps each observation as a _FileLayer, the name of
+# the file and the window of its data inside the area covered by the stack.
+# Each block of chunk_rows rows is read from the file when it is reduced (see
+# read_files.open_data), so the observations are never all in memory at once.
+
+class _FileLayer:
+    def __init__(self, filename, rows=None, cols=None) -> None:
+        self.filename = filename
+        with open_data(filename) as data:
+            shape, self.dtype = data.shape, data.dtype
+        self.rows = range(shape[0])[rows or slice(None)]
+        self.cols = range(shape[1])[cols or slice(None)]
+
+    @property
+    def shape(self):
+        return (len(self.rows), len(self.cols))
+
+    def __getitem__(self, key):
+        # A (rows, columns) window is another layer; rows alone are read from the file
+        if type(key) == tuple:
+            return _FileLayer(self.filename, slice(self.rows[key[0]].start, self.rows[key[0]].stop),
+                              slice(self.cols[key[1]].start, self.cols[key[1]].stop))
+
+        rows = self.rows[key]
+        with open_data(self.filename) as data:
+            return np.asarray(data[rows.start:rows.stop, self.cols.start:self.cols.stop])
+
+    def __array__(self, dtype=None, copy=None):
+        data = self[:]
+        return data if dtype is None else data.astype(dtype)
+
+
+def _timestamps(satmaps):
+    return np.array([np.datetime64(i.metadata.date + 'T' + i.metadata.time, 's') for i in satmaps])
+
+
+class SatMapStack:
+    """A stack of repeated observations of the same area by one instrument, aligned
+        on the area they all cover
+
+        Parameters
+        ----------
+        satmaps: list[SatMap]
+                the observations, all from the same instrument
+
+        chunk_rows: int
+                The default value of chunk_rows is None and the statistics are computed over the
+                whole stack at once. Otherwise they are computed chunk_rows rows at a time, so
+                stacks that don't fit in memory as a single 3-D array can still be reduced.
+    """
+
+    def __init__(self, satmaps, chunk_rows=None) -> None:
+
+        if type(satmaps) != list or len(satmaps) < 2:
+            raise TypeError('satmaps must be a list of at least two SatMaps')
+
+        for satmap in satmaps:
+            if not satmap.metadata:
+                raise TypeError('Metadata for this file is not available, which suggests that file being analysed is not from one of the ISA imagers.')
+
+            if satmap.metadata.instrument != satmaps[0].metadata.instrument:
+                raise TypeError('The satmaps are not from the same instrument.')
+
+            if satmap.metadata.resolution != satmaps[0].metadata.resolution:
+                raise ValueError('The satmaps do not have the same resolution.')
+
+        if chunk_rows != None and (type(chunk_rows) != int or chunk_rows <= 0):
+            raise ValueError('chunk_rows must be a positive integer')
+
+        try:
+            self.xcoords, self.ycoords, windows = overlap(*satmaps)
+        except ValueError:
+            raise TypeError('The satmaps are non-overlapping.')
+
+        self.satmaps = satmaps
+        self.layers = [satmap.data[window] for satmap, window in zip(satmaps, windows)]
+        self.times = _timestamps(satmaps)
+        self.chunk_rows = chunk_rows
+
+    @classmethod
+    def from_files(cls, filenames, chunk_rows=None):
+        """Build a stack from a list of files, such as those returned by Catalog.files
+
+        Only the metadata of the files is read here. With chunk_rows, each block of rows is
+        read from the files when the statistics are computed, so the stack never needs to fit
+        in memory.
+        """
+        return cls([SatMap(_FileLayer(i), read_metadata(i)) for i in filenames], chunk_rows=chunk_rows)
+
+    def __len__(self):
+        return len(self.layers)
+
+    def shape(self):
+        """Get the shape of the stack as (observations, rows, columns)"""
+        return (len(self.layers),) + self.layers[0].shape
+
+    @property
+    def data(self):
+        """The whole stack as a single 3-D array of shape (observations, rows, columns)"""
+        return np.stack(self.layers)
+
+    def _chunks(self):
+        rows = self.layers[0].shape[0]
+        step = self.chunk_rows or rows
+        for start in range(0, rows, step):
+            yield start, np.stack([layer[start:start + step] for layer in self.layers])
+
+    def _reduce(self, function, operation):
+        result = np.empty(self.layers[0].shape, dtype=result_dtype(*{layer.dtype for layer in self.layers}))
+        for start, block in self._chunks():
+            result[start:start + block.shape[1]] = function(block)
+        return self._satmap(result, operation)
+
+    def _satmap(self, data, operation):
+        metadata = self.satmaps[0].metadata.copy()
+        metadata['xcoords'] = np.array(self.xcoords)
+        metadata['ycoords'] = np.array(self.ycoords)
+        metadata['time'] = self.satmaps[0].metadata['time'] + "_to_" + self.satmaps[-1].metadata['time']
+        metadata['operation'] = operation
+        return SatMap(data, metadata)
+
+    def mean(self):
+        """Get the per-pixel mean of the stack as a SatMap"""
+        return self._reduce(lambda block: block.mean(axis=0, dtype=np.float64), 'mean')
+
+    def std(self):
+        """Get the per-pixel standard deviation of the stack as a SatMap"""
+        return self._reduce(lambda block: block.std(axis=0, dtype=np.float64), 'std')
+
+    def min(self):
+        """Get the per-pixel minimum of the stack as a SatMap"""
+        return self._reduce(lambda block: block.min(axis=0), 'min')
+
+    def max(self):
+        """Get the per-pixel maximum of the stack as a SatMap"""
+        return self._reduce(lambda block: block.max(axis=0), 'max')
+
+    def trend(self):
+        """Get the per-pixel least-squares slope of the values against time, in units per day, as a SatMap"""
+
+        days = (self.times - self.times[0]).astype(np.float64) / 86400
+        days = days - days.mean()
+        if not days.any():
+            raise ValueError('A trend needs observations made at different times.')
+
+        weights = (days / np.sum(days**2))[:, None, None]
+        return self._reduce(lambda block: np.sum(weights * block, axis=0, dtype=np.float64), 'trend')
+
+    def anomaly(self, index=-1):
+        """Get how far one observation is from the per-pixel mean of the stack
+
+        Parameters
+        ----------
+        index: int
+                position of the observation in the stack, by default -1 (the last one)
+
+        Returns
+        -------
+        object
+            A SatMap with the observation minus the mean of the stack
+        """
+
+        if type(index) != int:
+            raise TypeError('index must be an integer')
+
+        layer = np.asarray(self.layers[index])
+        anomaly = layer - self.mean().data
+        satmap = self._satmap(anomaly, 'anomaly')
+        satmap.metadata['date'] = self.satmaps[index].metadata['date']
+        satmap.metadata['time'] = self.satmaps[index].metadata['time']
+        return satmap
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from aigeanpy.aigean_cluster import aigean_cluster, load_points
+from aigeanpy.clustering_numpy import cluster, cluster_array, cluster_chunked, predict, save_centroids, load_centroids
+
+
+def make_points():
+    points = np.random.default_rng(0).normal(size=(600, 3))
+    points[:200] += 10
+    points[200:400] -= 10
+    return points
+
+
+# Tests that .npy and CSV inputs give the same centres and labels, saved as binary files
+@pytest.mark.parametrize('engine', ['numpy', 'chunked'])
+def test_npy_and_csv(tmp_path, engine):
+    points = make_points()
+    np.save(tmp_path / 'points.npy', points)
+    np.savetxt(tmp_path / 'points.csv', points, delimiter=',')
+
+    for name in ['points.npy', 'points.csv']:
+        timings = aigean_cluster(str(tmp_path / name), clusters=3, seed=4, engine=engine,
+                                 centres_file=str(tmp_path / (name + '_centres.npy')),
+                                 labels_file=str(tmp_path / (name + '_labels.npy')), chunk_size=64)
+        assert timings['engine'] == engine
+
+    labels = np.load(tmp_path / 'points.npy_labels.npy')
+    centres = np.load(tmp_path / 'points.npy_centres.npy')
+    assert labels.dtype == np.int32 and labels.shape == (600,)
+    assert centres.shape == (3, 3)
+    assert len(np.unique(labels[:200])) == 1 and len(np.unique(labels[200:400])) == 1
+    assert np.array_equal(labels, np.load(tmp_path / 'points.csv_labels.npy'))
+    assert np.allclose(centres, np.load(tmp_path / 'points.csv_centres.npy'))
+
+
+# Tests that .npy files are memory-mapped and clustered chunk by chunk
+def test_auto_engine(tmp_path):
+    np.save(tmp_path / 'points.npy', make_points())
+    assert isinstance(load_points(str(tmp_path / 'points.npy')), np.memmap)
+    assert aigean_cluster(str(tmp_path / 'points.npy'), seed=0)['engine'] == 'chunked'
+    assert (tmp_path / 'points_labels.npy').exists()
+
+
+def test_wrong_input(tmp_path):
+    (tmp_path / 'points.txt').write_text('1,2,3\n')
+    with pytest.raises(ValueError):
+        load_points(str(tmp_path / 'points.txt'))
+    with pytest.raises(ValueError):
+        aigean_cluster(str(tmp_path / 'points.txt'), engine='fast')
+
+
+# Tests that saved centres restart the clustering where it stopped, and assign new points without clustering them
+@pytest.mark.parametrize('engine', ['numpy', 'chunked'])
+def test_warm_start_and_predict(tmp_path, engine):
+    points = make_points()
+    centres, labels = cluster_array(points, 3, 50, seed=4)
+    save_centroids(str(tmp_path / 'centres.npy'), centres)
+    assert np.array_equal(load_centroids(str(tmp_path / 'centres.npy')), centres)
+
+    # Started from converged centres, one iteration finds nothing to change
+    warm_centres, warm_labels = (cluster_chunked(points, 3, 1, init=centres, chunk_size=64) if engine == 'chunked'
+                                 else cluster_array(points, 3, 1, init=centres))
+    assert np.allclose(warm_centres, centres) and np.array_equal(warm_labels, labels)
+    assert np.array_equal(predict(points, centres, chunk_size=64), labels)
+
+    np.save(tmp_path / 'today.npy', points + 0.01)
+    aigean_cluster(str(tmp_path / 'today.npy'), engine=engine, init=str(tmp_path / 'centres.npy'), predict_only=True, chunk_size=64)
+    assert np.array_equal(np.load(tmp_path / 'today_labels.npy'), labels)
+    assert np.array_equal(np.load(tmp_path / 'today_centres.npy'), centres)
+
+    with pytest.raises(ValueError):
+        cluster_array(points, 2, init=centres)
+    with pytest.raises(ValueError):
+        predict(points, centres[:, :2])
+    with pytest.raises(ValueError):
+        aigean_cluster(str(tmp_path / 'today.npy'), predict_only=True)
+
+
+# Tests that the output files can be given as path objects
+def test_path_objects(tmp_path):
+    np.save(tmp_path / 'points.npy', make_points())
+    aigean_cluster(str(tmp_path / 'points.npy'), seed=0, engine='numpy', centres_file=tmp_path / 'c.npy', labels_file=tmp_path / 'l.npy')
+    assert load_centroids(tmp_path / 'c.npy').shape == (3, 3)
+    aigean_cluster(str(tmp_path / 'points.npy'), engine='numpy', init=tmp_path / 'c.npy', predict_only=True,
+                   centres_file=tmp_path / 'd.npy', labels_file=tmp_path / 'm.npy')
+    assert np.array_equal(np.load(tmp_path / 'l.npy'), np.load(tmp_path / 'm.npy'))
+
+
+# Tests that the list version warm-starts with any number of clusters and iterates until the labels settle
+def test_cluster_list_warm_start():
+    points = np.random.default_rng(1).normal(size=(100, 2))
+    points[:50] += 8
+    start = [(0.0, 0.0), (1.0, 1.0)]
+
+    centres, clusters = cluster([tuple(i) for i in points], 2, 10, init=start)
+    expected_centres, labels = cluster_array(points, 2, 10, init=start)
+    assert np.allclose(centres, expected_centres)
+    assert [len(i) for i in clusters] == [50, 50]
+    assert np.array_equal(np.array(clusters[1]), points[labels == 1]) and np.array_equal(np.array(clusters[1]), points[:50])
+
+    # One iteration from these centres is not enough to converge
+    assert not np.allclose(cluster([tuple(i) for i in points], 2, 1, init=start)[0], centres)
+
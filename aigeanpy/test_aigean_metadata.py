@@ -0,0 +1,39 @@
+import numpy as np
+import h5py
+import json
+from aigeanpy.aigean_metadata import aigean_metadata
+
+
+def write_hdf5(path, time):
+    with h5py.File(path, 'w') as f:
+        group = f.create_group('observation')
+        group.create_dataset('data', data=np.ones((10, 30)))
+        group.attrs['instrument'] = 'Manannan'
+        group.attrs['time'] = time
+        group.attrs['xcoords'] = [0.0, 450.0]
+
+
+# Tests that with several jobs the metadata is still displayed in the order the files were passed in
+def test_metadata_order_with_jobs(tmp_path, capsys):
+    filenames = []
+    for i in range(20):
+        filenames.append(str(tmp_path / f'aigean_man_20221212_{i:06d}.hdf5'))
+        write_hdf5(filenames[-1], f'00:00:{i:02d}')
+
+    aigean_metadata(filenames, jobs=8, json_lines=True)
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert [i['filename'] for i in records] == filenames
+    assert records[3]['time'] == '00:00:03'
+    assert records[3]['xcoords'] == [0.0, 450.0]
+
+
+# Tests that files that failed are reported in place in JSON-lines output
+def test_metadata_json_failed_file(tmp_path, capsys):
+    write_hdf5(tmp_path / 'aigean_man_20221212_000000.hdf5', '00:00:00')
+
+    aigean_metadata([str(tmp_path / 'aigean_man_20221212_000000.hdf5'), 'notes.txt'], json_lines=True)
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert 'error' not in records[0]
+    assert records[1] == {'filename': 'notes.txt', 'error': 'failed while being processed'}
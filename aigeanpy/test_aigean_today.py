@@ -0,0 +1,130 @@
+import json
+import pytest
+import aigeanpy.aigean_today as aigean_today
+import aigeanpy.net as net
+
+
+LIR_1 = {'filename': 'aigean_lir_20221212_090000.asdf', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '09:00:00'}
+MAN_1 = {'filename': 'aigean_man_20221212_093000.hdf5', 'instrument': 'Manannan', 'date': '2022-12-12', 'time': '09:30:00'}
+LIR_2 = {'filename': 'aigean_lir_20221212_100000.asdf', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '10:00:00'}
+LIR_3 = {'filename': 'aigean_lir_20221212_110000.asdf', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '11:00:00'}
+MAN_2 = {'filename': 'aigean_man_20221212_103000.hdf5', 'instrument': 'Manannan', 'date': '2022-12-12', 'time': '10:30:00'}
+
+
+class FakeArchive:
+    '''Answers the queries of watch with the records of each poll in turn, and raises on None'''
+
+    def __init__(self, polls):
+        self.polls = list(polls)
+        self.queries = []
+
+    def get(self, url, params, timeout):
+        self.queries.append(params)
+        self.records = self.polls.pop(0)
+        if self.records == None:
+            raise IOError('archive unavailable')
+        return self
+
+    def json(self):
+        return self.records
+
+
+@pytest.fixture
+def archive(monkeypatch, tmp_path):
+    downloads = []
+    sleeps = []
+    # Names of the files whose next download fails
+    failing = set()
+
+    def download_isa(filename, save_dir=None, session=None):
+        if filename in failing:
+            failing.remove(filename)
+            raise IOError('connection reset')
+        downloads.append(filename)
+        (tmp_path / filename).write_bytes(b'observation')
+        return str(tmp_path / filename)
+
+    monkeypatch.setattr(net, 'download_isa', download_isa)
+    monkeypatch.setattr(aigean_today.time, 'sleep', sleeps.append)
+
+    def make(polls, fail=()):
+        failing.update(fail)
+        return FakeArchive(polls), downloads, sleeps
+
+    return make
+
+
+# Test that only the observations newer than those already seen are downloaded
+def test_watch_downloads_new_observations(archive, tmp_path):
+    session, downloads, sleeps = archive([[LIR_1, MAN_1], [LIR_1, MAN_1], [LIR_1, MAN_1, LIR_2]])
+    state = str(tmp_path / 'state.json')
+
+    paths = aigean_today.watch(interval=1, state_file=state, iterations=3, save_dir=str(tmp_path), session=session)
+
+    assert sorted(downloads[:2]) == [LIR_1['filename'], MAN_1['filename']]
+    assert downloads[2:] == [LIR_2['filename']]
+    assert paths[-1] == str(tmp_path / LIR_2['filename'])
+    assert sleeps == [1, 2]
+    with open(state) as f:
+        assert json.load(f) == {'lir': LIR_2, 'manannan': MAN_1}
+
+
+# Test that a watch started again from its state file downloads nothing already seen
+def test_watch_resumes_from_state(archive, tmp_path):
+    state = tmp_path / 'state.json'
+    state.write_text(json.dumps({'lir': LIR_1}))
+    session, downloads, sleeps = archive([[LIR_1, MAN_1]])
+
+    aigean_today.watch(instrument='lir', state_file=str(state), iterations=1, save_dir=str(tmp_path), session=session)
+
+    assert downloads == []
+    assert session.queries[0]['instrument'] == 'lir'
+
+
+# Test that all the observations that arrived between two queries are downloaded, oldest first
+def test_watch_downloads_every_new_observation(archive, tmp_path):
+    session, downloads, sleeps = archive([[LIR_1], [LIR_1, LIR_2, MAN_1, LIR_3]])
+
+    aigean_today.watch(interval=1, iterations=2, save_dir=str(tmp_path), session=session)
+
+    assert downloads[0] == LIR_1['filename']
+    assert sorted(downloads[1:]) == [LIR_2['filename'], LIR_3['filename'], MAN_1['filename']]
+
+
+# Test that a failed download only holds back its instrument, and is downloaded again at the next query
+def test_watch_failed_download(archive, tmp_path):
+    state = str(tmp_path / 'state.json')
+    polls = [[LIR_1, MAN_1], [LIR_1, LIR_2, LIR_3, MAN_1, MAN_2], [LIR_1, LIR_2, LIR_3, MAN_1, MAN_2]]
+    session, downloads, sleeps = archive(polls, fail=[LIR_2['filename']])
+
+    aigean_today.watch(interval=1, state_file=state, iterations=2, save_dir=str(tmp_path), session=session)
+
+    assert MAN_2['filename'] in downloads and LIR_2['filename'] not in downloads
+    assert sleeps == [1]
+    with open(state) as f:
+        assert json.load(f) == {'lir': LIR_1, 'manannan': MAN_2}
+
+    aigean_today.watch(interval=1, state_file=state, iterations=1, save_dir=str(tmp_path), session=session)
+
+    # Each observation is downloaded once, the later ones already downloaded are not downloaded again
+    assert sorted(downloads) == sorted(i['filename'] for i in [LIR_1, LIR_2, LIR_3, MAN_1, MAN_2])
+    with open(state) as f:
+        assert json.load(f) == {'lir': LIR_3, 'manannan': MAN_2}
+    assert session.queries[-1]['start_date'] == session.queries[-2]['start_date']
+
+
+# Test that failed queries back off up to max_interval and the wait is reset by new data
+def test_watch_backoff(archive, tmp_path):
+    session, downloads, sleeps = archive([None, None, None, [LIR_1], []])
+
+    aigean_today.watch(interval=10, max_interval=30, iterations=5, save_dir=str(tmp_path), session=session)
+
+    assert sleeps == [20, 30, 30, 10]
+    assert downloads == [LIR_1['filename']]
+
+
+def test_watch_wrong_arguments():
+    with pytest.raises(ValueError):
+        aigean_today.watch(instrument='modis', session=object())
+    with pytest.raises(ValueError):
+        aigean_today.watch(interval=60, max_interval=10, session=object())
@@ -1,6 +1,43 @@
+import numpy as np
+import pytest
 import aigeanpy.analysis as analysis
+from aigeanpy.clustering import cluster
+from aigeanpy.clustering_numpy import save_centroids
 
 def test_kmeans():
     points = analysis.kmeans('samples.csv',3, 10)
     total_points = len(points[0]) + len(points[1]) + len(points[2])
-    assert total_points == 300, 'Did not get the number of points expected. kmeans is not working as it should'
\ No newline at end of file
+    assert total_points == 300, 'Did not get the number of points expected. kmeans is not working as it should'
+
+
+CENTRES = [(0.0, 0.0, 0.0), (10.0, 10.0, 10.0), (-10.0, -10.0, -10.0)]
+
+
+def make_points(tmp_path):
+    points = np.random.default_rng(0).normal(size=(90, 3)) + np.repeat(CENTRES, 30, axis=0)
+    np.savetxt(tmp_path / 'points.csv', points, delimiter=',')
+    return [tuple(i) for i in points]
+
+
+# Tests that the clusters start from the centres given, in their order, and stop once they no longer change
+def test_cluster_init(tmp_path):
+    points = make_points(tmp_path)
+    centres, clusters = cluster(points, 3, 1, init=CENTRES)
+    assert [len(i) for i in clusters] == [30, 30, 30]
+    assert clusters[1] == points[30:60]
+
+    # Started from centres that have converged, more iterations change nothing
+    converged = [tuple(np.mean(i, axis=0)) for i in clusters]
+    assert cluster(points, 3, 50, init=converged)[1] == cluster(points, 3, 1, init=converged)[1] == clusters
+
+    with pytest.raises(ValueError):
+        cluster(points, 3, init=CENTRES[:2])
+
+
+# Tests that kmeans starts from the centres saved in a .npy file
+def test_kmeans_init(tmp_path):
+    points = make_points(tmp_path)
+    save_centroids(tmp_path / 'centres.npy', np.array(CENTRES))
+    clusters = analysis.kmeans(str(tmp_path / 'points.csv'), 3, 10, init=str(tmp_path / 'centres.npy'))
+    assert [list(map(tuple, i)) for i in clusters] == [points[:30], points[30:60], points[60:]]
+    assert analysis.kmeans(str(tmp_path / 'points.csv'), 3, 10, init=tmp_path / 'centres.npy') == clusters
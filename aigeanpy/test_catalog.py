@@ -0,0 +1,88 @@
+import numpy as np
+import asdf
+import h5py
+import json
+import zipfile
+from io import BytesIO
+from aigeanpy.catalog import Catalog
+from aigeanpy.read_files import read_metadata
+import os
+import pytest
+
+
+def metadata(instrument, date, time, xcoords, ycoords, resolution):
+    return {'observatory': 'Aigean', 'instrument': instrument, 'date': date, 'time': time,
+            'xcoords': xcoords, 'ycoords': ycoords, 'resolution': resolution}
+
+
+def write_asdf(path, meta, data):
+    asdf.AsdfFile(dict(meta, data=data)).write_to(path)
+
+
+def write_hdf5(path, meta, data):
+    with h5py.File(path, 'w') as f:
+        group = f.create_group('observation')
+        group.create_dataset('data', data=data)
+        for key in meta:
+            group.attrs[key] = meta[key]
+
+
+def write_zip(path, meta, data):
+    array = BytesIO()
+    np.save(array, data)
+    with zipfile.ZipFile(path, 'w') as f:
+        f.writestr('metadata.json', json.dumps(meta))
+        f.writestr('observation.npy', array.getvalue())
+
+
+@pytest.fixture
+def archive(tmp_path):
+    write_asdf(tmp_path / 'aigean_lir_20221212_123848.asdf', metadata('Lir', '2022-12-12', '12:38:48', [0.0, 600.0], [0.0, 300.0], 30), np.ones((10, 20)))
+    write_hdf5(tmp_path / 'aigean_man_20221212_130000.hdf5', metadata('Manannan', '2022-12-12', '13:00:00', [1000.0, 1450.0], [0.0, 150.0], 15), np.ones((10, 30)))
+    write_zip(tmp_path / 'aigean_fan_20221213_080000.zip', metadata('Fand', '2022-12-13', '08:00:00', [75.0, 300.0], [0.0, 50.0], 5), np.ones((10, 45)))
+    return tmp_path
+
+
+# Tests that read_metadata reads the header of every format
+def test_read_metadata(archive):
+    meta = read_metadata(str(archive / 'aigean_lir_20221212_123848.asdf'))
+    assert meta['instrument'] == 'Lir'
+    assert 'data' not in meta
+    assert list(read_metadata(str(archive / 'aigean_man_20221212_130000.hdf5'))['xcoords']) == [1000.0, 1450.0]
+    assert read_metadata(str(archive / 'aigean_fan_20221213_080000.zip'))['resolution'] == 5
+
+
+# Tests queries by area, time and instrument
+def test_find(archive):
+    catalog = Catalog()
+    assert catalog.update(archive) == 3
+
+    assert len(catalog.files(bbox=(100, 10, 200, 20))) == 2
+    assert len(catalog.files(bbox=(900, 10, 950, 20))) == 0
+    assert len(catalog.files(time_range=('2022-12-12', '2022-12-12'))) == 2
+    assert len(catalog.files(time_range=('2022-12-12 12:50:00', '2022-12-13'))) == 2
+
+    satmaps = list(catalog.find(bbox=(0, 0, 2000, 2000), instrument='manannan'))
+    assert len(satmaps) == 1
+    assert satmaps[0].data.shape == (10, 30)
+
+
+# Tests that updating only reads new or changed files and drops deleted ones
+def test_incremental_update(archive, tmp_path):
+    catalog = Catalog(tmp_path / 'catalog.sqlite')
+    catalog.update(archive)
+    assert catalog.update(archive) == 0
+
+    os.remove(archive / 'aigean_fan_20221213_080000.zip')
+    write_asdf(archive / 'aigean_lir_20221214_000000.asdf', metadata('Lir', '2022-12-14', '00:00:00', [0.0, 600.0], [0.0, 300.0], 30), np.ones((10, 20)))
+    assert catalog.update(archive) == 1
+    catalog.close()
+
+    catalog = Catalog(tmp_path / 'catalog.sqlite')
+    assert len(catalog) == 3
+    assert len(catalog.files(instrument='Fand')) == 0
+
+
+def test_wrong_bbox(archive):
+    with pytest.raises(TypeError):
+        Catalog().files(bbox=(0, 0))
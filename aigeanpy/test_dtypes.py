@@ -0,0 +1,61 @@
+import numpy as np
+import h5py
+import pytest
+from aigeanpy.dtypes import use_dtype, set_dtype, get_dtype
+from aigeanpy.read_files import read_file
+from aigeanpy.satmap import SatMap, get_satmap
+from aigeanpy.stack import SatMapStack
+
+
+def image(xcoords, date='2022-12-12', time='12:00:00', resolution=15, instrument='Manannan', dtype=np.float32):
+    metadata = {'observatory': 'Aigean', 'instrument': instrument, 'date': date, 'time': time,
+                'xcoords': xcoords, 'ycoords': [0.0, 150.0], 'resolution': resolution}
+    shape = (round(150 / resolution), round((xcoords[1] - xcoords[0]) / resolution))
+    return SatMap(np.random.default_rng(0).uniform(size=shape).astype(dtype), metadata)
+
+
+# Tests that float32 images stay float32 through the arithmetic
+def test_native_dtype_is_kept():
+    first = image([0.0, 450.0])
+    second = image([300.0, 750.0])
+    assert (first + second).data.dtype == np.float32
+    assert (first - image([300.0, 750.0], date='2022-12-13')).data.dtype == np.float32
+    assert first.mosaic(image([300.0, 750.0], resolution=30, instrument='Lir')).data.dtype == np.float32
+    assert first.mosaic(image([300.0, 750.0], resolution=30, instrument='Lir'), resolution=30).data.dtype == np.float32
+    assert (image([0.0, 450.0], dtype=np.int16) + image([0.0, 450.0], dtype=np.int16)).data.dtype == np.float64
+
+
+# Tests that the dtype can be chosen per call or with the policy, and that statistics keep float64 accuracy
+def test_dtype_policy():
+    first = image([0.0, 450.0])
+    second = image([300.0, 750.0], resolution=30, instrument='Lir')
+    assert first.mosaic(second, dtype='float64').data.dtype == np.float64
+
+    with use_dtype('float64'):
+        assert (first + image([300.0, 750.0])).data.dtype == np.float64
+    assert get_dtype() is None
+
+    stack = SatMapStack([image([0.0, 450.0], time=f'0{i}:00:00') for i in range(3)])
+    assert stack.mean().data.dtype == np.float32
+    set_dtype('float64')
+    try:
+        assert stack.mean().data.dtype == np.float64
+    finally:
+        set_dtype(None)
+
+    with pytest.raises(TypeError):
+        set_dtype('int32')
+
+
+def test_read_file_dtype(tmp_path):
+    filename = str(tmp_path / 'aigean_man_20221212_120000.hdf5')
+    with h5py.File(filename, 'w') as f:
+        group = f.create_group('observation')
+        group.create_dataset('data', data=np.ones((10, 30)))
+        group.attrs['xcoords'] = [0.0, 450.0]
+
+    assert read_file(filename)[1].dtype == np.float64
+    assert read_file(filename, dtype='float32')[1].dtype == np.float32
+    with use_dtype(np.float32):
+        assert get_satmap(filename).data.dtype == np.float32
+    assert read_file(filename)[1].dtype == np.float64
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from aigeanpy.ecne_stats import EcneStats, QuantileSketch, summarise_file, summarise_files, merge_stats
+
+
+def write_ecne(path, rows):
+    np.savetxt(path, rows, delimiter=',')
+    return str(path)
+
+
+def make_rows(seed, n=2000):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.normal(0, 1, n), rng.uniform(5, 10, n), rng.normal(-2, 3, n)])
+
+
+# Tests that the statistics read in chunks and in parallel match those computed on all the data at once
+def test_files_match_numpy(tmp_path):
+    rows = [make_rows(i) for i in range(4)]
+    filenames = [write_ecne(tmp_path / f'aigean_ecn_20221212_00000{i}.csv', r) for i, r in enumerate(rows)]
+    everything = np.concatenate(rows)
+
+    stats = summarise_files(filenames, workers=2, chunk_lines=333)
+
+    assert stats.count.tolist() == [8000] * 3
+    assert np.allclose(stats.mean, everything.mean(axis=0))
+    assert np.allclose(stats.variance(), everything.var(axis=0, ddof=1))
+    assert np.array_equal(stats.min, everything.min(axis=0))
+    assert np.array_equal(stats.max, everything.max(axis=0))
+    exact = np.quantile(everything, [0.1, 0.5, 0.9], axis=0)
+    for q, expected in zip([0.1, 0.5, 0.9], exact):
+        assert np.allclose(stats.quantile(q), expected, rtol=0.03, atol=0.01)
+
+
+# Tests that summaries saved to JSON merge into the summary of all the files
+def test_save_and_merge(tmp_path):
+    days = []
+    for i in range(3):
+        stats = summarise_file(write_ecne(tmp_path / f'aigean_ecn_2022121{i}_000000.csv', make_rows(i)))
+        stats.save(str(tmp_path / f'day{i}.json'))
+        days.append(str(tmp_path / f'day{i}.json'))
+
+    week = merge_stats(days)
+    everything = np.concatenate([make_rows(i) for i in range(3)])
+    assert np.allclose(week.mean, everything.mean(axis=0))
+    assert np.allclose(week.std(), everything.std(axis=0, ddof=1))
+    assert week.summary()['salinity']['count'] == 6000
+
+
+def test_sketch_and_wrong_input():
+    sketch = QuantileSketch()
+    sketch.add(np.array([-5.0, 0.0, 1.0, 2.0, 3.0]))
+    assert sketch.quantile(0) == pytest.approx(-5.0, rel=0.01)
+    assert sketch.quantile(0.5) == pytest.approx(1.0, rel=0.01)
+    assert QuantileSketch.from_dict(sketch.to_dict()).quantile(1) == sketch.quantile(1)
+    with pytest.raises(ValueError):
+        EcneStats().add(np.ones((3, 2)))
+    with pytest.raises(ValueError):
+        QuantileSketch().merge(QuantileSketch(0.05))
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from aigeanpy.catalog import Catalog
+from aigeanpy.extract import extract_points
+from aigeanpy.read_files import read_file, read_pixels
+from aigeanpy.write_files import write_file
+
+
+def _write(directory, name, xcoords, ycoords, resolution, time, data):
+    instrument = {'lir': 'Lir', 'man': 'Manannan', 'fan': 'Fand'}[name.split('_')[1]]
+    metadata = {'observatory': 'Aigean', 'instrument': instrument, 'date': '2022-12-12', 'time': time,
+                'xcoords': xcoords, 'ycoords': ycoords, 'resolution': resolution}
+    return write_file(str(directory / name), metadata, data)
+
+
+@pytest.fixture
+def observations(tmp_path):
+    rows, cols = np.mgrid[0:10, 0:20]
+    return [
+        # A plane in earth coordinates, value = x + 2*y at the centre of each pixel
+        _write(tmp_path, 'aigean_lir_20221212_090000.asdf', [0.0, 600.0], [0.0, 300.0], 30, '09:00:00',
+               (cols + 0.5) * 30 + 2 * (300 - (rows + 0.5) * 30)),
+        _write(tmp_path, 'aigean_man_20221212_100000.hdf5', [300.0, 750.0], [0.0, 150.0], 15, '10:00:00',
+               np.arange(300, dtype=np.float32).reshape(10, 30)),
+        _write(tmp_path, 'aigean_fan_20221212_110000.zip', [1000.0, 1300.0], [0.0, 150.0], 15, '11:00:00',
+               np.ones((10, 20))),
+    ]
+
+
+def test_read_pixels(observations):
+    for filename in observations:
+        data = read_file(filename, cache=False)[1]
+        assert (read_pixels(filename, [0, 9, 5], [0, 3, 19]) == data[[0, 9, 5], [0, 3, 19]]).all()
+    # Pixels outside the image take the value of the nearest edge
+    assert read_pixels(observations[2], [-1, 50], [0, 0]).tolist() == [1.0, 1.0]
+
+
+def test_extract_nearest(observations):
+    xs = np.array([15.0, 400.0, 1100.0, 5000.0])
+    ys = np.array([285.0, 10.0, 100.0, 10.0])
+    table = extract_points(observations, xs, ys)
+
+    assert table['point'].tolist() == [0, 1, 1, 2]
+    assert table['instrument'].tolist() == ['lir', 'lir', 'manannan', 'fand']
+    assert table['filename'][2] == observations[1]
+    assert table['row'][0] == 0 and table['col'][0] == 0
+    assert table['value'][0] == 15.0 + 2 * 285.0
+    # (400, 10) in Manannan: row 9, column 6
+    assert table['value'][2] == 9 * 30 + 6
+    assert table['value'][3] == 1.0
+
+
+def test_extract_bilinear_and_times(observations):
+    xs = np.array([100.0, 333.0, 400.0])
+    ys = np.array([120.0, 77.0, 20.0])
+
+    table = extract_points(observations, xs, ys, method='bilinear')
+    lir = table[table['instrument'] == 'lir']
+    assert np.allclose(lir['value'], xs + 2 * ys)
+
+    times = np.array(['2022-12-12T09:10:00', '2022-12-12T09:50:00', '2022-12-12T12:00:00'], dtype='datetime64[s]')
+    table = extract_points(observations, xs, ys, times=times)
+    assert table['instrument'].tolist() == ['lir', 'manannan', 'manannan']
+
+    table = extract_points(observations, xs, ys, times=times, max_delta=3600)
+    assert table['point'].tolist() == [0, 1]
+
+
+def test_extract_from_catalog(observations, tmp_path):
+    catalog = Catalog()
+    catalog.update(tmp_path)
+
+    xs, ys = np.array([15.0, 1100.0]), np.array([285.0, 100.0])
+    table = extract_points(catalog, xs, ys)
+    expected = extract_points(observations, xs, ys)
+    assert table['value'].tolist() == expected['value'].tolist()
+    assert [str(i).endswith(str(j).split('/')[-1]) for i, j in zip(table['filename'], expected['filename'])] == [True, True]
+
+
+def test_extract_wrong_arguments(observations):
+    with pytest.raises(ValueError):
+        extract_points(observations, [0.0], [0.0], method='cubic')
+    with pytest.raises(ValueError):
+        extract_points(observations, [0.0, 1.0], [0.0])
+    with pytest.raises(TypeError):
+        extract_points('aigean_lir_20221212_090000.asdf', [0.0], [0.0])
+    assert len(extract_points(observations, [], [])) == 0
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+import pytest
+
+HEAVY_MODULES = ['matplotlib', 'skimage', 'asdf', 'h5py', 'requests']
+
+
+def imported_heavy_modules(module):
+    code = f'import sys, {module}; print(",".join(m for m in {HEAVY_MODULES} if m in sys.modules))'
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip()
+
+
+# Tests that importing the package or a console script doesn't import the slow dependencies
+@pytest.mark.parametrize('module', ['aigeanpy', 'aigeanpy.coor', 'aigeanpy.aigean_today', 'aigeanpy.aigean_metadata', 'aigeanpy.aigean_mosaic', 'aigeanpy.aigean_cluster', 'aigeanpy.aigean_pack'])
+def test_no_heavy_imports(module):
+    assert imported_heavy_modules(module) == '', 'A slow dependency is imported at startup'
+
+
+# Tests that the names of the package are still available, loaded on first use
+def test_lazy_names():
+    import aigeanpy
+    assert aigeanpy.get_satmap.__module__ == 'aigeanpy.satmap'
+    assert aigeanpy.read_file.__module__ == 'aigeanpy.read_files'
+    with pytest.raises(AttributeError):
+        aigeanpy.not_a_name
+
+
+# Tests that no name of the package is also the name of a submodule, which importing the submodule would replace
+def test_names_are_not_submodules():
+    import pkgutil
+    import aigeanpy
+    submodules = {module.name for module in pkgutil.iter_modules(aigeanpy.__path__)}
+    assert submodules.isdisjoint(aigeanpy._exports)
+
+
+# Tests that aigeanpy.coor is the class coor, as it was before the names were loaded lazily
+def test_coor_is_the_class():
+    code = 'import sys, aigeanpy.coor, aigeanpy; from aigeanpy import coor; print(aigeanpy.coor is coor is sys.modules["aigeanpy.coor"].coor)'
+    assert subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip() == 'True'
+
@@ -0,0 +1,52 @@
+import numpy as np
+import pickle
+from aigeanpy.metadata import SatMetadata
+from aigeanpy.satmap import SatMap
+import pytest
+
+
+def make_metadata():
+    return {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:38:48',
+            'xcoords': [0.0, 600.0], 'ycoords': np.array([0.0, 300.0]), 'resolution': 30}
+
+
+# Tests that the dictionary view keeps the values as they were read, next to the normalised attributes
+def test_dictionary_and_attributes():
+    image = SatMap(np.ones((10, 20)), make_metadata())
+    assert type(image.metadata) == SatMetadata
+    assert image.metadata['xcoords'] == [0.0, 600.0]
+    assert image.metadata.xcoords == (0.0, 600.0)
+    assert image.metadata.ycoords == (0.0, 300.0)
+    assert image.metadata.geotransform == (0.0, 30.0, 0.0, 300.0, 0.0, -30.0)
+    assert image.fov() == (600.0, 300.0)
+    assert image.centre() == (300.0, 150.0)
+
+
+# Tests that changing a key updates the attributes, and that copies are independent
+def test_attributes_follow_changes():
+    metadata = SatMetadata(make_metadata())
+    copy = metadata.copy()
+    metadata['xcoords'] = np.array([600.0, 1200.0])
+    metadata.update(resolution=15)
+
+    assert metadata.xcoords == (600.0, 1200.0)
+    assert metadata.geotransform[1] == 15.0
+    assert copy.xcoords == (0.0, 600.0) and type(copy) == SatMetadata
+
+    del metadata['instrument']
+    assert metadata.instrument == None
+    assert pickle.loads(pickle.dumps(metadata)).xcoords == (600.0, 1200.0)
+
+
+# Tests the conversions between pixel and earth coordinates with the geotransform
+def test_pixel_and_earth_coordinates():
+    metadata = SatMetadata(make_metadata())
+    assert metadata.pixel_to_earth(1, 1) == (45.0, 255.0)
+    rows, cols = metadata.earth_to_pixel(np.array([45.0, 599.0]), np.array([255.0, 1.0]))
+    assert list(rows) == [1, 9] and list(cols) == [1, 19]
+
+
+def test_metadata_without_geometry():
+    metadata = SatMetadata({'observatory': 'Aigean'})
+    assert metadata.geotransform == None
+    assert metadata.observatory == 'Aigean'
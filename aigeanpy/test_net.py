@@ -110,3 +110,183 @@ def test_no_save_dir():
 def test_non_existing_directory():
     with pytest.raises(NameError):
         net.download_isa(filename='aigean_lir_20221218_065812.asdf',save_dir=r'Computing')
+
+
+
+# ----------------------
+# Testing net.QueryResult
+# ----------------------
+
+RECORDS = [
+    {'filename': 'aigean_lir_20221212_123848.asdf', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:38:48'},
+    {'filename': 'aigean_man_20221212_130000.hdf5', 'instrument': 'Manannan', 'date': '2022-12-12', 'time': '13:00:00'},
+    {'filename': 'aigean_lir_20221213_010203.asdf', 'instrument': 'Lir', 'date': '2022-12-13', 'time': '01:02:03'},
+    {'filename': 'aigean_man_20221212_090000.hdf5', 'instrument': 'Manannan', 'date': '2022-12-12', 'time': '09:00:00'},
+]
+
+
+# Test that the latest record overall and for each instrument are found
+def test_query_result_latest():
+    result = net.QueryResult(RECORDS)
+    assert result.latest() == RECORDS[2]
+    assert result.latest_per_instrument() == {'Lir': RECORDS[2], 'Manannan': RECORDS[1]}
+    assert net.QueryResult([]).latest() == None
+
+
+# Test that filtering and sorting keep the right records
+def test_query_result_filter_and_sort():
+    result = net.QueryResult(RECORDS)
+    assert list(result.filter(instrument='manannan').filename) == [RECORDS[1]['filename'], RECORDS[3]['filename']]
+    assert len(result.filter(start='2022-12-12T10:00:00', stop='2022-12-12')) == 2
+    assert [i['time'] for i in result.sort()] == ['09:00:00', '12:38:48', '13:00:00', '01:02:03']
+    assert result.sort(reverse=True)[0] == RECORDS[2]
+
+
+class FakeSession:
+    def __init__(self):
+        self.payloads = []
+
+    def get(self, url, params, timeout):
+        self.payloads.append(params)
+        return self
+
+    def json(self):
+        return RECORDS[:1]
+
+
+# Test that queries longer than three days are split into three-day windows
+def test_query_windows():
+    session = FakeSession()
+    result = net.query('2022-12-01', '2022-12-07', session=session)
+    assert [(i['start_date'], i['stop_date']) for i in session.payloads] == [('2022-12-01', '2022-12-03'), ('2022-12-04', '2022-12-06'), ('2022-12-07', '2022-12-07')]
+    assert len(result) == 3
+
+
+
+# ----------------------------------------------------
+# Testing net.download_isa against a local HTTP server
+# ----------------------------------------------------
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT = bytes(range(256)) * 1000
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    ranges = []
+    # Number of replies to byte ranges cut off halfway, as by a dropped connection
+    cut = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        first, last = 0, len(CONTENT) - 1
+        header = self.headers.get('Range')
+        RangeHandler.ranges.append(header)
+
+        if header:
+            start, end = header.replace('bytes=', '').split('-')
+            first = int(start)
+            last = int(end) if end else last
+            if first >= len(CONTENT):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(CONTENT)}')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {first}-{last}/{len(CONTENT)}')
+        else:
+            self.send_response(200)
+
+        self.send_header('Content-Length', str(last - first + 1))
+        self.end_headers()
+
+        with RangeHandler.lock:
+            cut = header and last > first and RangeHandler.cut > 0
+            if cut:
+                RangeHandler.cut -= 1
+        if cut:
+            self.wfile.write(CONTENT[first:first + (last - first) // 2])
+            self.close_connection = True
+            return
+
+        self.wfile.write(CONTENT[first:last + 1])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(net, 'DOWNLOAD_URL', f'http://127.0.0.1:{httpd.server_port}/download')
+    RangeHandler.ranges = []
+    RangeHandler.cut = 0
+    yield httpd
+    httpd.shutdown()
+
+
+# Test that a download is only given its final name once complete and verified
+def test_download_with_checksum(server, tmp_path):
+    path = net.download_isa('aigean_lir_20221212_123848.asdf', save_dir=tmp_path, checksum=hashlib.sha256(CONTENT).hexdigest())
+    assert Path(path).read_bytes() == CONTENT
+    assert not Path(path + '.part').exists()
+
+
+# Test that an interrupted download carries on from the bytes already downloaded
+def test_download_resume(server, tmp_path):
+    (tmp_path / 'aigean_lir_20221212_123848.asdf.part').write_bytes(CONTENT[:1000])
+    path = net.download_isa('aigean_lir_20221212_123848.asdf', save_dir=tmp_path, checksum=hashlib.sha256(CONTENT).hexdigest())
+    assert RangeHandler.ranges == ['bytes=1000-']
+    assert Path(path).read_bytes() == CONTENT
+
+
+# Test that a download split into byte ranges is put back together
+def test_download_segments(server, tmp_path):
+    path = net.download_isa('aigean_lir_20221212_123848.asdf', save_dir=tmp_path, segments=4)
+    assert Path(path).read_bytes() == CONTENT
+    assert len(RangeHandler.ranges) == 5
+
+
+# Test that an interrupted download split into segments carries on from the bytes of each segment
+def test_download_segments_interrupted(server, tmp_path):
+    RangeHandler.cut = 2
+    with pytest.raises(Exception):
+        net.download_isa('aigean_lir_20221212_123848.asdf', save_dir=tmp_path, segments=4)
+    assert not (tmp_path / 'aigean_lir_20221212_123848.asdf').exists()
+    assert not (tmp_path / 'aigean_lir_20221212_123848.asdf.part').exists()
+
+    RangeHandler.ranges = []
+    path = net.download_isa('aigean_lir_20221212_123848.asdf', save_dir=tmp_path, segments=4)
+    assert Path(path).read_bytes() == CONTENT
+    assert len(RangeHandler.ranges) == 3
+    assert list(tmp_path.iterdir()) == [Path(path)]
+
+
+# Test that a .part file as long as the file is downloaded again, unless a checksum proves it right
+def test_download_complete_part_not_trusted(server, tmp_path):
+    (tmp_path / 'aigean_lir_20221212_123848.asdf.part').write_bytes(bytes(len(CONTENT)))
+    path = net.download_isa('aigean_lir_20221212_123848.asdf', save_dir=tmp_path)
+    assert Path(path).read_bytes() == CONTENT
+
+    (tmp_path / 'aigean_lir_20221212_123848.asdf.part').write_bytes(CONTENT)
+    RangeHandler.ranges = []
+    net.download_isa('aigean_lir_20221212_123848.asdf', save_dir=tmp_path, checksum=hashlib.sha256(CONTENT).hexdigest())
+    assert RangeHandler.ranges == [f'bytes={len(CONTENT)}-']
+
+
+# Test that there are never more segments than bytes
+def test_download_more_segments_than_bytes(server, tmp_path, monkeypatch):
+    monkeypatch.setitem(globals(), 'CONTENT', b'abc')
+    path = net.download_isa('aigean_lir_20221212_123848.asdf', save_dir=tmp_path, segments=8)
+    assert Path(path).read_bytes() == b'abc'
+
+
+# Test that a download that doesn't match its size or checksum is never given its final name
+@pytest.mark.parametrize('size, checksum', [(len(CONTENT) + 1, None), (None, '0' * 64)])
+def test_download_verification_failed(server, tmp_path, size, checksum):
+    with pytest.raises(IOError):
+        net.download_isa('aigean_lir_20221212_123848.asdf', save_dir=tmp_path, size=size, checksum=checksum)
+    assert not (tmp_path / 'aigean_lir_20221212_123848.asdf').exists()
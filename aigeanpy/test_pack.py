@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import pytest
+from aigeanpy.pack import pack, compact, PackedArchive
+from aigeanpy.read_files import read_file
+from aigeanpy.write_files import write_file
+
+
+def _write(directory, name, xcoords, ycoords, time, data):
+    instrument = {'lir': 'Lir', 'man': 'Manannan', 'fan': 'Fand'}[name.split('_')[1]]
+    metadata = {'observatory': 'Aigean', 'instrument': instrument, 'date': '2022-12-12', 'time': time,
+                'xcoords': xcoords, 'ycoords': ycoords, 'resolution': 30}
+    return write_file(str(directory / name), metadata, data)
+
+
+@pytest.fixture
+def observations(tmp_path):
+    rng = np.random.default_rng(0)
+    return [
+        _write(tmp_path, 'aigean_lir_20221212_120000.asdf', [0.0, 600.0], [0.0, 300.0], '12:00:00', rng.normal(size=(10, 20))),
+        _write(tmp_path, 'aigean_man_20221212_130000.hdf5', [900.0, 1200.0], [0.0, 300.0], '13:00:00', rng.normal(size=(10, 10))),
+        _write(tmp_path, 'aigean_fan_20221212_140000.zip', [3000.0, 3300.0], [3000.0, 3150.0], '14:00:00', rng.normal(size=(5, 10))),
+    ]
+
+
+# Test that every observation is read back from the container as it was written, found by key and by query
+def test_pack_and_read(tmp_path, observations):
+    container = str(tmp_path / 'aigean.hdf5')
+    assert pack(observations, container, jobs=2) == 3
+
+    with PackedArchive(container) as archive:
+        assert len(archive) == 3
+        assert archive.keys() == ['aigean_lir_20221212_120000', 'aigean_man_20221212_130000', 'aigean_fan_20221212_140000']
+
+        for filename, key in zip(observations, archive.keys()):
+            metadata, data = read_file(filename, cache=False)
+            image = archive[key]
+            assert np.array_equal(image.data, data)
+            assert image.metadata['instrument'] == metadata['instrument']
+            assert list(image.metadata['xcoords']) == list(metadata['xcoords'])
+
+        assert archive.query(bbox=(0, 0, 1000, 300)) == ['aigean_lir_20221212_120000', 'aigean_man_20221212_130000']
+        assert archive.query(instrument='Fand') == ['aigean_fan_20221212_140000']
+        assert archive.query(time_range=('2022-12-12 12:30:00', '2022-12-12 13:30:00')) == ['aigean_man_20221212_130000']
+        assert archive.query(time_range=('2022-12-13', '2022-12-14')) == []
+        assert [i.metadata['instrument'] for i in archive.find(instrument='lir')] == ['Lir']
+
+        window = archive.get('aigean_lir_20221212_120000', window=(2, 4, 5, 8))
+        assert np.array_equal(window.data, archive['aigean_lir_20221212_120000'].data[2:4, 5:8])
+        assert list(window.metadata['xcoords']) == [150.0, 240.0] and list(window.metadata['ycoords']) == [180.0, 240.0]
+
+        with pytest.raises(KeyError):
+            archive['aigean_lir_20221212_000000']
+
+
+# Test that packing again skips what is already in the container, and compact gives back replaced space
+def test_pack_append_replace_and_compact(tmp_path, observations):
+    container = str(tmp_path / 'aigean.hdf5')
+    assert pack(observations[:1], container, compression=None) == 1
+    assert pack(observations, container, compression=None) == 2
+    assert pack(observations, container, compression=None) == 0
+
+    size = os.path.getsize(container)
+    assert pack(observations, container, compression=None, replace=True) == 3
+    assert os.path.getsize(container) > size
+
+    before, after = compact(container)
+    assert after < before and not os.path.exists(container + '.part')
+
+    with PackedArchive(container) as archive:
+        assert len(archive) == 3
+        assert np.array_equal(archive['aigean_man_20221212_130000'].data, read_file(observations[1], cache=False)[1])
+
+    with pytest.raises(TypeError):
+        pack(observations[0], container)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from time import sleep
+from aigeanpy.pipeline import Pipeline, Stage
+from aigeanpy.aigean_mosaic import mosaic_pipeline
+from aigeanpy.satmap import SatMap
+
+
+def wait(x, seconds=0.05):
+    sleep(seconds)
+    return x
+
+
+def fail_on_three(x):
+    if x == 3:
+        raise ValueError('three')
+    return x
+
+
+# Tests that results come back in order even when the workers finish out of order
+def test_order_and_stats():
+    pipeline = Pipeline([Stage('first', lambda x: wait(x, 0.01 * (x % 3)), workers=3), Stage('second', abs, workers=2, processes=True)], queue_size=2)
+    assert list(pipeline.run(range(-10, 0))) == list(range(10, 0, -1))
+
+    stats = pipeline.stats()
+    assert [i['items'] for i in stats] == [10, 10]
+    assert max(i['queue_max'] for i in stats) <= 2
+    assert 'wall time' in pipeline.report()
+
+
+# Tests that stages overlap: the wall time is close to the slowest stage, not the sum of the stages
+def test_stages_overlap():
+    pipeline = Pipeline([Stage(name, wait) for name in ['download', 'decode', 'resample']])
+    assert list(pipeline.run(range(8))) == list(range(8))
+    assert pipeline.wall < 0.8 * 3 * 8 * 0.05
+
+
+# Tests that a slow item stops new items from being fed while the results after it wait to be yielded in order
+def test_reorder_is_bounded():
+    fed = []
+
+    def items():
+        for i in range(100):
+            fed.append(i)
+            yield i
+
+    pipeline = Pipeline([Stage('slow first', lambda x: wait(x, 0.5 if x == 0 else 0.001), workers=4)], queue_size=2)
+    results = pipeline.run(items())
+    assert next(results) == 0
+    assert len(fed) < 20
+    assert list(results) == list(range(1, 100))
+
+
+def test_error_is_raised():
+    pipeline = Pipeline([Stage('check', fail_on_three, workers=2)])
+    with pytest.raises(ValueError):
+        list(pipeline.run(range(10)))
+
+
+def test_mosaic_pipeline(tmp_path):
+    filenames = []
+    for i, (instrument, resolution) in enumerate([('Lir', 30), ('Manannan', 15)]):
+        metadata = {'observatory': 'Aigean', 'instrument': instrument, 'date': '2022-12-12', 'time': f'12:0{i}:00',
+                    'xcoords': [300.0 * i, 300.0 * i + 600.0], 'ycoords': [0.0, 300.0], 'resolution': resolution}
+        shape = (round(300 / resolution), round(600 / resolution))
+        filenames.append(SatMap(np.ones(shape), metadata).save(str(tmp_path / f'image{i}.hdf5')))
+
+    satmaps = list(mosaic_pipeline(filenames, resolution=15, jobs=2).run(filenames))
+    assert [i.data.shape for i in satmaps] == [(20, 40), (20, 40)]
+    assert [i.metadata.resolution for i in satmaps] == [15, 15]
@@ -0,0 +1,83 @@
+import subprocess
+import sys
+import time
+import numpy as np
+import pytest
+from argparse import ArgumentParser
+from aigeanpy.profiling import add_profile_arguments, profiled
+from aigeanpy.satmap import SatMap
+
+
+def work():
+    return sum(np.arange(100000) ** 2)
+
+
+# Tests that the reports are written to the report directory and nothing is added to stdout
+def test_reports_written(tmp_path, capsys):
+    parser = ArgumentParser()
+    add_profile_arguments(parser)
+    arguments = parser.parse_args(['--profile', '--trace-memory', '--report-dir', str(tmp_path / 'reports')])
+
+    with profiled(arguments, 'script'):
+        work()
+
+    captured = capsys.readouterr()
+    assert captured.out == ''
+    assert 'reports' in captured.err
+
+    for name in ['script.pstats', 'script.txt', 'script.collapsed', 'script_memory.txt']:
+        assert (tmp_path / 'reports' / name).exists()
+
+    lines = (tmp_path / 'reports' / 'script.collapsed').read_text().splitlines()
+    assert any('work (test_profiling.py' in line for line in lines)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert (tmp_path / 'reports' / 'script_memory.txt').read_text().startswith('peak: ')
+
+
+def allocate_and_free():
+    data = np.ones(2**22)
+    time.sleep(0.3)
+    del data
+
+
+# Tests that the memory report shows the allocation sites behind the peak, not only those left at the end
+def test_memory_sites_near_peak(tmp_path):
+    parser = ArgumentParser()
+    add_profile_arguments(parser)
+    arguments = parser.parse_args(['--trace-memory', '--report-dir', str(tmp_path)])
+
+    with profiled(arguments, 'script'):
+        allocate_and_free()
+
+    report = (tmp_path / 'script_memory.txt').read_text()
+    near_peak, at_end = report.split('top', 1)[1].split('still allocated at the end:\n')
+    assert float(report.split()[1]) >= 32
+    # The largest site near the peak is the array, which is freed by the end
+    assert 'near the peak' in near_peak and float(near_peak.splitlines()[1].split()[0]) >= 32
+    assert float(at_end.splitlines()[0].split()[0]) < 1
+
+
+def test_reports_written_on_exit(tmp_path):
+    parser = ArgumentParser()
+    add_profile_arguments(parser)
+    arguments = parser.parse_args(['--profile', '--report-dir', str(tmp_path)])
+
+    with pytest.raises(SystemExit):
+        with profiled(arguments, 'script'):
+            sys.exit('failed')
+    assert (tmp_path / 'script.pstats').exists()
+
+
+# Tests that a console script prints the same output when it is profiled
+def test_console_script_output_unchanged(tmp_path):
+    metadata = {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:00:00',
+                'xcoords': [0.0, 600.0], 'ycoords': [0.0, 300.0], 'resolution': 30}
+    filename = SatMap(np.ones((10, 20)), metadata).save(str(tmp_path / 'image.zip'))
+
+    command = [sys.executable, '-m', 'aigeanpy.aigean_metadata', filename]
+    plain = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    profiled_run = subprocess.run(command + ['--profile', '--trace-memory', '--report-dir', str(tmp_path / 'reports')],
+                                  capture_output=True, text=True, check=True).stdout
+
+    assert plain == profiled_run
+    assert (tmp_path / 'reports' / 'aigean_metadata.collapsed').exists()
@@ -81,4 +81,67 @@ def test_wrong_and_no_extension(filename):
 
 def test_filenames_of_different_types(filename):
     with pytest.raises(TypeError):
-        read_file(filename)
\ No newline at end of file
+        read_file(filename)
+
+# ----------------------------
+# Testing the cache of read_file
+# ----------------------------
+
+import numpy as np
+import h5py
+from aigeanpy.read_files import cache_info, cache_clear, set_cache_size, CACHE_MAX_BYTES
+
+
+def write_hdf5(path, data):
+    with h5py.File(path, 'w') as f:
+        group = f.create_group('observation')
+        group.create_dataset('data', data=data)
+        group.attrs['date'] = '2022-12-12'
+
+
+@pytest.fixture
+def empty_cache():
+    cache_clear()
+    yield
+    set_cache_size(CACHE_MAX_BYTES)
+    cache_clear()
+
+
+# Tests that a file is decoded once, and that the cached data can't be changed
+def test_cache_hit(tmp_path, empty_cache):
+    write_hdf5(tmp_path / 'aigean_man_20221212_123848.hdf5', np.ones((10, 30)))
+    metadata, data = read_file(str(tmp_path / 'aigean_man_20221212_123848.hdf5'))
+    metadata['date'] = 'changed'
+    metadata, data = read_file(str(tmp_path / 'aigean_man_20221212_123848.hdf5'))
+
+    assert cache_info()['hits'] == 1 and cache_info()['misses'] == 1
+    assert metadata['date'] == '2022-12-12'
+    with pytest.raises(ValueError):
+        data[0, 0] = 2
+
+
+# Tests that a file that changed on disk is read again
+def test_cache_changed_file(tmp_path, empty_cache):
+    filename = str(tmp_path / 'aigean_man_20221212_123848.hdf5')
+    write_hdf5(filename, np.ones((10, 30)))
+    read_file(filename)
+    write_hdf5(filename, np.zeros((10, 31)))
+
+    metadata, data = read_file(filename)
+    assert data.shape == (10, 31)
+    assert cache_info()['misses'] == 2 and cache_info()['files'] == 1
+
+
+# Tests that the least recently used files are dropped when the cache is full
+def test_cache_eviction(tmp_path, empty_cache):
+    set_cache_size(2 * 10 * 30 * 8)
+    for i in range(3):
+        write_hdf5(tmp_path / f'aigean_man_20221212_00000{i}.hdf5', np.ones((10, 30)))
+        read_file(str(tmp_path / f'aigean_man_20221212_00000{i}.hdf5'))
+
+    assert cache_info()['files'] == 2
+    read_file(str(tmp_path / 'aigean_man_20221212_000000.hdf5'))
+    assert cache_info()['hits'] == 0
+
+    metadata, data = read_file(str(tmp_path / 'aigean_man_20221212_000002.hdf5'), cache=False)
+    assert data.flags.writeable
@@ -0,0 +1,50 @@
+import numpy as np
+import matplotlib.image as mpimg
+from aigeanpy.satmap import SatMap
+from aigeanpy.render import thin_ticks, render_png, render_many
+from pathlib import Path
+import pytest
+
+
+def make_satmap(time='02:48:22', operation=None):
+    metadata = {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-23', 'time': time,
+                'xcoords': [600.0, 1200.0], 'ycoords': [100.0, 400.0], 'resolution': 30}
+    if operation:
+        metadata['operation'] = operation
+    return SatMap(np.arange(200.0).reshape(10, 20), metadata)
+
+
+# Tests that ticks are thinned to at most max_ticks and keep both ends of the axis
+def test_thin_ticks():
+    ticks = thin_ticks(5000, 10)
+    assert len(ticks) == 10
+    assert ticks[0] == 0 and ticks[-1] == 4999
+    assert list(thin_ticks(4, 10)) == [0, 1, 2, 3]
+
+
+# Tests that render_png saves the image under the same name visualize uses
+def test_render_png_with_axes(tmp_path):
+    filename = render_png(make_satmap(), savepath=str(tmp_path) + '/')
+    assert Path(filename).name == 'Aigean_Lir_20221223_024822.png'
+    assert Path(filename).exists()
+
+
+# Tests that without axes one PNG pixel is written per data pixel
+def test_render_png_without_axes(tmp_path):
+    filename = render_png(make_satmap(operation='subtract'), savepath=str(tmp_path) + '/', axes=False)
+    assert Path(filename).name == 'Aigean_Lir_20221223_024822_subtract.png'
+    assert mpimg.imread(filename).shape[:2] == (10, 20)
+
+
+# Tests that render_many writes every image, in order, across processes
+def test_render_many(tmp_path):
+    satmaps = [make_satmap(time=f'02:48:2{i}') for i in range(3)]
+    filenames = render_many(satmaps, workers=2, savepath=str(tmp_path) + '/', axes=False)
+    assert [Path(i).name for i in filenames] == [f'Aigean_Lir_20221223_02482{i}.png' for i in range(3)]
+    assert all(Path(i).exists() for i in filenames)
+
+
+@pytest.mark.parametrize('workers', [0, -1, 1.5])
+def test_render_many_wrong_workers(workers):
+    with pytest.raises(ValueError):
+        render_many([make_satmap()], workers=workers)
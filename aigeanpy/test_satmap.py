@@ -1,7 +1,7 @@
 import numpy as np
 import os
 import aigeanpy.net as net
-from aigeanpy.satmap import SatMap, get_satmap
+from aigeanpy.satmap import SatMap, get_satmap, largest_covered_window, mosaic_satmaps
 from pytest import approx
 import pytest
 from pathlib import Path
@@ -337,3 +337,85 @@ def test_wrong_savepath_type_visualise():
     with pytest.raises(TypeError):
         image.visualize(save = True, savepath=1)
 
+
+
+def _two_regions():
+    data = np.zeros((6, 8))
+    data[:, 4:] = 100
+    metadata = {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:38:48',
+                'xcoords': [0.0, 240.0], 'ycoords': [0.0, 180.0], 'resolution': 30}
+    return SatMap(data + np.random.default_rng(0).normal(size=data.shape), metadata)
+
+
+def test_cluster_values():
+    image = _two_regions()
+    labels = image.cluster(2, seed=1)
+    assert labels.data.shape == image.data.shape
+    assert labels.data.dtype == np.int32
+    assert labels.metadata['operation'] == 'cluster'
+    assert len(np.unique(labels.data[:, :4])) == 1
+    assert len(np.unique(labels.data[:, 4:])) == 1
+    assert labels.data[0, 0] != labels.data[0, 7]
+
+
+def test_cluster_coords_and_satmap_features():
+    image = _two_regions()
+    other = SatMap(np.zeros(image.data.shape), image.metadata.copy())
+    labels = image.cluster(2, features=['coords', other], seed=1)
+    assert labels.data.shape == image.data.shape
+    assert set(np.unique(labels.data)) <= {0, 1}
+
+
+def test_cluster_wrong_features():
+    image = _two_regions()
+    with pytest.raises(ValueError):
+        image.cluster(2, features='colour')
+    other = SatMap(np.zeros((3, 8)), image.metadata.copy())
+    with pytest.raises(ValueError):
+        image.cluster(2, features=['value', other])
+
+
+def _tile(xcoords, ycoords, value, resolution=15):
+    rows = round((ycoords[1] - ycoords[0]) / resolution)
+    cols = round((xcoords[1] - xcoords[0]) / resolution)
+    metadata = {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:38:48',
+                'xcoords': xcoords, 'ycoords': ycoords, 'resolution': resolution}
+    return SatMap(np.full((rows, cols), float(value)), metadata)
+
+
+# Test that the largest covered rectangle is found, not only the overlap strips or one of the tiles
+def test_largest_covered_window():
+    # An L shape: the wide strip is 100 rows x 200 columns, the tall one 300 x 50, then 300 x 100
+    assert largest_covered_window([(0, 100, 0, 200), (0, 300, 150, 200)], (300, 200)) == (0, 100, 0, 200)
+    assert largest_covered_window([(0, 100, 0, 200), (0, 300, 100, 200)], (300, 200)) == (0, 300, 100, 200)
+    # A gap between the tiles
+    assert largest_covered_window([(0, 10, 0, 10), (0, 10, 15, 40)], (10, 40)) == (0, 10, 15, 40)
+
+
+# Test that a mosaic of three tiles without padding keeps only the largest fully covered rectangle
+def test_mosaic_satmaps_without_padding():
+    tiles = [_tile([0.0, 300.0], [0.0, 150.0], 1), _tile([300.0, 600.0], [0.0, 150.0], 2), _tile([225.0, 375.0], [150.0, 300.0], 3)]
+
+    padded = mosaic_satmaps(tiles)
+    assert padded.data.shape == (20, 40)
+    assert padded.data[0, 0] == 0
+
+    image = mosaic_satmaps(tiles, padding=False)
+    assert list(image.metadata.xcoords) == [0.0, 600.0]
+    assert list(image.metadata.ycoords) == [0.0, 150.0]
+    assert image.data.shape == (10, 40)
+    assert set(np.unique(image.data)) == {1, 2}
+
+    # The two images version gives the same result
+    pair = tiles[0].mosaic(tiles[1], padding=False)
+    assert pair.data.shape == (10, 40)
+    assert (pair.data == mosaic_satmaps(tiles[:2], padding=False).data).all()
+
+
+# Test that the resolution of a mosaic is kept a whole number, as read from the files
+def test_mosaic_resolution_is_whole():
+    from aigeanpy.sparse import composite
+    image = _tile([0.0, 600.0], [0.0, 300.0], 1, resolution=30).mosaic(_tile([300.0, 900.0], [0.0, 300.0], 2))
+    assert image.metadata['resolution'] == 15 and type(image.metadata['resolution']) == int
+    assert str(image).endswith(' 15 m/px>')
+    assert str(composite([_tile([0.0, 600.0], [0.0, 300.0], 1, resolution=30)]).overview(10)).endswith(' 60 m/px>')
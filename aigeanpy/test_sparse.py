@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from aigeanpy.satmap import SatMap, get_satmap, mosaic_satmaps
+from aigeanpy.sparse import SparseSatMap, composite
+
+
+def _pass(xcoords, ycoords, resolution=30, seed=0, instrument='Lir'):
+    rows = round((ycoords[1] - ycoords[0]) / resolution)
+    cols = round((xcoords[1] - xcoords[0]) / resolution)
+    data = np.random.default_rng(seed).random((rows, cols)) + 1
+    metadata = {'observatory': 'Aigean', 'instrument': instrument, 'date': '2022-12-12', 'time': '12:38:48',
+                'xcoords': xcoords, 'ycoords': ycoords, 'resolution': resolution}
+    return SatMap(data, metadata)
+
+
+# Two small passes at opposite corners of a large area
+PASSES = [([0.0, 1500.0], [0.0, 900.0]), ([60000.0, 61200.0], [30000.0, 30600.0])]
+
+
+def test_from_satmap_and_densify():
+    image = _pass([0.0, 3000.0], [0.0, 1500.0])
+    image.data[:, 40:] = 0
+
+    sparse = image.to_sparse(block_size=16)
+    assert sparse.shape() == (50, 100)
+    assert len(sparse.blocks) == 4 * 3
+    assert sparse.coverage() == 12 / 28
+    assert (sparse.densify().data == image.data).all()
+    assert sparse.fov() == image.fov() and sparse.centre() == image.centre()
+
+
+# Test that a composite holds the same image as a padded mosaic, in a fraction of the memory
+def test_composite_matches_mosaic():
+    satmaps = [_pass(x, y, seed=i) for i, (x, y) in enumerate(PASSES)]
+    satmaps.append(_pass([750.0, 1650.0], [450.0, 1050.0], resolution=15, seed=2, instrument='Manannan'))
+
+    dense = mosaic_satmaps(satmaps)
+    sparse = composite(satmaps, block_size=64)
+
+    assert sparse.shape() == dense.data.shape
+    assert list(sparse.metadata.xcoords) == list(dense.metadata.xcoords)
+    assert sparse.metadata['operation'] == 'mosaic'
+    assert (sparse.densify().data == dense.data).all()
+    assert sparse.nbytes < dense.data.nbytes / 50
+
+
+def test_add_matches_satmap_add():
+    first, second = [_pass(x, y, seed=i) for i, (x, y) in enumerate([([0.0, 1500.0], [0.0, 900.0]), ([900.0, 2400.0], [600.0, 1500.0])])]
+    expected = first + second
+
+    for other in [second, second.to_sparse(block_size=8)]:
+        result = first.to_sparse(block_size=8) + other
+        assert result.metadata['time'] == expected.metadata['time']
+        assert (result.densify().data == expected.data).all()
+
+    with pytest.raises(TypeError):
+        first.to_sparse() + _pass([0.0, 300.0], [0.0, 300.0], instrument='Fand')
+
+
+def test_crop():
+    sparse = composite([_pass(x, y, seed=i) for i, (x, y) in enumerate(PASSES)], block_size=32)
+    dense = sparse.densify()
+
+    cropped = sparse.crop([600.0, 3000.0], [300.0, 1200.0])
+    assert list(cropped.metadata.xcoords) == [600.0, 3000.0]
+    assert list(cropped.metadata.ycoords) == [300.0, 1200.0]
+    rows = slice(sparse.rows - 40, sparse.rows - 10)
+    assert (cropped.densify().data == dense.data[rows, 20:100]).all()
+
+    with pytest.raises(ValueError):
+        sparse.crop([-900.0, -300.0], [0.0, 300.0])
+
+
+def test_save_and_overview(tmp_path):
+    sparse = composite([_pass(x, y, seed=i) for i, (x, y) in enumerate(PASSES)], block_size=32)
+    dense = sparse.densify()
+
+    for name in ['aigean_lir_sparse.hdf5', 'aigean_lir_sparse.zip']:
+        filename = sparse.save(str(tmp_path / name))
+        assert (get_satmap(filename).data == dense.data).all()
+
+    overview = sparse.overview(max_pixels=500)
+    assert max(overview.data.shape) <= 500
+    assert overview.metadata.resolution == 30 * 5
+    assert (overview.data == dense.data[::5, ::5]).all()
@@ -0,0 +1,101 @@
+import numpy as np
+from aigeanpy.satmap import SatMap
+from aigeanpy.stack import SatMapStack
+from pytest import approx
+import pytest
+
+
+def make_satmap(data, date, xcoords=[0.0, 600.0], ycoords=[0.0, 300.0], instrument='Lir'):
+    metadata = {'observatory': 'Aigean', 'instrument': instrument, 'date': date, 'time': '12:00:00',
+                'xcoords': xcoords, 'ycoords': ycoords, 'resolution': 30}
+    return SatMap(data, metadata)
+
+
+@pytest.fixture
+def satmaps():
+    return [make_satmap(np.full((10, 20), float(day)), f'2022-12-{day:02d}') for day in range(1, 6)] + \
+           [make_satmap(np.arange(100.0).reshape(5, 20), '2022-12-06', ycoords=[0.0, 150.0])]
+
+
+# Tests that the stack is aligned on the area covered by every observation
+def test_stack_alignment(satmaps):
+    stack = SatMapStack(satmaps)
+    assert stack.shape() == (6, 5, 20)
+    assert stack.ycoords == [0.0, 150.0]
+    assert np.array_equal(stack.data[-1], satmaps[-1].data)
+
+
+# Tests that the statistics are the same whether the stack is reduced in chunks or at once
+@pytest.mark.parametrize('operation', ['mean', 'std', 'min', 'max', 'trend'])
+def test_chunked_statistics(satmaps, operation):
+    whole = getattr(SatMapStack(satmaps), operation)()
+    chunked = getattr(SatMapStack(satmaps, chunk_rows=2), operation)()
+    assert chunked.data == approx(whole.data)
+    assert chunked.metadata['operation'] == operation
+    assert all(chunked.metadata['ycoords'] == [0.0, 150.0])
+
+
+# Tests the trend of values growing by one a day and the anomaly of the last observation
+def test_trend_and_anomaly(satmaps):
+    stack = SatMapStack(satmaps[:5])
+    assert stack.trend().data == approx(np.ones((10, 20)))
+    assert stack.anomaly().data == approx(np.full((10, 20), 2.0))
+    assert stack.mean().data == approx(np.full((10, 20), 3.0))
+
+
+def test_stack_wrong_instrument(satmaps):
+    with pytest.raises(TypeError):
+        SatMapStack(satmaps + [make_satmap(np.ones((10, 20)), '2022-12-07', instrument='Manannan')])
+
+
+def test_stack_no_overlapping(satmaps):
+    with pytest.raises(TypeError):
+        SatMapStack(satmaps + [make_satmap(np.ones((10, 20)), '2022-12-07', xcoords=[900.0, 1500.0])])
+
+
+# Tests that subtracting still uses the overlapping area of the two observations
+def test_subtract_overlap(satmaps):
+    image_sub = satmaps[0] - satmaps[-1]
+    assert all(image_sub.metadata['ycoords'] == [0.0, 150.0])
+    assert image_sub.data.shape == (5, 20)
+    assert image_sub.data[0, 0] == 1.0
+
+
+# Tests that a stack of files only reads blocks of rows, and gives the statistics of the stack in memory
+@pytest.mark.parametrize('extension', ['hdf5', 'asdf', 'zip'])
+def test_from_files_reads_blocks(tmp_path, monkeypatch, extension):
+    from contextlib import contextmanager
+    import aigeanpy.stack
+    from aigeanpy.write_files import write_file
+
+    rng = np.random.default_rng(0)
+    satmaps = [make_satmap(rng.normal(size=(100, 20)), f'2022-12-{day:02d}', ycoords=[0.0, 3000.0]) for day in range(1, 5)]
+    filenames = [write_file(str(tmp_path / f'aigean_lir_2022120{i + 1}_120000.{extension}'), satmap.metadata, satmap.data)
+                 for i, satmap in enumerate(satmaps)]
+
+    reads = []
+    open_data = aigeanpy.stack.open_data
+
+    class Recorder:
+        def __init__(self, data):
+            self.data, self.shape, self.dtype = data, data.shape, data.dtype
+
+        def __getitem__(self, key):
+            window = self.data[key]
+            reads.append(window.shape)
+            return window
+
+    @contextmanager
+    def recording_open_data(filename):
+        with open_data(filename) as data:
+            yield Recorder(data)
+
+    monkeypatch.setattr(aigeanpy.stack, 'open_data', recording_open_data)
+
+    stack = SatMapStack.from_files(filenames, chunk_rows=30)
+    assert reads == []
+    assert not any(isinstance(layer, np.ndarray) for layer in stack.layers)
+
+    assert stack.mean().data == approx(SatMapStack(satmaps).mean().data)
+    assert max(rows for rows, cols in reads) == 30 and len(reads) == 4 * 4
+    assert stack.anomaly().data == approx(SatMapStack(satmaps).anomaly().data)
@@ -0,0 +1,56 @@
+import numpy as np
+import h5py
+import matplotlib.image as mpimg
+from aigeanpy.satmap import SatMap
+from aigeanpy.tiles import render_tiles, max_zoom_level
+from pathlib import Path
+import pytest
+
+
+def make_satmap():
+    metadata = {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-23', 'time': '02:48:22',
+                'xcoords': [600.0, 1200.0], 'ycoords': [100.0, 400.0], 'resolution': 30}
+    return SatMap(np.arange(200.0).reshape(10, 20), metadata)
+
+
+# Tests that every zoom level is written, from a single tile down to full resolution
+def test_render_tiles_pyramid(tmp_path):
+    tiles = render_tiles(make_satmap(), tmp_path, tile_size=4, workers=1)
+    assert max_zoom_level((10, 20), 4) == 3
+    assert len([i for i in tiles if Path(i).parts[-3] == '3']) == 5 * 3
+    assert len([i for i in tiles if Path(i).parts[-3] == '0']) == 1
+    assert mpimg.imread(tmp_path / '0' / '0' / '0.png').shape == (4, 4, 4)
+
+
+# Tests that a lazily read HDF5 file gives the same tiles as the SatMap, using a process pool
+def test_render_tiles_from_hdf5(tmp_path):
+    satmap = make_satmap()
+    with h5py.File(tmp_path / 'mosaic.hdf5', 'w') as f:
+        f.create_group('observation').create_dataset('data', data=satmap.data)
+
+    tiles_satmap = render_tiles(satmap, tmp_path / 'a', tile_size=4, workers=1)
+    tiles_hdf5 = render_tiles(str(tmp_path / 'mosaic.hdf5'), tmp_path / 'b', tile_size=4, workers=2)
+
+    assert len(tiles_satmap) == len(tiles_hdf5)
+    for a, b in zip(tiles_satmap, tiles_hdf5):
+        assert np.array_equal(mpimg.imread(a), mpimg.imread(b))
+
+
+# Tests that the HDF5 file is closed once the tiles are written, so it can be written again
+@pytest.mark.parametrize('workers', [1, 2])
+def test_render_tiles_closes_hdf5(tmp_path, workers):
+    import aigeanpy.tiles
+
+    with h5py.File(tmp_path / 'mosaic.hdf5', 'w') as f:
+        f.create_group('observation').create_dataset('data', data=make_satmap().data)
+
+    render_tiles(str(tmp_path / 'mosaic.hdf5'), tmp_path / 'tiles', tile_size=4, workers=workers)
+    assert aigeanpy.tiles._source is None and aigeanpy.tiles._source_file is None
+
+    with h5py.File(tmp_path / 'mosaic.hdf5', 'r+') as f:
+        f['observation']['data'][0, 0] = -1
+
+
+def test_render_tiles_wrong_tile_size(tmp_path):
+    with pytest.raises(ValueError):
+        render_tiles(make_satmap(), tmp_path, tile_size=0)
@@ -0,0 +1,108 @@
+import json
+import numpy as np
+import pytest
+from time import perf_counter
+from aigeanpy import tracing
+from aigeanpy.satmap import SatMap, get_satmap
+
+
+@pytest.fixture
+def traced_run():
+    tracing.clear()
+    tracing.enable()
+    yield
+    tracing.disable()
+    tracing.clear()
+
+
+def make_satmap(instrument, resolution, x):
+    metadata = {'observatory': 'Aigean', 'instrument': instrument, 'date': '2022-12-12', 'time': '12:00:00',
+                'xcoords': [x, x + 600.0], 'ycoords': [0.0, 300.0], 'resolution': resolution}
+    return SatMap(np.ones((round(300 / resolution), round(600 / resolution))), metadata)
+
+
+# Tests that reads, SatMap operations and the phases of a mosaic are recorded with their data sizes
+def test_spans_recorded(tmp_path, traced_run):
+    filename = make_satmap('Lir', 30, 0.0).save(str(tmp_path / 'image.zip'))
+    image = get_satmap(filename)
+    image.mosaic(make_satmap('Manannan', 15, 300.0))
+
+    names = [event['name'] for event in tracing.events()]
+    for name in ['SatMap.save', 'read_zip', 'read_file', 'SatMap.mosaic', 'mosaic.resample', 'mosaic.composite']:
+        assert name in names
+
+    read = [event for event in tracing.events() if event['name'] == 'read_zip'][0]
+    assert read['args']['shape'] == [10, 20]
+    assert read['args']['bytes'] == 10 * 20 * 8
+
+    summary = tracing.summary()
+    assert summary['read_zip']['count'] == 1
+    assert 'mosaic.resample' in tracing.summary_table()
+
+    tracing.export_chrome_trace(str(tmp_path / 'trace.json'))
+    with open(tmp_path / 'trace.json') as f:
+        trace = json.load(f)['traceEvents']
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in trace)
+
+
+def test_errors_are_recorded(traced_run):
+    with pytest.raises(ValueError):
+        with tracing.span('failing'):
+            raise ValueError('failed')
+    assert tracing.events()[-1]['args']['error'] == 'ValueError'
+
+
+# Tests that nothing is recorded, and little time spent, while tracing is disabled
+def test_disabled_costs_little():
+    tracing.clear()
+
+    @tracing.traced()
+    def noop():
+        pass
+
+    start = perf_counter()
+    for _ in range(100000):
+        noop()
+        with tracing.span('noop'):
+            pass
+    assert perf_counter() - start < 1.0
+    assert tracing.events() == []
+
+
+WORKERS_SCRIPT = '''
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from aigeanpy import tracing
+
+
+def work(i):
+    with tracing.span('work', i=i):
+        return i
+
+
+if __name__ == '__main__':
+    with tracing.span('main'):
+        with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context(sys.argv[1])) as pool:
+            list(pool.map(work, range(8)))
+'''
+
+
+# Tests that with AIGEANPY_TRACE the spans of worker processes are merged into the trace of the main process
+@pytest.mark.parametrize('method', ['fork', 'spawn'])
+def test_trace_of_workers(tmp_path, method):
+    import os
+    import subprocess
+    import sys
+
+    (tmp_path / 'workers.py').write_text(WORKERS_SCRIPT)
+    environment = dict(os.environ, AIGEANPY_TRACE=str(tmp_path / 'trace.json'),
+                       PYTHONPATH=os.pathsep.join([os.path.dirname(os.path.dirname(tracing.__file__)), os.environ.get('PYTHONPATH', '')]))
+    subprocess.run([sys.executable, str(tmp_path / 'workers.py'), method], env=environment, check=True, cwd=tmp_path)
+
+    with open(tmp_path / 'trace.json') as f:
+        trace = json.load(f)['traceEvents']
+    assert [event['name'] for event in trace].count('main') == 1
+    assert sorted(event['args']['i'] for event in trace if event['name'] == 'work') == list(range(8))
+    assert len({event['pid'] for event in trace}) >= 2
+    assert sorted(os.listdir(tmp_path)) == ['trace.json', 'workers.py']
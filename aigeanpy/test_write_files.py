@@ -0,0 +1,66 @@
+import numpy as np
+import h5py
+import zipfile
+import pytest
+from aigeanpy.read_files import read_file, mmap_zip
+from aigeanpy.satmap import SatMap, get_satmap
+from aigeanpy.write_files import write_file
+
+
+def make_satmap():
+    data = np.arange(200, dtype=np.float32).reshape(10, 20)
+    metadata = {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:38:48',
+                'xcoords': np.array([0.0, 600.0]), 'ycoords': [0.0, 300.0], 'resolution': 30, 'operation': 'mosaic'}
+    return SatMap(data, metadata)
+
+
+# Tests that every format is read back as it was written
+@pytest.mark.parametrize('extension', ['hdf5', 'zip', 'asdf'])
+def test_round_trip(tmp_path, extension):
+    image = make_satmap()
+    filename = image.save(str(tmp_path / f'aigean_lir_20221212_123848.{extension}'))
+
+    saved = get_satmap(filename)
+    assert np.array_equal(saved.data, image.data)
+    assert saved.data.dtype == np.float32
+    assert saved.metadata.xcoords == (0.0, 600.0)
+    assert saved.metadata.resolution == 30
+    assert saved.metadata['operation'] == 'mosaic'
+    assert not (tmp_path / f'aigean_lir_20221212_123848.{extension}.part').exists()
+
+
+def test_hdf5_chunks_and_compression(tmp_path):
+    filename = make_satmap().save(str(tmp_path / 'image.hdf5'), chunks=(5, 10), compression='lzf')
+    with h5py.File(filename, 'r') as f:
+        assert f['observation/data'].chunks == (5, 10)
+        assert f['observation/data'].compression == 'lzf'
+
+    with pytest.raises(ValueError):
+        make_satmap().save(str(tmp_path / 'other.hdf5'), chunks=None, compression='gzip')
+
+
+# Tests that the data of a zip file is stored uncompressed and can be memory-mapped
+def test_zip_is_mappable(tmp_path):
+    filename = make_satmap().save(str(tmp_path / 'image.zip'))
+    with zipfile.ZipFile(filename) as f:
+        assert f.getinfo('observation.npy').compress_type == zipfile.ZIP_STORED
+
+    metadata, data = mmap_zip(filename)
+    assert isinstance(data, np.memmap)
+    assert np.array_equal(data, make_satmap().data)
+    assert metadata['xcoords'] == [0.0, 600.0]
+
+    compressed = make_satmap().save(str(tmp_path / 'compressed.zip'), compression='deflate')
+    assert np.array_equal(read_file(compressed)[1], make_satmap().data)
+    with pytest.raises(ValueError):
+        mmap_zip(compressed)
+
+
+def test_dtype_and_wrong_format(tmp_path):
+    filename = make_satmap().save(str(tmp_path / 'image.hdf5'), dtype='float64')
+    assert read_file(filename)[1].dtype == np.float64
+
+    with pytest.raises(ValueError):
+        make_satmap().save(str(tmp_path / 'image.hdf5'), format='zip')
+    with pytest.raises(ValueError):
+        write_file(str(tmp_path / 'image.png'), {}, np.ones(2))
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from aigeanpy.satmap import SatMap
+from aigeanpy.zonal import Zones, rasterise_zones, zonal_stats, _rasterise
+
+
+def _image(data):
+    metadata = {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:38:48',
+                'xcoords': [100.0, 100.0 + 30 * data.shape[1]], 'ycoords': [0.0, 30.0 * data.shape[0]], 'resolution': 30}
+    return SatMap(data, metadata)
+
+
+def _centres(image):
+    rows, cols = np.mgrid[0:image.data.shape[0], 0:image.data.shape[1]]
+    return image.metadata.pixel_to_earth(rows, cols)
+
+
+# Test that every statistic of every zone matches a mask of the pixel centres inside it
+def test_zonal_stats_match_masks():
+    image = _image(np.random.default_rng(0).normal(size=(40, 50)))
+    x, y = _centres(image)
+
+    rng = np.random.default_rng(1)
+    corners = rng.uniform([0, 0], [1700, 1300], size=(200, 2))
+    zones = {f'box{i}': (cx, cy, cx + w, cy + h) for i, ((cx, cy), (w, h)) in enumerate(zip(corners, rng.uniform(20, 400, size=(200, 2))))}
+    zones['triangle'] = [(200.0, 100.0), (1200.0, 100.0), (200.0, 1000.0)]
+    zones['outside'] = (-500.0, -500.0, -400.0, -400.0)
+
+    stats = zonal_stats(image, zones, statistics=['count', 'sum', 'mean', 'std', 'min', 'max'])
+    assert stats['zone'] == list(zones)
+
+    for i, (name, zone) in enumerate(zones.items()):
+        if name == 'triangle':
+            mask = (x >= 200) & (y >= 100) & ((x - 200) / 1000 + (y - 100) / 900 < 1)
+        else:
+            mask = (x >= zone[0]) & (x <= zone[2]) & (y >= zone[1]) & (y <= zone[3])
+        values = image.data[mask]
+
+        assert stats['count'][i] == len(values)
+        if len(values):
+            assert np.isclose(stats['sum'][i], values.sum())
+            assert np.isclose(stats['mean'][i], values.mean())
+            assert np.isclose(stats['std'][i], values.std())
+            assert stats['min'][i] == values.min() and stats['max'][i] == values.max()
+        else:
+            assert np.isnan(stats['mean'][i]) and np.isnan(stats['min'][i])
+
+
+# Test that the zones are rasterised once per grid, and NaN pixels are left out
+def test_zones_are_cached_and_nan_ignored():
+    zones = Zones([(100.0, 0.0, 160.0, 60.0), [(100.0, 0.0), (400.0, 0.0), (100.0, 300.0)]])
+    first = _image(np.arange(200.0).reshape(10, 20))
+    second = _image(np.arange(200.0).reshape(10, 20) * 2)
+    second.data[9, 0] = np.nan
+
+    _rasterise.cache_clear()
+    stats = zonal_stats([first, second], zones, statistics=['count', 'mean', 'max'])
+    assert _rasterise.cache_info().misses == 1 and _rasterise.cache_info().hits == 1
+
+    assert stats['count'].tolist() == [[4, 45], [3, 44]]
+    assert stats['mean'][0, 0] == (180 + 181 + 160 + 161) / 4
+    assert stats['mean'][1, 0] == 2 * (181 + 160 + 161) / 3
+    assert stats['max'][1, 0] == 2 * 181
+
+    pixels, labels, counts = rasterise_zones(zones, first.metadata, first.data.shape)
+    assert counts.tolist() == [4, 45] and not pixels.flags.writeable
+
+
+def test_satmap_zonal_stats():
+    image = _image(np.ones((10, 20)))
+    assert image.zonal_stats({'all': (0.0, 0.0, 1e6, 1e6)})['count'].tolist() == [200]
+
+    with pytest.raises(ValueError):
+        image.zonal_stats({'all': (0.0, 0.0, 1e6, 1e6)}, statistics=['median'])
+    with pytest.raises(ValueError):
+        Zones([(10.0, 0.0, 0.0, 10.0)])
+    with pytest.raises(ValueError):
+        Zones([[(0.0, 0.0), (1.0, 1.0)]])
@@ -0,0 +1,201 @@
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, log2
+from pathlib import Path
+import matplotlib.image as mpimg
+from matplotlib import colormaps
+from matplotlib.colors import Normalize
+import numpy as np
+
+
+
+# The pyramid follows the slippy-map layout: outdir/z/x/y.png, where zoom 0 is
+# a single tile showing the whole image and each zoom level doubles the number
+# of tiles along each axis, until max_zoom shows the data at full resolution.
+# Coarser levels take every 2**(max_zoom - z)th pixel, so each tile only ever
+# reads tile_size x tile_size values from the source, however big it is.
+
+# Each worker process keeps its own handle on the source, set up once by
+# _init_worker, so tiles are sent to the workers as (z, x, y) triples only.
+# The HDF5 file behind it is closed by _close_worker when the worker exits,
+# or when render_tiles returns for tiles rendered in this process.
+_source = None
+_source_file = None
+
+
+def _open_source(source):
+    # The data to read tiles from, and the HDF5 file to close afterwards (None for arrays)
+    if type(source) == str:
+        import h5py
+        f = h5py.File(source, 'r')
+        return f['observation']['data'], f
+    return source, None
+
+
+def _init_worker(source):
+    global _source, _source_file
+    _source, _source_file = _open_source(source)
+
+    from multiprocessing import parent_process, util
+    if parent_process() is not None:
+        # Run as the worker process shuts down, which atexit handlers are not
+        util.Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker():
+    global _source, _source_file
+    if _source_file is not None:
+        _source_file.close()
+    _source, _source_file = None, None
+
+
+def _source_spec(source):
+    if type(source) == str:
+        return source
+    if source.metadata is None:
+        raise TypeError('Metadata for this file is not available, which suggests that file being analysed is not from one of the ISA imagers.')
+    return source.data
+
+
+def data_range(data, block_rows=1024):
+    """ Find the minimum and maximum of an image, reading it block by block
+
+    Parameters
+    ----------
+    data: ndarray or h5py.Dataset
+            the image
+
+    block_rows: int
+            number of rows read at a time, by default 1024
+
+    Returns
+    -------
+    tuple
+        the minimum and maximum value of the image
+    """
+
+    vmin, vmax = np.inf, -np.inf
+    for row in range(0, data.shape[0], block_rows):
+        block = np.asarray(data[row:row + block_rows])
+        vmin = min(vmin, float(np.nanmin(block)))
+        vmax = max(vmax, float(np.nanmax(block)))
+
+    return vmin, vmax
+
+
+def max_zoom_level(shape, tile_size=256):
+    """ Smallest zoom level at which the image is shown at full resolution
+
+    Parameters
+    ----------
+    shape: tuple
+            shape of the image
+
+    tile_size: int
+            number of pixels along each side of a tile, by default 256
+
+    Returns
+    -------
+    int
+        the zoom level
+
+    Examples
+    --------
+    >>> max_zoom_level((10, 20), tile_size=4)
+    3
+    """
+
+    return max(0, ceil(log2(max(shape) / tile_size)))
+
+
+def _render_tile(job):
+    z, x, y, max_zoom, tile_size, vmin, vmax, cmap, outdir = job
+
+    step = 2 ** (max_zoom - z)
+    span = tile_size * step
+    block = np.asarray(_source[y*span:(y+1)*span:step, x*span:(x+1)*span:step])
+
+    norm = Normalize(vmin=vmin, vmax=vmax)
+    rgba = np.zeros((tile_size, tile_size, 4), dtype=np.uint8)
+    rgba[:block.shape[0], :block.shape[1]] = colormaps[cmap](norm(block), bytes=True)
+
+    path = Path(outdir) / str(z) / str(x) / f'{y}.png'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    mpimg.imsave(path, rgba)
+
+    return str(path)
+
+
+def render_tiles(source, outdir, tile_size=256, max_zoom=None, vmin=None, vmax=None, cmap='viridis', workers=None):
+    """ Write a slippy-map pyramid of PNG tiles (outdir/z/x/y.png) for an image,
+    so a mosaic of any size can be browsed from a local static file server
+    without ever producing one giant image
+
+    Parameters
+    ----------
+    source: SatMap or str
+            the image to render, or the name of a HDF5 file laid out as read_h5py expects.
+            A HDF5 file is read lazily, one tile at a time.
+
+    outdir: str or path object
+            directory to write the tiles into
+
+    tile_size: int
+            number of pixels along each side of a tile, by default 256
+
+    max_zoom: int
+            zoom level shown at full resolution, by default the smallest one that fits the image
+
+    vmin, vmax: float
+            data values mapped to the ends of the colour map, by default the range of the image
+
+    cmap: str
+            name of the matplotlib colour map, by default 'viridis'
+
+    workers: int
+            number of worker processes, by default None (one per CPU).
+            With workers=1 the tiles are rendered in this process.
+
+    Returns
+    -------
+    list[str]
+        the paths of the tiles written
+    """
+
+    if type(tile_size) != int or tile_size <= 0:
+        raise ValueError('tile_size must be a positive integer')
+
+    if workers != None and (type(workers) != int or workers <= 0):
+        raise ValueError('workers must be a positive integer')
+
+    spec = _source_spec(source)
+    data, f = _open_source(spec)
+    try:
+        shape = data.shape
+
+        if max_zoom == None:
+            max_zoom = max_zoom_level(shape, tile_size)
+
+        if vmin == None or vmax == None:
+            data_min, data_max = data_range(data)
+            vmin = data_min if vmin == None else vmin
+            vmax = data_max if vmax == None else vmax
+    finally:
+        if f is not None:
+            f.close()
+
+    jobs = []
+    for z in range(max_zoom + 1):
+        span = tile_size * 2 ** (max_zoom - z)
+        for x in range(ceil(shape[1] / span)):
+            for y in range(ceil(shape[0] / span)):
+                jobs.append((z, x, y, max_zoom, tile_size, vmin, vmax, cmap, str(outdir)))
+
+    if workers == 1:
+        _init_worker(spec)
+        try:
+            return [_render_tile(job) for job in jobs]
+        finally:
+            _close_worker()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec,)) as pool:
+        return list(pool.map(_render_tile, jobs, chunksize=16))
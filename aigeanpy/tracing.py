@@ -0,0 +1,288 @@
+from functools import wraps
+from time import perf_counter_ns
+import atexit
+import json
+import os
+import threading
+
+
+# Spans time the work of the package: downloads, queries, reads, SatMap
+# operations, the phases of a mosaic, rendering and clustering iterations.
+# Tracing is off by default and a span then costs one check of a global
+# flag. Turn it on with enable(), or for a whole run by setting the
+# environment variable AIGEANPY_TRACE to the name of the Chrome trace file
+# to write when the program ends, e.g.
+#
+#     AIGEANPY_TRACE=trace.json aigean_mosaic -r 15 files...
+#
+# and open the file in chrome://tracing or https://ui.perfetto.dev.
+#
+# Worker processes (of a Pipeline stage with processes=True, of render_many or
+# render_tiles) record their own spans. Each writes them to '<file>.<pid>' as it
+# exits, and the main process merges those files into the trace it writes.
+
+_enabled = False
+_events = []
+# Processes whose spans were written by _export_worker, which may be asked twice as a worker exits
+_exported = set()
+_lock = threading.Lock()
+
+
+class _NoSpan:
+    """Returned by span when tracing is off: does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+
+    __slots__ = ['name', 'args', 'start']
+
+    def __init__(self, name, args) -> None:
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        end = perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        event = {'name': self.name, 'start': self.start, 'duration': end - self.start,
+                 'pid': os.getpid(), 'tid': threading.get_ident(), 'args': self.args}
+        with _lock:
+            _events.append(event)
+        return False
+
+    def set(self, **args):
+        """Add information to the span, such as the bytes or the shape of the data"""
+        self.args.update(args)
+
+
+def enable():
+    """ Start recording spans """
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """ Stop recording spans. The spans already recorded are kept. """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def clear():
+    """ Forget the spans recorded """
+    with _lock:
+        _events.clear()
+
+
+def events():
+    """ Get a copy of the spans recorded, each a dictionary with 'name', 'start' and 'duration' in nanoseconds and 'args' """
+    with _lock:
+        return list(_events)
+
+
+def span(name, **args):
+    """ Time a block of code
+
+    Parameters
+    ----------
+    name: str
+            name of the operation, such as 'mosaic.resample'
+
+    args:
+            information recorded with the span, such as filename='...'.
+            More can be added inside the block with .set(bytes=...)
+
+    Examples
+    --------
+    >>> enable()
+    >>> with span('example', size=3) as s:
+    ...     s.set(shape=(2, 2))
+    >>> events()[-1]['args']
+    {'size': 3, 'shape': (2, 2)}
+    >>> disable(); clear()
+    """
+
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, args)
+
+
+def traced(name=None, record=None):
+    """ Decorator timing every call of a function as a span
+
+    Parameters
+    ----------
+    name: str
+            name of the spans, by default the name of the function
+
+    record: callable
+            optional function of the result returning a dictionary of information
+            to record with the span, such as the shape of the data returned
+    """
+
+    def decorator(function):
+        span_name = name or function.__qualname__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+
+            with _Span(span_name, {}) as current:
+                result = function(*args, **kwargs)
+                if record is not None:
+                    current.set(**record(result))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def data_info(result):
+    """ Information about the data returned by a reader or a SatMap operation, for traced(record=...) """
+
+    data = result
+    if type(result) == tuple:
+        data = result[-1]
+    elif hasattr(result, 'data') and hasattr(result.data, 'shape'):
+        data = result.data
+
+    if not hasattr(data, 'shape'):
+        return {}
+    return {'shape': list(data.shape), 'bytes': int(data.nbytes), 'dtype': str(data.dtype)}
+
+
+def _chrome_events(events):
+    return [{'name': event['name'], 'cat': 'aigeanpy', 'ph': 'X',
+             'ts': event['start'] / 1000, 'dur': event['duration'] / 1000,
+             'pid': event['pid'], 'tid': event['tid'],
+             'args': {key: str(value) if type(value) not in [int, float, str, bool, list] else value
+                      for key, value in event['args'].items()}}
+            for event in events]
+
+
+def export_chrome_trace(filename):
+    """ Write the spans recorded as a Chrome trace, to open in chrome://tracing or https://ui.perfetto.dev
+
+    Parameters
+    ----------
+    filename: str
+            name of the JSON file to write
+    """
+
+    with open(filename, 'w') as f:
+        json.dump({'traceEvents': _chrome_events(events()), 'displayTimeUnit': 'ms'}, f)
+
+
+def _export_worker(filename):
+    # Only the spans of this process: a forked worker starts with a copy of those of its parent
+    pid = os.getpid()
+    if pid in _exported:
+        return
+    _exported.add(pid)
+    trace = _chrome_events([event for event in events() if event['pid'] == pid])
+    if trace:
+        with open(f'{filename}.{pid}', 'w') as f:
+            json.dump(trace, f)
+
+
+def _start_worker(filename):
+    from multiprocessing import util
+    util.Finalize(None, _export_worker, args=(filename,), exitpriority=0)
+
+
+def _export_run(filename):
+    # The trace of the main process, with the spans written by its workers
+    from glob import glob, escape as glob_escape
+
+    pid = os.getpid()
+    trace = _chrome_events([event for event in events() if event['pid'] == pid])
+    for part in glob(glob_escape(filename) + '.*'):
+        if part[len(filename) + 1:].isdigit():
+            with open(part) as f:
+                trace.extend(json.load(f))
+            os.remove(part)
+
+    with open(filename, 'w') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+def summary():
+    """ Get the number of calls, the total, mean and longest durations in milliseconds,
+    and the bytes recorded, of each operation
+
+    Returns
+    -------
+    dictionary
+        for each name of span, a dictionary with 'count', 'total_ms', 'mean_ms', 'max_ms' and 'bytes'
+    """
+
+    result = {}
+    for event in events():
+        entry = result.setdefault(event['name'], {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'bytes': 0})
+        duration = event['duration'] / 1e6
+        entry['count'] += 1
+        entry['total_ms'] += duration
+        entry['max_ms'] = max(entry['max_ms'], duration)
+        entry['bytes'] += event['args'].get('bytes', 0) if type(event['args'].get('bytes', 0)) == int else 0
+
+    for entry in result.values():
+        entry['mean_ms'] = entry['total_ms'] / entry['count']
+
+    return result
+
+
+def summary_table():
+    """ Get the summary of the spans recorded as a table, the slowest operations first """
+
+    lines = [f"{'operation':32s} {'calls':>6s} {'total ms':>10s} {'mean ms':>9s} {'max ms':>9s} {'MiB':>8s}"]
+    for name, entry in sorted(summary().items(), key=lambda item: -item[1]['total_ms']):
+        lines.append(f"{name:32s} {entry['count']:6d} {entry['total_ms']:10.2f} {entry['mean_ms']:9.2f} {entry['max_ms']:9.2f} {entry['bytes'] / 2**20:8.2f}")
+    return '\n'.join(lines)
+
+
+def _export_at_exit(filename):
+    # atexit handlers run in the main process and in spawned workers, not in forked ones
+    from multiprocessing import parent_process
+    if parent_process() is None:
+        _export_run(filename)
+    else:
+        _export_worker(filename)
+
+
+def _after_fork(_):
+    _start_worker(_trace_file)
+
+
+if os.environ.get('AIGEANPY_TRACE'):
+    from multiprocessing import parent_process, util
+
+    enable()
+    _trace_file = os.path.abspath(os.environ['AIGEANPY_TRACE'])
+    atexit.register(_export_at_exit, _trace_file)
+
+    # Forked workers started after this import, set up as they start
+    util.register_after_fork(_after_fork, _after_fork)
+    if parent_process() is not None:
+        # A worker importing the module once already running
+        _start_worker(_trace_file)
@@ -0,0 +1,205 @@
+import json
+import os
+import zipfile
+import numpy
+from aigeanpy.dtypes import as_dtype
+
+# asdf and h5py take a long time to import, so each writer imports
+# the library it needs the first time it is called.
+
+# The writers produce the layouts the readers of read_files expect, so
+# read_file(filename) returns the metadata and data that were written.
+# Each file is written under a temporary name and renamed when it is
+# complete, so a file that exists is never half written and the cache of
+# read_file never holds a file that was still being written.
+
+FORMATS = {'.asdf': 'asdf', '.hdf5': 'hdf5', '.zip': 'zip'}
+
+
+def _plain(value):
+    # ASDF and JSON metadata of the ISA files are lists and python numbers,
+    # while the values of a SatMap may be numpy arrays and scalars
+    if isinstance(value, numpy.ndarray):
+        return value.tolist()
+    if isinstance(value, numpy.generic):
+        return value.item()
+    return value
+
+
+# write_asdf stores the metadata at the top of the ASDF tree
+# next to the data, as in the files of the Lir instrument
+
+def write_asdf(filename, metadata, data, compression=None):
+    """ Write metadata and data of image to an ASDF file
+
+    Parameters
+    ----------
+    filename: str
+            name of the file to write, such as aigean_lir_20221223_024822.asdf
+
+    metadata: dictionary
+            The information of image
+
+    data: ndarray
+            data of image
+
+    compression: str
+            The default value of compression is None and the data is stored as it is.
+            Otherwise one of the block compressions of asdf, such as 'zlib', or 'lz4' if the lz4 library is installed.
+    """
+
+    import asdf
+
+    tree = {key: _plain(value) for key, value in metadata.items() if value is not None}
+    tree['data'] = numpy.ascontiguousarray(data)
+
+    asdf.AsdfFile(tree).write_to(filename, all_array_compression=compression)
+
+
+# write_h5py stores the data as the dataset 'observation/data' and the
+# metadata as attributes of 'observation', as in the files of the Manannan instrument
+
+def write_h5py(filename, metadata, data, chunks=True, compression='gzip'):
+    """ Write metadata and data of image to a HDF5 file
+
+    Parameters
+    ----------
+    filename: str
+            name of the file to write, such as aigean_man_20221212_123848.hdf5
+
+    metadata: dictionary
+            The information of image
+
+    data: ndarray
+            data of image
+
+    chunks: bool or tuple
+            The default value of chunks is True and h5py chooses the shape of the chunks.
+            Otherwise the shape of the chunks, such as (256, 256), or None to store the data contiguously.
+
+    compression: str
+            The default value of compression is 'gzip'. 'lzf' is faster to write and read,
+            and None stores the data uncompressed.
+    """
+
+    import h5py
+
+    if compression is not None and chunks is None:
+        raise ValueError('Compressed HDF5 data must be chunked')
+
+    with h5py.File(filename, 'w') as f:
+        group = f.create_group('observation')
+        group.create_dataset('data', data=data, chunks=chunks, compression=compression,
+                             shuffle=compression is not None)
+        for key, value in metadata.items():
+            if value is not None:
+                group.attrs[key] = value
+
+
+# write_zip stores metadata.json and observation.npy, as in the files of the
+# Fand instrument. observation.npy is stored uncompressed by default, so its
+# data can be memory-mapped from the zip file with read_files.mmap_zip.
+
+def write_zip(filename, metadata, data, compression=None):
+    """ Write metadata and data of image to a zip file
+
+    Parameters
+    ----------
+    filename: str
+            name of the file to write, such as aigean_fan_20221212_123848.zip
+
+    metadata: dictionary
+            The information of image
+
+    data: ndarray
+            data of image
+
+    compression: str
+            The default value of compression is None and observation.npy is stored uncompressed.
+            'deflate' compresses it, at the cost of it no longer being memory-mappable.
+    """
+
+    if compression not in [None, 'deflate']:
+        raise ValueError("The compression of a zip file must be None or 'deflate'")
+
+    method = zipfile.ZIP_STORED if compression is None else zipfile.ZIP_DEFLATED
+
+    with zipfile.ZipFile(filename, 'w', compression=method) as zip_ob:
+        zip_ob.writestr('metadata.json', json.dumps({key: _plain(value) for key, value in metadata.items() if value is not None}))
+
+        # The array is streamed into the archive instead of being copied to a bytes object first
+        with zip_ob.open('observation.npy', 'w', force_zip64=True) as f:
+            numpy.lib.format.write_array(f, numpy.ascontiguousarray(data), allow_pickle=False)
+
+
+def write_file(filename, metadata, data, format=None, chunks=True, compression='default', dtype=None):
+    """ Write metadata and data of image to a file that read_file can read
+
+    Parameters
+    ----------
+    filename: str
+            name of the file to write
+
+    metadata: dictionary
+            The information of image
+
+    data: ndarray
+            data of image
+
+    format: str
+            'hdf5', 'zip' or 'asdf'. The default value of format is None and it is
+            chosen from the extension of filename.
+
+    chunks: bool or tuple
+            shape of the chunks of HDF5 data, see write_h5py
+
+    compression: str
+            The default value of compression is 'default': 'gzip' for HDF5 and none for zip and ASDF.
+            See write_h5py, write_zip and write_asdf for the other values.
+
+    dtype: str or numpy.dtype
+            The default value of dtype is None and the data is written in the dtype set with
+            aigeanpy.dtypes, or its own dtype. Otherwise it is converted to this dtype.
+
+    Returns
+    -------
+    str
+        the name of the file written
+    """
+
+    if type(filename) != str:
+        raise TypeError('Argument "filename" must be of type string')
+
+    extension = os.path.splitext(filename)[1]
+
+    if format is None:
+        if extension not in FORMATS:
+            raise ValueError('The file must be of type ASDF, HDF5 or zip')
+        format = FORMATS[extension]
+
+    elif format not in FORMATS.values():
+        raise ValueError("format must be 'hdf5', 'zip' or 'asdf'")
+
+    elif FORMATS.get(extension) != format:
+        raise ValueError(f'A {format} file must have the extension .{format}, so that read_file can read it')
+
+    data = as_dtype(numpy.asarray(data), dtype)
+
+    # Written next to the final file, so the rename doesn't cross file systems
+    temporary = filename + '.part'
+
+    try:
+        if format == 'hdf5':
+            write_h5py(temporary, metadata, data, chunks=chunks, compression='gzip' if compression == 'default' else compression)
+        elif format == 'zip':
+            write_zip(temporary, metadata, data, compression=None if compression == 'default' else compression)
+        else:
+            write_asdf(temporary, metadata, data, compression=None if compression == 'default' else compression)
+
+        os.replace(temporary, filename)
+
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+    return filename
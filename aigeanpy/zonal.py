@@ -0,0 +1,236 @@
+from functools import lru_cache
+import numpy as np
+from aigeanpy.tracing import traced, span
+
+
+# Zonal statistics reduce the pixels of an image inside each of a set of zones
+# (boxes or polygons in earth coordinates). A pixel belongs to a zone when its
+# centre is inside it, and zones may overlap.
+#
+# The zones are rasterised once per grid (geotransform and shape of the data)
+# into the flat indices of their pixels, ordered by zone, and the result is
+# cached, so the same zones over every new observation of an instrument are
+# only rasterised for the first one. Every statistic of every zone is then
+# computed in one pass over those pixels: sums and counts with np.bincount,
+# minima and maxima with np.minimum.reduceat and np.maximum.reduceat over
+# the runs of pixels of each zone.
+
+STATISTICS = ['count', 'sum', 'mean', 'std', 'min', 'max']
+
+
+class Zones:
+    """A set of zones in earth coordinates
+
+        Parameters
+        ----------
+        zones: dictionary or list
+                the zones, by name or in a list (named by their index). Each zone is a box
+                (xmin, ymin, xmax, ymax) or a polygon, a list of at least three (x, y) vertices.
+
+        Examples
+        --------
+        >>> zones = Zones({'harbour': (0, 0, 60, 60), 'bay': [(0, 0), (90, 0), (0, 90)]})
+        >>> zones.names
+        ['harbour', 'bay']
+    """
+
+    def __init__(self, zones) -> None:
+
+        if type(zones) == dict:
+            names, geometries = list(zones.keys()), list(zones.values())
+        elif type(zones) == list:
+            names, geometries = list(range(len(zones))), zones
+        else:
+            raise TypeError('zones must be a dictionary or a list of boxes and polygons')
+
+        self.names = names
+        self.geometries = []
+        for geometry in geometries:
+            geometry = np.asarray(geometry, dtype=np.float64)
+            if geometry.shape == (4,):
+                if geometry[0] > geometry[2] or geometry[1] > geometry[3]:
+                    raise ValueError('A box must be in format of (xmin, ymin, xmax, ymax)')
+            elif geometry.ndim != 2 or geometry.shape[1] != 2 or geometry.shape[0] < 3:
+                raise ValueError('A zone must be a box (xmin, ymin, xmax, ymax) or a list of at least three (x, y) vertices')
+            self.geometries.append(geometry)
+
+        # Hashable and holding every vertex, so the rasterised zones can be cached by it
+        self.key = tuple(('box',) + tuple(i.tolist()) if i.shape == (4,) else tuple(i.reshape(-1).tolist()) for i in self.geometries)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _box_pixels(geotransform, shape, xmin, ymin, xmax, ymax):
+    # The rows and columns whose pixel centres are inside a box
+    x_left, resolution, _, y_top, _, _ = geotransform
+    first_col = max(int(np.ceil((xmin - x_left) / resolution - 0.5)), 0)
+    end_col = min(int(np.floor((xmax - x_left) / resolution - 0.5)) + 1, shape[1])
+    first_row = max(int(np.ceil((y_top - ymax) / resolution - 0.5)), 0)
+    end_row = min(int(np.floor((y_top - ymin) / resolution - 0.5)) + 1, shape[0])
+    return np.arange(first_row, max(end_row, first_row)), np.arange(first_col, max(end_col, first_col))
+
+
+def _polygon_pixels(geotransform, shape, vertices):
+    x_left, resolution, _, y_top, _, _ = geotransform
+    rows, cols = _box_pixels(geotransform, shape, *vertices.min(axis=0), *vertices.max(axis=0))
+    if len(rows) == 0 or len(cols) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    x = x_left + (cols[None, :] + 0.5) * resolution
+    y = y_top - (rows[:, None] + 0.5) * resolution
+
+    # Even-odd rule: a centre is inside if a ray towards +x crosses an odd number of edges
+    inside = np.zeros((len(rows), len(cols)), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+        if y1 == y2:
+            continue
+        crosses = (y1 > y) != (y2 > y)
+        inside ^= crosses & (x < x1 + (y - y1) * (x2 - x1) / (y2 - y1))
+
+    row_index, col_index = np.nonzero(inside)
+    return rows[row_index] * shape[1] + cols[col_index]
+
+
+@lru_cache(maxsize=32)
+def _rasterise(geotransform, shape, key):
+    with span('zonal.rasterise', zones=len(key), shape=list(shape)):
+        pixels = []
+        for zone in key:
+            if zone[0] == 'box':
+                rows, cols = _box_pixels(geotransform, shape, *zone[1:])
+                pixels.append((rows[:, None] * shape[1] + cols[None, :]).reshape(-1))
+            else:
+                pixels.append(_polygon_pixels(geotransform, shape, np.array(zone).reshape(-1, 2)))
+
+        counts = np.array([len(i) for i in pixels], dtype=np.int64)
+        pixels = np.concatenate(pixels).astype(np.int64) if pixels else np.zeros(0, dtype=np.int64)
+        labels = np.repeat(np.arange(len(counts)), counts)
+
+    for array in [pixels, labels, counts]:
+        array.flags.writeable = False
+    return pixels, labels, counts
+
+
+def rasterise_zones(zones, metadata, shape):
+    """ Get the pixels of a grid inside each zone, rasterised once per grid and set of zones
+
+    Parameters
+    ----------
+    zones: Zones, dictionary or list
+            the zones, see Zones
+
+    metadata: SatMetadata
+            metadata of the grid, with its xcoords, ycoords and resolution
+
+    shape: tuple
+            the (rows, columns) of the grid
+
+    Returns
+    -------
+    tuple
+        the flat indices of the pixels inside the zones, ordered by zone, the zone of each of them,
+        and the number of pixels of each zone (read-only arrays)
+    """
+
+    if type(zones) != Zones:
+        zones = Zones(zones)
+
+    return _rasterise(metadata.geotransform, tuple(int(i) for i in shape), zones.key)
+
+
+def _reduce(data, pixels, labels, counts, statistics):
+    n = len(counts)
+    values = np.asarray(data).reshape(-1)[pixels].astype(np.float64)
+
+    # NaN pixels are left out of every statistic
+    valid = ~np.isnan(values)
+    if not valid.all():
+        counts = np.bincount(labels[valid], minlength=n)
+    filled = np.where(valid, values, 0.0)
+
+    result = {}
+    total = np.bincount(labels, weights=filled, minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(counts > 0, total / counts, np.nan)
+
+    if 'count' in statistics:
+        result['count'] = counts.astype(np.int64)
+    if 'sum' in statistics:
+        result['sum'] = total
+    if 'mean' in statistics:
+        result['mean'] = mean
+    if 'std' in statistics:
+        squares = np.bincount(labels, weights=np.where(valid, values - mean[labels], 0.0) ** 2, minlength=n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result['std'] = np.where(counts > 0, np.sqrt(squares / counts), np.nan)
+
+    # The pixels of each zone are consecutive, so each zone is one segment of reduceat
+    occupied = np.flatnonzero(np.bincount(labels, minlength=n) > 0)
+    starts = np.searchsorted(labels, occupied)
+    for name, function, empty in [('min', np.minimum, np.inf), ('max', np.maximum, -np.inf)]:
+        if name in statistics:
+            reduced = np.full(n, np.nan)
+            if len(occupied):
+                reduced[occupied] = function.reduceat(np.where(valid, values, empty), starts)
+            reduced[counts == 0] = np.nan
+            result[name] = reduced
+
+    return result
+
+
+@traced('zonal_stats')
+def zonal_stats(satmaps, zones, statistics=None):
+    """ Get statistics of the pixels of images inside zones
+
+    Parameters
+    ----------
+    satmaps: SatMap or list[SatMap]
+            the images. Images on the same grid share the rasterised zones.
+
+    zones: Zones, dictionary or list
+            the zones, see Zones. Build a Zones once to reuse it over many calls.
+
+    statistics: list[str]
+            any of 'count', 'sum', 'mean', 'std', 'min' and 'max',
+            by default ['count', 'mean', 'min', 'max']
+
+    Returns
+    -------
+    dictionary
+        'zone', the names of the zones, and an array for each statistic with one value per zone,
+        or for a list of images one row per image. Zones without pixels get NaN (and a count of 0).
+
+    Examples
+    --------
+    >>> from aigeanpy.satmap import SatMap
+    >>> image = SatMap(np.arange(200.).reshape(10, 20), {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:38:48', 'xcoords': [0.0, 600.0], 'ycoords': [0.0, 300.0], 'resolution': 30})
+    >>> stats = zonal_stats(image, {'corner': (0, 240, 60, 300)})
+    >>> stats['count'], stats['mean']
+    (array([4]), array([10.5]))
+    """
+
+    if statistics is None:
+        statistics = ['count', 'mean', 'min', 'max']
+
+    if any(i not in STATISTICS for i in statistics):
+        raise ValueError("statistics must be among 'count', 'sum', 'mean', 'std', 'min' and 'max'")
+
+    if type(zones) != Zones:
+        zones = Zones(zones)
+
+    single = type(satmaps) != list
+    if single:
+        satmaps = [satmaps]
+
+    rows = []
+    for satmap in satmaps:
+        if not satmap.metadata:
+            raise TypeError('Metadata for this file is not available, which suggests that file being analysed is not from one of the ISA imagers.')
+        pixels, labels, counts = rasterise_zones(zones, satmap.metadata, satmap.data.shape)
+        rows.append(_reduce(satmap.data, pixels, labels, counts, statistics))
+
+    result = {'zone': list(zones.names)}
+    for name in statistics:
+        result[name] = rows[0][name] if single else np.stack([i[name] for i in rows])
+    return result
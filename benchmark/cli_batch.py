@@ -0,0 +1,67 @@
+import sys
+sys.path.append('.')
+
+import contextlib
+import io
+import json
+import os
+import subprocess
+import tempfile
+import zipfile
+import h5py
+import numpy as np
+
+from aigeanpy.aigean_metadata import aigean_metadata
+from time import time
+
+# Measures the startup of the aigean_metadata console script and the per-file
+# cost of a batch of 500 local files, reading them one after another and with
+# a pool of workers, in text and JSON-lines output.
+
+N_FILES = 500
+JOBS = [1, 4, 16]
+
+
+def write_files(directory):
+    filenames = []
+    for i in range(N_FILES):
+        metadata = {'observatory': 'Aigean', 'instrument': 'Manannan', 'date': '2022-12-12',
+                    'time': f'{i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}',
+                    'xcoords': [0.0, 450.0], 'ycoords': [0.0, 150.0], 'resolution': 15}
+        data = np.random.uniform(size=(10, 30))
+
+        if i % 2:
+            filename = os.path.join(directory, f'aigean_man_20221212_{i:06d}.hdf5')
+            with h5py.File(filename, 'w') as f:
+                group = f.create_group('observation')
+                group.create_dataset('data', data=data)
+                for key in metadata:
+                    group.attrs[key] = metadata[key]
+        else:
+            filename = os.path.join(directory, f'aigean_man_20221212_{i:06d}.zip')
+            array = io.BytesIO()
+            np.save(array, data)
+            with zipfile.ZipFile(filename, 'w') as f:
+                f.writestr('metadata.json', json.dumps(metadata))
+                f.writestr('observation.npy', array.getvalue())
+
+        filenames.append(filename)
+    return filenames
+
+
+start = time()
+subprocess.run([sys.executable, '-m', 'aigeanpy.aigean_metadata', '--help'], stdout=subprocess.DEVNULL, check=True)
+print(f'startup: {time() - start:.3f} s')
+
+with tempfile.TemporaryDirectory() as directory:
+    filenames = write_files(directory)
+
+    for json_lines in [False, True]:
+        for jobs in JOBS:
+            start = time()
+            with contextlib.redirect_stdout(io.StringIO()):
+                aigean_metadata(filenames, jobs=jobs, json_lines=json_lines)
+            time_passed = time() - start
+
+            mode = 'json' if json_lines else 'text'
+            print(f'{mode} jobs={jobs:2d}: {time_passed:.3f} s for {N_FILES} files, {1000 * time_passed / N_FILES:.3f} ms per file')
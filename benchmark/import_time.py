@@ -0,0 +1,46 @@
+import sys
+sys.path.append('.')
+
+import subprocess
+
+# Measures how long `import aigeanpy` and the console scripts take to import,
+# with `python -X importtime`, and fails if any of them is over its budget.
+# Run from the root of the repository:
+#     python benchmark/import_time.py
+
+BUDGET_MS = {
+    'aigeanpy': 50,
+    'aigeanpy.coor': 300,
+    'aigeanpy.aigean_today': 300,
+    'aigeanpy.aigean_metadata': 300,
+    'aigeanpy.aigean_mosaic': 300,
+}
+
+REPEATS = 5
+
+
+def import_time_ms(module):
+    '''Cumulative import time of module, in milliseconds, as reported by -X importtime.
+    The best of REPEATS runs is kept, to leave out noise from the rest of the machine.
+    '''
+    times = []
+    for _ in range(REPEATS):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                capture_output=True, text=True, check=True)
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].strip() == module:
+                times.append(int(fields[1]) / 1000)
+    return min(times)
+
+
+over_budget = []
+for module, budget in BUDGET_MS.items():
+    time_passed = import_time_ms(module)
+    print(f'{module:28s} {time_passed:8.1f} ms (budget {budget} ms)')
+    if time_passed > budget:
+        over_budget.append(module)
+
+if over_budget:
+    sys.exit(f'Over the import time budget: {", ".join(over_budget)}')
@@ -0,0 +1,50 @@
+import sys
+sys.path.append('.')
+
+import os
+import tempfile
+import numpy as np
+
+from aigeanpy.read_files import read_file, mmap_zip
+from aigeanpy.satmap import SatMap
+from time import time
+
+# Measures how fast a 4096 x 4096 float32 SatMap (64 MiB) is written in each
+# format, and how fast it is read back: fully with read_file, and for zip
+# files also by memory-mapping observation.npy and touching every page.
+
+SIZE = 4096
+CASES = [('hdf5', 'gzip'), ('hdf5', 'lzf'), ('hdf5', None),
+         ('zip', None), ('zip', 'deflate'),
+         ('asdf', None), ('asdf', 'zlib')]
+
+metadata = {'observatory': 'Aigean', 'instrument': 'Lir', 'date': '2022-12-12', 'time': '12:38:48',
+            'xcoords': [0.0, SIZE * 30.0], 'ycoords': [0.0, SIZE * 30.0], 'resolution': 30}
+
+# Smooth data with noise, so that compression has something to do
+rows, cols = np.mgrid[0:SIZE, 0:SIZE]
+data = (np.sin(rows / 100) * np.cos(cols / 150) + np.random.normal(scale=0.01, size=(SIZE, SIZE))).astype(np.float32)
+image = SatMap(data, metadata)
+megabytes = data.nbytes / 2**20
+
+with tempfile.TemporaryDirectory() as directory:
+    for format, compression in CASES:
+        filename = os.path.join(directory, f'image_{compression}.{format}')
+
+        start = time()
+        image.save(filename, compression=compression)
+        write_time = time() - start
+        size = os.path.getsize(filename) / 2**20
+
+        start = time()
+        read_file(filename, cache=False)
+        read_time = time() - start
+
+        line = f'{format:4s} {str(compression):8s}: write {megabytes / write_time:7.1f} MiB/s, read {megabytes / read_time:7.1f} MiB/s, {size:6.1f} MiB on disk'
+
+        if format == 'zip' and compression == None:
+            start = time()
+            np.sum(mmap_zip(filename)[1])
+            line += f', mapped {megabytes / (time() - start):7.1f} MiB/s'
+
+        print(line)
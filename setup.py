@@ -20,7 +20,9 @@ setup(
         'console_scripts': [
             'aigean_today = aigeanpy.aigean_today:cli',
             'aigean_metadata = aigeanpy.aigean_metadata:cli',
-            'aigean_mosaic = aigeanpy.aigean_mosaic:cli'
+            'aigean_mosaic = aigeanpy.aigean_mosaic:cli',
+            'aigean_cluster = aigeanpy.aigean_cluster:cli',
+            'aigean_pack = aigeanpy.aigean_pack:cli'
         ]} 
 
     )